@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
 import database
+import recap
+import categories
+import arrears
+import tariffs
+from formatting import format_currency, format_currency_list
 import plotly.express as px
 from datetime import datetime
-from fpdf import FPDF
-import base64
 from io import BytesIO
 import xlsxwriter # Ensure available for engine lookup
 import openpyxl # Ensure available
@@ -28,22 +31,23 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Helper Functions
-def format_currency(amount):
-    return f"Rp {amount:,.0f}"
-
-def export_to_pdf(dataframe):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, txt="Laporan Keuangan", ln=1, align='C')
-    
-    # Simple table dump (improvement: make it a real table)
-    for i, row in dataframe.iterrows():
-        line = f"{row['date']} | {row['student_name']} | {row['type']} | {row['amount']}"
-        pdf.cell(200, 10, txt=line, ln=1)
-        
-    return pdf.output(dest='S').encode('latin-1')
+def pending_writes_panel():
+    """Changes still being saved in the background, and failed ones with retry/dismiss."""
+    writes = database.get_pending_writes()
+    if writes.empty:
+        return
+    waiting = writes[writes["status"] != "failed"]
+    if not waiting.empty:
+        st.info(f"{len(waiting)} perubahan sedang disimpan: " + "; ".join(waiting["change"].tail(3)))
+    for row in writes[writes["status"] == "failed"].itertuples():
+        c1, c2, c3 = st.columns([6, 1, 1])
+        c1.error(f"Gagal disimpan ({row.submitted_at}): {row.change}. {row.error}")
+        if c2.button("Coba Lagi", key=f"retry_write_{row.id}"):
+            database.retry_write(row.id)
+            st.rerun()
+        if c3.button("Hapus", key=f"dismiss_write_{row.id}"):
+            database.dismiss_write(row.id)
+            st.rerun()
 
 # Main Application
 def main():
@@ -53,13 +57,26 @@ def main():
     menu = ["Dashboard", "Siswa", "Transaksi", "Laporan", "Rekap", "Pengaturan"]
     choice = st.sidebar.selectbox("Menu", menu)
 
+    if database.is_offline():
+        st.sidebar.warning("Mode offline: database tidak dapat dihubungi. Perubahan disimpan di perangkat ini dan dikirim otomatis saat koneksi kembali.")
+    queue_stats = database.get_write_queue_stats()
+    if queue_stats and queue_stats["failed"]:
+        st.sidebar.error(f"{queue_stats['failed']} perubahan gagal disimpan. Buka halaman Transaksi atau Siswa untuk mencoba lagi.")
+
+    # Every page render is timed as a whole, next to the database calls it makes
+    with database.metrics.span(f"page.{choice}"):
+        render_page(choice)
+
+def render_page(choice):
     if choice == "Dashboard":
         with st.container():
             st.header("Ringkasan Keuangan")
             
-            # Fetch Data
-            transactions = database.get_transactions()
-            students = database.get_all_students()
+            # Fetch Data (aggregated by the database); the arrears section's
+            # students and tariffs are loaded at the same time
+            summary, students, fee = database.fetch_together(
+                database.get_dashboard_summary, database.get_all_students, database.get_tariff_schedule
+            )
             
             # --- SVGs (Lineart) ---
             ICON_INCOME = """<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><line x1="12" y1="1" x2="12" y2="23"></line><path d="M17 5H9.5a3.5 3.5 0 0 0 0 7h5a3.5 3.5 0 0 1 0 7H6"></path></svg>"""
@@ -146,18 +163,16 @@ def main():
                 html = f"""<div class="dashboard-card theme-{color}"><div class="icon-box">{icon}</div><div class="card-content"><p class="card-title">{title}</p><p class="card-value">{value}</p>{help_p}</div></div>"""
                 st.markdown(html, unsafe_allow_html=True)
 
-            if not transactions.empty:
+            if summary["has_transactions"]:
                 # 1. Total Income (All Time)
-                total_income = transactions[transactions['type'].isin(['Income', 'Tuition', 'Pemasukan'])]['amount'].sum()
+                total_income = summary["total_income"]
                 
                 # 2. Income by Year
-                income_df = transactions[transactions['type'].isin(['Income', 'Tuition', 'Pemasukan'])]
-                income_by_year = income_df.groupby('payment_year')['amount'].sum().sort_index()
+                income_by_year = summary["income_by_year"]
                 
                 # 3. Expense by Description (Grouped)
-                expense_df = transactions[transactions['type'].isin(['Expense', 'Pengeluaran'])]
-                # Clean description to group better? For now grouping by exact description as requested ("transaksi yang sama")
-                expense_by_desc = expense_df.groupby('description')['amount'].sum().sort_values(ascending=False)
+                # Grouping by exact description as requested ("transaksi yang sama")
+                expense_by_desc = summary["expense_by_desc"]
 
                 # --- DISPLAY ---
                 
@@ -169,7 +184,7 @@ def main():
                 with c1:
                     card("TOTAL UANG MASUK", format_currency(total_income), icon=ICON_INCOME, color="green")
                 with c2:
-                    card("Total Siswa Aktif", f"{len(students[students['status'] == 'Active'])}", icon=ICON_STUDENTS, color="blue")
+                    card("Total Siswa Aktif", f"{summary['active_students']}", icon=ICON_STUDENTS, color="blue")
                     
                 st.markdown("### Uang Masuk per Tahun")
                 if not income_by_year.empty:
@@ -188,7 +203,7 @@ def main():
                 
                 if not expense_by_desc.empty:
                     # Total Expense Card
-                    total_expense = expense_df['amount'].sum()
+                    total_expense = summary["total_expense"]
                     cols_total = st.columns(3)
                     with cols_total[0]:
                         card("TOTAL PENGELUARAN", format_currency(total_expense), icon=ICON_OUTPUT, color="red")
@@ -219,6 +234,28 @@ def main():
             else:
                 st.info("Belum ada data transaksi.")
 
+            st.divider()
+
+            # SECTION 3: TUNGGAKAN (unpaid months of active students this year)
+            st.subheader("TUNGGAKAN")
+            cutoff = st.date_input("Dihitung sampai tanggal", datetime.now().date(), key="arrears_cutoff")
+            arrears_df = arrears.compute_arrears(
+                students, database.get_payment_status(cutoff.year), cutoff=cutoff, fee=fee
+            )
+            if arrears_df.empty:
+                st.success(f"Semua siswa aktif sudah lunas sampai {cutoff:%d-%m-%Y}.")
+            else:
+                cols_arrears = st.columns(3)
+                with cols_arrears[0]:
+                    card("TOTAL TUNGGAKAN", format_currency(arrears_df['Tunggakan'].sum()), icon=ICON_OUTPUT, color="orange")
+                with cols_arrears[1]:
+                    card("Siswa Menunggak", f"{len(arrears_df)}", icon=ICON_STUDENTS, color="orange")
+
+                st.markdown("#### Tunggakan Terbesar")
+                top_arrears = arrears_df.head(10).drop(columns=["student_id"])
+                top_arrears['Tunggakan'] = format_currency_list(top_arrears['Tunggakan'])
+                st.dataframe(top_arrears, use_container_width=True, hide_index=True)
+
     elif choice == "Siswa":
         st.header("Manajemen Data Siswa")
         
@@ -235,10 +272,10 @@ def main():
                 
                 if submit:
                     if name and class_name:
-                        result = database.add_student(name, attendance_number, class_name, contact)
+                        # Saved in the background; the form is ready for the next student
+                        result = database.queue_student(name, attendance_number, class_name, contact)
                         if result:
                             st.success(f"Siswa {name} berhasil ditambahkan!")
-                            st.rerun()
                         else:
                             st.error("Gagal menambahkan siswa ke database.")
                     else:
@@ -282,34 +319,61 @@ def main():
                     
                     if st.button("Proses Upload"):
                         # Validate columns
-                        required_cols = ['Nama', 'Absen', 'Kelas', 'Kontak']
+                        required_cols = database.UPLOAD_COLUMNS
                         if all(col in df_upload.columns for col in required_cols):
-                            success_count = 0
                             with st.status("Memproses data...", expanded=True) as status:
-                                for index, row in df_upload.iterrows():
-                                    if pd.notna(row['Nama']) and pd.notna(row['Kelas']):
-                                        # Handle numeric conversion for contact/absen if pandas read them as float
-                                        r_name = str(row['Nama'])
-                                        r_absen = str(int(row['Absen'])) if pd.notna(row['Absen']) and isinstance(row['Absen'], (int, float)) else str(row['Absen'])
-                                        r_class = str(row['Kelas'])
-                                        r_contact = str(int(row['Kontak'])) if pd.notna(row['Kontak']) and isinstance(row['Kontak'], (int, float)) else str(row['Kontak'])
-                                        
-                                        # Use update or skip? Simple add for now.
-                                        database.add_student(r_name, r_absen, r_class, r_contact)
-                                        success_count += 1
+                                results = database.add_students_bulk(df_upload)
                                 status.update(label="Selesai!", state="complete", expanded=False)
                             
-                            st.success(f"Berhasil mengimpor {success_count} data siswa!")
-                            st.rerun()
+                            success_count = int((results['status'] == "Berhasil").sum())
+                            failed = results[results['status'] != "Berhasil"]
+                            if failed.empty:
+                                st.success(f"Berhasil mengimpor {success_count} data siswa!")
+                                st.rerun()
+                            else:
+                                st.warning(f"Berhasil mengimpor {success_count} data siswa, {len(failed)} baris tidak diimpor.")
+                                # Excel row number = index + 2 (header row)
+                                failed_display = failed.assign(row=failed['row'] + 2)[['row', 'name', 'status', 'error']]
+                                failed_display.columns = ["Baris Excel", "Nama", "Status", "Keterangan"]
+                                st.dataframe(failed_display, use_container_width=True, hide_index=True)
                         else:
                             st.error(f"Format Kolom Salah! Pastikan kolom berikut ada: {', '.join(required_cols)}")
                             
                 except Exception as e:
                     st.error(f"Gagal membaca file: {e}")
         
-        # Display Students
+        # Display Students (one page at a time, filtered in the database)
         st.subheader("Daftar Siswa")
-        students = database.get_all_students()
+        pending_writes_panel()
+        
+        sf1, sf2, sf3, sf4 = st.columns(4)
+        s_search = sf1.text_input("Cari Nama", key="stu_search")
+        s_class = sf2.selectbox("Kelas", ["Semua"] + database.get_class_names(), key="stu_class")
+        s_status = sf3.selectbox("Status", ["Semua", "Active", "Inactive"], key="stu_status")
+        s_page_size = sf4.selectbox("Baris per Halaman", [10, 25, 50, 100], index=1, key="stu_page_size")
+        
+        student_filters = {}
+        if s_search.strip():
+            student_filters["search"] = s_search.strip()
+        if s_class != "Semua":
+            student_filters["class_name"] = s_class
+        if s_status != "Semua":
+            student_filters["status"] = s_status
+        
+        s_page = st.session_state.get("stu_page", 1)
+        students, total_students = database.get_students_page(student_filters, s_page, s_page_size)
+        total_student_pages = max((total_students + s_page_size - 1) // s_page_size, 1)
+        if s_page > total_student_pages:
+            # Filters changed and the page no longer exists
+            s_page = total_student_pages
+            students, total_students = database.get_students_page(student_filters, s_page, s_page_size)
+        st.session_state["stu_page"] = s_page
+        
+        sp1, sp2 = st.columns([1, 3])
+        sp1.number_input("Halaman", min_value=1, max_value=total_student_pages, step=1, key="stu_page")
+        if total_students:
+            first_student = (s_page - 1) * s_page_size + 1
+            sp2.caption(f"Menampilkan {first_student}-{first_student + len(students) - 1} dari {total_students} siswa (halaman {s_page} dari {total_student_pages})")
         
         if not students.empty:
             # Table Header
@@ -357,7 +421,7 @@ def main():
                             ed_status = st.selectbox("Status", ["Active", "Inactive"], index=0 if row['status'] == "Active" else 1)
                             
                             if st.form_submit_button("Update"):
-                                database.update_student(row['id'], ed_name, ed_absen, ed_class, ed_contact, ed_status)
+                                database.queue_student_update(row['id'], ed_name, ed_absen, ed_class, ed_contact, ed_status)
                                 st.success("Updated!")
                                 st.session_state[f'edit_mode_{row["id"]}'] = False # Close after update
                                 st.rerun()
@@ -367,7 +431,7 @@ def main():
                     st.warning(f"Hapus {row['name']}?")
                     col_y, col_n = st.columns(2)
                     if col_y.button("Ya", key=f"yes_del_{row['id']}"):
-                        database.delete_student(row['id'])
+                        database.queue_student_delete(row['id'])
                         st.success("Deleted")
                         del st.session_state[f'confirm_del_{row["id"]}']
                         st.rerun()
@@ -376,6 +440,8 @@ def main():
                         st.rerun()
                     st.divider()
 
+        elif student_filters:
+            st.info("Tidak ada siswa yang cocok dengan filter.")
         else:
             st.info("Belum ada data siswa.")
 
@@ -428,7 +494,7 @@ def main():
                 i_year = st.selectbox("Tahun Pembayaran", years, index=years.index(cy) if cy in years else 0, key="in_yr")
                 
                 st.write("Bulan Pembayaran (Bisa pilih lebih dari satu):")
-                months_list = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+                months_list = categories.MONTHS
                 
                 # Create a grid for checkboxes
                 m_cols = st.columns(4)
@@ -450,13 +516,19 @@ def main():
                             st.error("Mohon pilih setidaknya satu bulan pembayaran.")
                         else:
                             db_stu_id = student_dict[i_student]
-                            saved_count = 0
-                            for m_pay in selected_months:
-                                database.add_transaction(db_stu_id, str(i_date), "Pemasukan", i_amount, m_pay, i_year, i_desc)
-                                saved_count += 1
+                            # One transaction per month, saved together in a single write
+                            payments = [
+                                {"student_id": db_stu_id, "date": str(i_date), "type_": "Pemasukan", "amount": i_amount,
+                                 "payment_month": m_pay, "payment_year": i_year, "description": i_desc}
+                                for m_pay in selected_months
+                            ]
+                            # Queued and saved in the background, batched with other entries
+                            saved_ids = database.queue_transactions(payments)
                             
-                            st.success(f"Berhasil menyimpan {saved_count} transaksi pemasukan!")
-                            st.rerun()
+                            if saved_ids:
+                                st.success(f"Berhasil menyimpan {len(saved_ids)} transaksi pemasukan!")
+                            else:
+                                st.error("Gagal menyimpan pembayaran. Tidak ada bulan yang tercatat, silakan coba lagi.")
                     else:
                         st.error("Data siswa kosong.")
 
@@ -471,7 +543,7 @@ def main():
                     o_amount = st.number_input("Jumlah (Rp)", min_value=0, step=1000, key="out_amt")
                 
                 with col2:
-                    o_month = st.selectbox("Bulan (Opsional)", ["-"] + ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"], key="out_mon")
+                    o_month = st.selectbox("Bulan (Opsional)", ["-"] + categories.MONTHS, key="out_mon")
                     o_year = st.number_input("Tahun", min_value=2020, max_value=2030, value=datetime.now().year, key="out_yr")
                     o_date = st.date_input("Tanggal", datetime.now(), key="out_date")
 
@@ -481,16 +553,48 @@ def main():
                 if o_submit:
                     if o_recipient:
                         final_month = o_month if o_month != "-" else None
-                        # Pass student_id=None, recipient=o_recipient
-                        database.add_transaction(None, str(o_date), "Pengeluaran", o_amount, final_month, o_year, o_desc, recipient=o_recipient)
-                        st.success("Pengeluaran berhasil disimpan!")
-                        st.rerun()
+                        # student_id=None, recipient=o_recipient; saved in the background
+                        expense = {"student_id": None, "date": str(o_date), "type_": "Pengeluaran", "amount": o_amount,
+                                   "payment_month": final_month, "payment_year": o_year, "description": o_desc, "recipient": o_recipient}
+                        if database.queue_transactions([expense]):
+                            st.success("Pengeluaran berhasil disimpan!")
                     else:
                         st.error("Mohon isi nama Penerima Dana.")
         
-        # History
+        # History (one page at a time, filtered in the database)
         st.subheader("Riwayat Transaksi")
-        transactions = database.get_transactions()
+        pending_writes_panel()
+        
+        hf1, hf2, hf3, hf4 = st.columns(4)
+        h_type = hf1.selectbox("Jenis", ["Semua", "Pemasukan", "Pengeluaran"], key="hist_type")
+        h_student = hf2.selectbox("Siswa", ["Semua"] + list(student_dict.keys()), key="hist_student")
+        h_year = hf3.selectbox("Tahun Bayar", ["Semua"] + list(range(datetime.now().year + 2, 2019, -1)), key="hist_year")
+        h_page_size = hf4.selectbox("Baris per Halaman", [10, 25, 50, 100], index=1, key="hist_page_size")
+        
+        history_filters = {}
+        if h_type == "Pemasukan":
+            history_filters["type"] = categories.INCOME_TYPES
+        elif h_type == "Pengeluaran":
+            history_filters["type"] = categories.EXPENSE_TYPES
+        if h_student != "Semua":
+            history_filters["student_id"] = int(student_dict[h_student])
+        if h_year != "Semua":
+            history_filters["payment_year"] = h_year
+        
+        h_page = st.session_state.get("hist_page", 1)
+        transactions, total_rows = database.get_transactions_page(history_filters, h_page, h_page_size)
+        total_pages = max((total_rows + h_page_size - 1) // h_page_size, 1)
+        if h_page > total_pages:
+            # Filters changed and the page no longer exists
+            h_page = total_pages
+            transactions, total_rows = database.get_transactions_page(history_filters, h_page, h_page_size)
+        st.session_state["hist_page"] = h_page
+        
+        pc1, pc2 = st.columns([1, 3])
+        pc1.number_input("Halaman", min_value=1, max_value=total_pages, step=1, key="hist_page")
+        if total_rows:
+            first_row = (h_page - 1) * h_page_size + 1
+            pc2.caption(f"Menampilkan {first_row}-{first_row + len(transactions) - 1} dari {total_rows} transaksi (halaman {h_page} dari {total_pages})")
         
         if not transactions.empty:
             # Header
@@ -505,11 +609,11 @@ def main():
             # Rows
             for idx, row in transactions.iterrows():
                 cols = st.columns([1, 2, 1, 2, 2, 2, 2, 2])
-                cols[0].write(row['date'])
+                cols[0].write(row['date'].strftime('%Y-%m-%d') if pd.notna(row['date']) else "-")
                 cols[1].write(row['student_name'])
                 cols[2].write(row['attendance_number'] if pd.notna(row['attendance_number']) else "-")
                 
-                type_color = "green" if row['type'] in ["Income", "Tuition", "Pemasukan"] else "red"
+                type_color = "green" if row['type'] in categories.INCOME_TYPES else "red"
                 cols[3].markdown(f":{type_color}[{row['type']}]")
                 
                 cols[4].write(format_currency(row['amount']))
@@ -531,17 +635,17 @@ def main():
                         with st.form(key=f"edit_trans_form_{row['id']}"):
                             nc1, nc2 = st.columns(2)
                             with nc1:
-                                n_type = st.selectbox("Jenis", ["Pemasukan", "Pengeluaran"], index=0 if row['type'] == "Pemasukan" else 1)
+                                n_type = st.selectbox("Jenis", ["Pemasukan", "Pengeluaran"], index=0 if row['type'] in categories.INCOME_TYPES else 1)
                                 n_amount = st.number_input("Jumlah", value=float(row['amount']))
                             with nc2:
-                                n_month = st.selectbox("Bulan", ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"], index=["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"].index(row['payment_month']) if row['payment_month'] in ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"] else 0)
+                                n_month = st.selectbox("Bulan", categories.MONTHS, index=categories.MONTHS.index(row['payment_month']) if row['payment_month'] in categories.MONTHS else 0)
                                 n_year = st.number_input("Tahun", value=int(row['payment_year']))
                                 
-                            n_date = st.date_input("Tanggal", value=pd.to_datetime(row['date']))
+                            n_date = st.date_input("Tanggal", value=row['date'] if pd.notna(row['date']) else None)
                             n_desc = st.text_area("Keterangan", value=row['description'])
                             
                             if st.form_submit_button("Update Transaksi"):
-                                database.update_transaction(row['id'], str(n_date), n_type, n_amount, n_month, n_year, n_desc)
+                                database.queue_transaction_update(row['id'], str(n_date), n_type, n_amount, n_month, n_year, n_desc)
                                 st.success("Transaksi diperbarui!")
                                 st.session_state[f"edit_trans_mode_{row['id']}"] = False
                                 st.rerun()
@@ -550,7 +654,7 @@ def main():
                 if st.session_state.get(f"confirm_del_trans_{row['id']}", False):
                     st.warning("Hapus transaksi ini?")
                     if st.button("Ya", key=f"yes_del_trans_{row['id']}"):
-                        database.delete_transaction(row['id'])
+                        database.queue_transaction_delete(row['id'])
                         st.success("Terhapus!")
                         del st.session_state[f"confirm_del_trans_{row['id']}"]
                         st.rerun()
@@ -558,89 +662,80 @@ def main():
                         del st.session_state[f"confirm_del_trans_{row['id']}"]
                         st.rerun()
                     st.divider()
+        else:
+            st.info("Tidak ada transaksi yang cocok dengan filter.")
 
     elif choice == "Laporan":
         st.header("Laporan Keuangan")
         
-        transactions = database.get_transactions()
-        if not transactions.empty:
-            # Prepare data for filtering
-            # Extract month name from transaction date for "Bulan Transaksi"
-            transactions['trans_month_name'] = pd.to_datetime(transactions['date']).dt.strftime('%B')
-            
-            # Filters
-            # Filters
+        # Dropdown options come from cheap distinct queries, not the whole ledger
+        options = database.get_transaction_filter_options()
+        if options["min_date"]:
             # Filters
             col_f1, col_f2, col_f3, col_f4 = st.columns(4)
             
             # Filter 1: Bulan Bayar (payment_month)
-            unique_pay_months = ["Semua"] + list(transactions['payment_month'].unique())
+            unique_pay_months = ["Semua"] + options["payment_month"]
             pay_month_filter = col_f1.selectbox("Filter Bulan Bayar", unique_pay_months)
             
             # Filter 2: Tahun Bayar (payment_year)
-            unique_pay_years = ["Semua"] + sorted([int(x) for x in transactions['payment_year'].unique() if pd.notna(x)])
+            unique_pay_years = ["Semua"] + options["payment_year"]
             pay_year_filter = col_f2.selectbox("Filter Tahun Bayar", unique_pay_years)
             
             # Filter 3: Jenis Transaksi (type)
-            unique_types = ["Semua"] + list(transactions['type'].unique())
+            unique_types = ["Semua"] + options["type"]
             type_filter = col_f3.selectbox("Filter Jenis", unique_types)
 
             # Filter 4: Tanggal Transaksi (Range)
-            transactions['date'] = pd.to_datetime(transactions['date'])
-            min_date = transactions['date'].min().date()
-            max_date = transactions['date'].max().date()
+            min_date = pd.to_datetime(options["min_date"]).date()
+            max_date = pd.to_datetime(options["max_date"]).date()
             
             date_range = col_f4.date_input("Rentang Tanggal Input", [min_date, max_date])
             
-            # Apply Filters
-            filtered_df = transactions.copy()
+            # Apply Filters (in the database query)
+            report_filters = {}
             
             if pay_month_filter != "Semua":
-                filtered_df = filtered_df[filtered_df['payment_month'] == pay_month_filter]
+                report_filters["payment_month"] = pay_month_filter
                 
             if pay_year_filter != "Semua":
-                filtered_df = filtered_df[filtered_df['payment_year'] == pay_year_filter]
+                report_filters["payment_year"] = pay_year_filter
                 
             if type_filter != "Semua":
-                filtered_df = filtered_df[filtered_df['type'] == type_filter]
+                report_filters["type"] = type_filter
             
             # Apply Date Range Filter
             if len(date_range) == 2:
                 start_date, end_date = date_range
-                # Ensure comparison uses datetime.date
-                filtered_df = filtered_df[
-                    (filtered_df['date'].dt.date >= start_date) & 
-                    (filtered_df['date'].dt.date <= end_date)
-                ]
+                report_filters["date_from"] = start_date.isoformat()
+                report_filters["date_to"] = end_date.isoformat()
+            
+            filtered_df = database.query_transactions(report_filters)
             
             # Select and Rename Columns for Display (Hide IDs)
             # Available: id, student_id, student_name, attendance_number, date, type, amount, payment_month, payment_year, description
             display_columns = ['date', 'student_name', 'attendance_number', 'type', 'amount', 'payment_month', 'payment_year', 'description']
-            display_df = filtered_df[display_columns].copy()
+            display_df = filtered_df[display_columns]
             
             display_df.columns = ["Tanggal", "Nama Siswa", "Absen", "Jenis", "Nominal", "Bulan Bayar", "Tahun Bayar", "Keterangan"]
             
             # Format Currency
-            display_df['Nominal'] = display_df['Nominal'].apply(format_currency)
+            display_df['Nominal'] = format_currency_list(display_df['Nominal'])
             
-            # Format Date dd-mmm-yyyy (e.g., 20-Jan-2024)
-            # Ensure it is datetime first (it should be from earlier steps, but safe to check)
-            display_df['Tanggal'] = pd.to_datetime(display_df['Tanggal']).dt.strftime('%d-%b-%Y')
+            # Format Date dd-mmm-yyyy (e.g., 20-Jan-2024); dates arrive as datetimes
+            display_df['Tanggal'] = display_df['Tanggal'].dt.strftime('%d-%b-%Y')
                 
             st.dataframe(display_df, use_container_width=True, hide_index=True)
             
-            col1, col2 = st.columns(2)
-            csv = display_df.to_csv(index=False).encode('utf-8')
-            col1.download_button("Download CSV", csv, "laporan.csv", "text/csv")
-            
-            # PDF Export
-            if st.button("Download PDF"):
-                # Use filtered_df but with nice columns for PDF too? 
-                # For simplicity, passing display_df which has nice headers but no IDs
-                pdf_bytes = export_to_pdf(filtered_df) # export_to_pdf function might need adjustment if it relies on specific col names
-                b64 = base64.b64encode(pdf_bytes).decode()
-                href = f'<a href="data:application/octet-stream;base64,{b64}" download="laporan.pdf">Download PDF File</a>'
-                col2.markdown(href, unsafe_allow_html=True)
+            # Exports are built only when clicked, streamed from the database
+            # in chunks with the same filters as the table
+            col1, col2, col3 = st.columns(3)
+            col1.download_button("Download CSV", lambda: database.transaction_report_csv(report_filters) or b"", "laporan.csv", "text/csv")
+            col2.download_button(
+                "Download Excel", lambda: database.transaction_report_xlsx(report_filters) or b"", "laporan.xlsx",
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            col3.download_button("Download PDF", lambda: database.transaction_report_pdf(report_filters) or b"", "laporan.pdf", "application/pdf")
         else:
             st.info("Belum ada data transaksi untuk laporan.")
 
@@ -651,130 +746,30 @@ def main():
         current_year = datetime.now().year
         selected_year = st.number_input("Tahun", min_value=2020, max_value=2030, value=current_year)
         
-        # 2. Get Data
-        students = database.get_all_students()
-        active_students = students[students['status'] == 'Active'] if not students.empty else pd.DataFrame()
-        transactions = database.get_transactions()
+        # 2. Get Data (paid months come precomputed from payment_status), all three at once
+        students, payment_status, fee = database.fetch_together(
+            database.get_all_students, lambda: database.get_payment_status(selected_year), database.get_tariff_schedule
+        )
+        
+        # 3. Build the student x month matrix with TOTAL and RUPIAH rows
+        # Note: payment_status only counts 'Pemasukan', 'Income', 'Tuition' as payments
+        # Rupiah uses the tariff of each student's class for each month
+        recap_df = recap.build_recap(students, payment_status, selected_year, fee=fee)
         
-        if active_students.empty:
+        if recap_df.empty:
             st.info("Tidak ada siswa aktif to display.")
         else:
-            # 3. Process Data
-            # Filter transactions for the selected year and income types
-            # Note: We consider 'Pemasukan', 'Income', 'Tuition' as payments
-            paid_trans = pd.DataFrame()
-            if not transactions.empty:
-                paid_trans = transactions[
-                    (transactions['payment_year'] == selected_year) & 
-                    (transactions['type'].isin(['Pemasukan', 'Income', 'Tuition']))
-                ]
-            
-            # Create a pivot-like structure
-            months = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-            
-            recap_data = []
-            
-            for idx, student in active_students.iterrows():
-                row_data = {
-                    "No Absen": student['attendance_number'] if pd.notna(student['attendance_number']) else "",
-                    "Nama Siswa": student['name']
-                }
-                
-                # Check payment for each month
-                student_payments = []
-                if not paid_trans.empty:
-                    student_payments = paid_trans[paid_trans['student_id'] == student['id']]['payment_month'].unique()
-                
-                paid_count = 0
-                for month in months:
-                    if month in student_payments:
-                        row_data[month] = "Sudah Bayar"
-                        paid_count += 1
-                    else:
-                        row_data[month] = "-"
-                
-                row_data["Jumlah"] = paid_count
-                row_data["Rupiah"] = paid_count * 66000
-                
-                # Try to convert No Absen to numeric for better native sorting
-                try:
-                    row_data["No Absen"] = int(row_data["No Absen"])
-                except:
-                    pass
-                
-                recap_data.append(row_data)
-                
-            recap_df = pd.DataFrame(recap_data)
-
-            # Calculate and Append Total & Rupiah Rows
-            if not recap_df.empty:
-                # Calculate totals BEFORE formatting
-                total_jumlah = recap_df['Jumlah'].sum()
-                total_rupiah_col = recap_df['Rupiah'].sum() # Sum on raw numbers
-                
-                # Now format the main column
-                recap_df['Rupiah'] = recap_df['Rupiah'].apply(format_currency)
-                
-                # 1. TOTAL Row
-                total_row = {col: None for col in recap_df.columns}
-                total_row["Nama Siswa"] = "TOTAL"
-                total_row["No Absen"] = ""
-                
-                total_row["Jumlah"] = total_jumlah
-                total_row["Rupiah"] = format_currency(total_rupiah_col) # Match format
-                
-                # Count 'Sudah Bayar' for month columns
-                month_counts = {}
-                for month in months:
-                    count = recap_df[month].apply(lambda x: 1 if x == "Sudah Bayar" else 0).sum()
-                    total_row[month] = count
-                    month_counts[month] = count
-                    
-                recap_df = pd.concat([recap_df, pd.DataFrame([total_row])], ignore_index=True)
-                
-                # 2. RUPIAH Row
-                rupiah_row = {col: None for col in recap_df.columns}
-                rupiah_row["Nama Siswa"] = "RUPIAH"
-                rupiah_row["No Absen"] = ""
-
-                
-                # Calculate Rupiah for months
-                for month in months:
-                    rupiah_row[month] = format_currency(month_counts[month] * 66000)
-                
-                # For Jumlah column, maybe show the total Rupiah equivalent? 
-                # User request: "buat baris rupiah yang merupakan hasil total dikali dengan 66.000 rupiah"
-                rupiah_row["Jumlah"] = format_currency(total_jumlah * 66000)
-                rupiah_row["Rupiah"] = format_currency(total_rupiah_col) # Already in Rupiah
-                
-                recap_df = pd.concat([recap_df, pd.DataFrame([rupiah_row])], ignore_index=True)
-
-            # Format Rupiah column in main df for display?
-            # It might be better to keep as numbers for sorting until the end, but the Total row mixes types (counts).
-            # Streamlit dataframe handles mixed types okay. 
-            # Let's format the money columns in the rows for better readability if possible, 
-            # or use column_config. For now, I'll format the new row values as currency strings.
-            # The 'Rupiah' column in main body is number.
-            
-            
-            # Sort by No Absen (try to convert to int if possible for correct sorting)
-            # Create a localized column mapping if desired, but user asked for standard months? 
-            # User instructions: "bulan januari s.d desember" -> Let's rename columns for display
-            
-            indo_months = {
-                "January": "Januari", "February": "Februari", "March": "Maret", "April": "April", 
-                "May": "Mei", "June": "Juni", "July": "Juli", "August": "Agustus", 
-                "September": "September", "October": "Oktober", "November": "November", "December": "Desember"
-            }
+            # User instructions: "bulan januari s.d desember" -> rename columns for display
+            indo_months = dict(zip(categories.MONTHS, categories.MONTHS_ID))
             recap_df = recap_df.rename(columns=indo_months)
             
             # Styling function
             def color_paid(val):
-                color = '#90EE90' if val == 'Sudah Bayar' else '' # Light green
+                color = '#90EE90' if val == recap.PAID else '' # Light green
                 return f'background-color: {color}' if color else ''
 
             st.dataframe(
-                recap_df.style.applymap(color_paid, subset=list(indo_months.values())),
+                recap_df.style.map(color_paid, subset=list(indo_months.values())),
                 use_container_width=True,
                 height=500,
                 hide_index=True
@@ -784,13 +779,113 @@ def main():
         st.header("Pengaturan Sistem")
         st.write("Kelola konfigurasi sistem dan data.")
         
-        st.subheader("Database Cloud (Supabase)")
-        st.success("Aplikasi ini sekarang terhubung ke database cloud Supabase.")
-        st.info("Seluruh data Anda tersimpan secara aman di cloud Supabase dan tidak akan hilang meskipun aplikasi direstart.")
-        
-        st.write("**Detail Proyek:**")
-        st.code(f"URL: {st.secrets['SUPABASE_URL']}")
-        st.caption("Gunakan Dashboard Supabase untuk mengelola data secara langsung atau melakukan backup.")
+        if database.BACKEND_NAME == "sqlite":
+            st.subheader("Database Lokal (SQLite)")
+            st.success("Aplikasi ini terhubung ke database lokal SQLite.")
+            st.info("Data tersimpan dalam satu file di server ini. Salin file tersebut secara berkala sebagai backup.")
+            
+            st.write("**Detail Database:**")
+            st.code(f"File: {database.get_setting('SQLITE_PATH', database.DEFAULT_SQLITE_PATH)}")
+            st.caption("Atur DB_BACKEND = \"supabase\" di Streamlit Secrets untuk kembali ke database cloud.")
+        else:
+            st.subheader("Database Cloud (Supabase)")
+            st.success("Aplikasi ini sekarang terhubung ke database cloud Supabase.")
+            st.info("Seluruh data Anda tersimpan secara aman di cloud Supabase dan tidak akan hilang meskipun aplikasi direstart.")
+            
+            st.write("**Detail Proyek:**")
+            st.code(f"URL: {st.secrets['SUPABASE_URL']}")
+            st.caption("Gunakan Dashboard Supabase untuk mengelola data secara langsung atau melakukan backup.")
+
+            conn_stats = database.get_connection_stats()
+            if conn_stats is not None:
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Permintaan HTTP", conn_stats["requests"])
+                c2.metric("Percobaan Ulang", conn_stats["retries"])
+                c3.metric("Gagal", conn_stats["failures"])
+                st.caption("Koneksi ke Supabase dipakai bersama oleh semua pengguna; permintaan yang gagal sementara dicoba ulang otomatis.")
+
+        if st.button("Sambungkan Ulang Database"):
+            if database.reconnect():
+                st.success("Koneksi database dibuka ulang.")
+
+        st.subheader("Tarif SPP")
+        st.caption(f"Tarif berlaku mulai bulan tanggal berlakunya sampai ada tarif baru. Tanpa tarif, SPP dihitung {format_currency(tariffs.DEFAULT_FEE)} per bulan.")
+        tariff_df = database.get_tariffs()
+        if not tariff_df.empty:
+            display_tariffs = pd.DataFrame({
+                "Kelas": tariff_df['class_name'].fillna("Semua Kelas"),
+                "Berlaku Mulai": pd.to_datetime(tariff_df['effective_from']).dt.strftime('%d-%m-%Y'),
+                "Nominal": format_currency_list(tariff_df['amount']),
+            })
+            st.dataframe(display_tariffs, use_container_width=True, hide_index=True)
+
+        with st.form("add_tariff_form", clear_on_submit=True):
+            t1, t2, t3 = st.columns(3)
+            tariff_class = t1.selectbox("Kelas", ["Semua Kelas"] + database.get_class_names())
+            tariff_from = t2.date_input("Berlaku Mulai", datetime.now().date().replace(day=1))
+            tariff_amount = t3.number_input("Nominal per Bulan (Rp)", min_value=0, step=1000, value=int(tariffs.DEFAULT_FEE))
+            if st.form_submit_button("Simpan Tarif"):
+                class_value = None if tariff_class == "Semua Kelas" else tariff_class
+                if database.add_tariff(class_value, tariff_from, tariff_amount):
+                    st.success("Tarif disimpan.")
+                    st.rerun()
+
+        if not tariff_df.empty:
+            labels = {
+                row.id: f"{row.class_name or 'Semua Kelas'} - {pd.Timestamp(row.effective_from):%d-%m-%Y} - {format_currency(row.amount)}"
+                for row in tariff_df.itertuples()
+            }
+            d1, d2 = st.columns([3, 1])
+            tariff_to_delete = d1.selectbox("Hapus Tarif", list(labels), format_func=labels.get)
+            if d2.button("Hapus", key="delete_tariff"):
+                database.delete_tariff(tariff_to_delete)
+                st.rerun()
+
+        st.subheader("Cache Data")
+        stats = database.get_cache_stats()
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Hit", stats["hits"])
+        k2.metric("Miss", stats["misses"])
+        k3.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+        k4.metric("TTL (detik)", f"{stats['ttl']:g}")
+        st.caption("Data dibaca ulang dari database setelah TTL habis atau setiap kali ada perubahan data.")
+        if stats["stale_hits"]:
+            st.caption(f"{stats['stale_hits']} kali data lama ditampilkan karena database tidak dapat dihubungi.")
+        sync_stats = database.get_sync_stats()
+        if sync_stats is not None:
+            st.caption(
+                f"Sinkronisasi inkremental: {sync_stats['rows']} transaksi tersimpan lokal, "
+                f"{sync_stats['last_delta_rows']} baris baru atau berubah pada sinkronisasi terakhir."
+            )
+        queue_stats = database.get_write_queue_stats()
+        if queue_stats is not None:
+            st.caption(
+                f"Antrean penyimpanan: {queue_stats['written']} perubahan tersimpan dalam {queue_stats['batches']} batch, "
+                f"{queue_stats['queued']} menunggu, {queue_stats['failed']} gagal."
+            )
+        if st.button("Kosongkan Cache"):
+            database.clear_cache()
+            st.success("Cache dikosongkan.")
+
+        st.subheader("Kinerja")
+        metrics_df = database.get_metrics()
+        if metrics_df.empty:
+            st.info("Belum ada data kinerja.")
+        else:
+            st.dataframe(
+                metrics_df.rename(columns={
+                    "operation": "Operasi", "calls": "Panggilan", "errors": "Error", "p50_ms": "p50 (ms)",
+                    "p90_ms": "p90 (ms)", "p99_ms": "p99 (ms)", "max_ms": "Maks (ms)", "total_s": "Total (detik)",
+                    "rows_avg": "Rata-rata Baris", "bytes_total": "Byte Diterima",
+                }),
+                use_container_width=True, hide_index=True
+            )
+        st.caption(f"Persentil dari {database.metrics.window} panggilan terakhir per operasi sejak aplikasi dijalankan. Operasi page.* adalah waktu render satu halaman.")
+        m1, m2 = st.columns(2)
+        m1.download_button("Download JSON", database.get_metrics_json, "kinerja.json", "application/json")
+        if m2.button("Reset Data Kinerja"):
+            database.reset_metrics()
+            st.rerun()
 
 if __name__ == '__main__':
     # Initialize DB if needed
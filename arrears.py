@@ -0,0 +1,92 @@
+from datetime import date
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from recap import MONTHS, MONTHLY_FEE, paid_matrix
+from tariffs import fee_matrix
+
+# Arrears (tunggakan): months an active student should have paid by a cutoff
+# date but did not. Each (student, year) is a 12-bit mask, bit m = MONTHS[m],
+# so "due and not paid" is one AND-NOT over the whole school at once.
+
+MONTH_BITS = (1 << np.arange(len(MONTHS))).astype(np.uint16)
+ALL_MONTHS = (1 << len(MONTHS)) - 1
+# Number of set bits for every 12-bit mask
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(ALL_MONTHS + 1)], dtype=np.int64)
+
+ARREARS_COLUMNS = ["student_id", "No Absen", "Nama Siswa", "Kelas", "Bulan Tunggakan", "Jumlah Bulan", "Tunggakan"]
+
+def due_mask(year, cutoff):
+    """Months of `year` that are due by `cutoff`: a month is due from its first day."""
+    if year < cutoff.year:
+        return ALL_MONTHS
+    if year > cutoff.year:
+        return 0
+    return (1 << cutoff.month) - 1
+
+def paid_masks(student_ids, payments, year):
+    """uint16 mask per student of the months paid in `year` (see recap.paid_matrix)."""
+    return paid_matrix(student_ids, payments, year).astype(np.uint16) @ MONTH_BITS
+
+def unpaid_month_names(mask):
+    return [month for m, month in enumerate(MONTHS) if mask >> m & 1]
+
+@lru_cache(maxsize=ALL_MONTHS + 1)
+def _mask_label(mask):
+    """Short month list for a mask, e.g. "Jan, Feb, Mar"; at most 4096 distinct masks."""
+    return ", ".join(month[:3] for month in unpaid_month_names(mask))
+
+def compute_arrears(students, payments, cutoff=None, since_year=None, fee=MONTHLY_FEE):
+    """
+    Arrears of active students from January of `since_year` (default: the
+    cutoff year) up to `cutoff` (default: today). `payments` are
+    payment_status or transaction rows covering those years; `fee` is a flat
+    monthly amount or a tariffs.TariffSchedule.
+    Returns ARREARS_COLUMNS, only students who owe something, worst first.
+    """
+    cutoff = cutoff or date.today()
+    since_year = since_year or cutoff.year
+    if students.empty:
+        return pd.DataFrame(columns=ARREARS_COLUMNS)
+    active = students[students['status'] == 'Active']
+    years = list(range(since_year, cutoff.year + 1))
+    # No months to count when since_year is after the cutoff
+    if active.empty or not years:
+        return pd.DataFrame(columns=ARREARS_COLUMNS)
+
+    # [student, year] masks of months due and not paid
+    unpaid = np.column_stack([
+        np.uint16(due_mask(year, cutoff)) & ~paid_masks(active['id'], payments, year)
+        for year in years
+    ])
+    months_owed = POPCOUNT[unpaid].sum(axis=1)
+    # Rupiah owed: the fee of every unpaid bit, per year from the tariff arrays
+    bits = np.arange(len(MONTHS))
+    amount_owed = sum(
+        (((unpaid[:, i, None] >> bits) & 1) * fee_matrix(fee, active['class_name'], year)).sum(axis=1)
+        for i, year in enumerate(years)
+    )
+    owing = np.flatnonzero(months_owed)
+    if len(owing) == 0:
+        return pd.DataFrame(columns=ARREARS_COLUMNS)
+
+    # Month names only for the students who owe, e.g. "Jan, Feb, Mar"
+    labels = []
+    for row in unpaid[owing]:
+        parts = []
+        for year, mask in zip(years, row.tolist()):
+            if mask:
+                parts.append(f"{_mask_label(mask)} {year}" if len(years) > 1 else _mask_label(mask))
+        labels.append("; ".join(parts))
+
+    owed = active.iloc[owing]
+    result = pd.DataFrame({
+        "student_id": owed['id'].to_numpy(),
+        "No Absen": owed['attendance_number'].fillna("").to_numpy(dtype=object),
+        "Nama Siswa": owed['name'].to_numpy(),
+        "Kelas": owed['class_name'].to_numpy(),
+        "Bulan Tunggakan": labels,
+        "Jumlah Bulan": months_owed[owing],
+        "Tunggakan": amount_owed[owing],
+    })
+    return result.sort_values(["Tunggakan", "Nama Siswa"], ascending=[False, True], kind='stable').reset_index(drop=True)
@@ -0,0 +1,930 @@
+import sqlite3
+import threading
+from supabase import Client
+from categories import INCOME_TYPES, TYPE_CODES, MONTH_CODES, TYPE_INCOME, TYPE_EXPENSE, TYPE_OTHER, sql_case
+import indexes
+import supabase_client
+
+# Storage backends used by database.py.
+# Every backend returns plain Python data (ids, booleans, lists of dicts);
+# database.py owns the pandas conversion and the Streamlit error reporting.
+
+TRANSACTION_COLUMNS = [
+    "id", "student_id", "recipient", "date", "type", "amount",
+    "payment_month", "payment_year", "description",
+    "student_name", "attendance_number",
+]
+# Student columns handed to database.py; client_key (see find_client_keys) stays in the backend
+STUDENT_COLUMNS = ["id", "name", "attendance_number", "class_name", "parent_contact", "status"]
+
+# Transaction columns without the student join, as kept by the incremental mirror
+RAW_TRANSACTION_COLUMNS = TRANSACTION_COLUMNS[:9] + ["row_version"]
+
+# One row per (student, payment year, payment month) with income transactions,
+# kept up to date by database triggers on the transactions table
+PAYMENT_STATUS_COLUMNS = ["student_id", "payment_year", "payment_month", "amount_paid", "tx_count"]
+
+# PostgREST caps responses at 1000 rows by default
+SUPABASE_PAGE_SIZE = 1000
+
+def _date_bound(value):
+    """A date_from/date_to filter value as "YYYY-MM-DD" (dates, datetimes and text)."""
+    return str(value)[:10]
+
+def _like_escape(text):
+    """`text` with LIKE wildcards escaped by backslashes, to match it literally."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class StorageBackend:
+    """Interface shared by all storage engines."""
+
+    name = "base"
+
+    def create_tables(self):
+        pass
+
+    def close(self):
+        """Release connections; the backend is not used afterwards."""
+        pass
+
+    def insert_student(self, data):
+        raise NotImplementedError
+
+    def insert_students(self, rows):
+        """Insert several students in one request; returns their ids in order."""
+        return [self.insert_student(data) for data in rows]
+
+    def update_student(self, student_id, data):
+        raise NotImplementedError
+
+    def delete_student(self, student_id):
+        raise NotImplementedError
+
+    def fetch_students(self):
+        raise NotImplementedError
+
+    # Student filters: a dict with any of
+    #   search      -- case-insensitive substring of the name
+    #   class_name
+    #   status
+
+    def fetch_students_page(self, filters, limit, offset):
+        """One page of students matching `filters`, ordered by name, and the total match count."""
+        raise NotImplementedError
+
+    def fetch_class_names(self):
+        """Distinct class names, sorted."""
+        raise NotImplementedError
+
+    def insert_transaction(self, data):
+        raise NotImplementedError
+
+    def insert_transactions(self, rows):
+        """Insert several transactions atomically; returns their ids in order."""
+        raise NotImplementedError
+
+    def update_transaction(self, transaction_id, data):
+        raise NotImplementedError
+
+    def delete_transaction(self, transaction_id):
+        raise NotImplementedError
+
+    def fetch_transactions(self):
+        """Return flat transaction rows (see TRANSACTION_COLUMNS), newest date first."""
+        raise NotImplementedError
+
+    # Transaction filters: a dict with any of
+    #   type           -- one type or a list of types
+    #   student_id
+    #   payment_month
+    #   payment_year
+    #   date_from, date_to  -- inclusive "YYYY-MM-DD" bounds on date
+    # Filters are combined with AND and run in the database.
+
+    def fetch_transactions_page(self, filters, limit, offset):
+        """
+        One page of flat transaction rows matching `filters`, newest first
+        (date, then id), and the total number of matching rows.
+        """
+        raise NotImplementedError
+
+    def query_transactions(self, filters):
+        """All flat transaction rows matching `filters`, newest first."""
+        raise NotImplementedError
+
+    def iter_transactions(self, filters, chunk_size=1000):
+        """
+        Same rows as query_transactions, yielded as lists of at most
+        chunk_size rows so large reports never hold the whole result.
+        """
+        raise NotImplementedError
+
+    def fetch_transaction_columns(self, filters):
+        """
+        The rows of query_transactions as {column: list of values} over
+        TRANSACTION_COLUMNS, so large results never become a dict per row.
+        """
+        rows = self.query_transactions(filters)
+        return {column: [row[column] for row in rows] for column in TRANSACTION_COLUMNS}
+
+    def fetch_transaction_filter_options(self):
+        """
+        Values for report filter dropdowns: {"payment_month": [...],
+        "payment_year": [...], "type": [...], "min_date": str, "max_date": str}.
+        """
+        raise NotImplementedError
+
+    def find_client_keys(self, table, keys):
+        """
+        {client_key: id} of the rows of `table` ("students" or "transactions")
+        inserted with any of `keys`, the idempotency keys of queued writes.
+        """
+        raise NotImplementedError
+
+    # --- Aggregates ---
+
+    def count_students(self, status=None):
+        raise NotImplementedError
+
+    def income_by_year(self):
+        """[{"payment_year", "total"}] over INCOME_TYPES, payment_year may be None."""
+        raise NotImplementedError
+
+    def expense_by_description(self):
+        """[{"description", "total"}] over EXPENSE_TYPES, description may be None."""
+        raise NotImplementedError
+
+    # --- Incremental sync ---
+
+    # Every insert and update stamps the row with a new row_version taken from
+    # a counter that never goes back, so "changed since" is a single comparison.
+
+    def probe_transactions(self):
+        """Cheap change check: {"count", "max_id", "max_version"} of the transactions table."""
+        raise NotImplementedError
+
+    def fetch_transactions_delta(self, since_version):
+        """Raw rows (RAW_TRANSACTION_COLUMNS) inserted or updated after since_version."""
+        raise NotImplementedError
+
+    def fetch_transaction_ids(self):
+        raise NotImplementedError
+
+    def fetch_transactions_by_ids(self, ids):
+        """Raw rows (RAW_TRANSACTION_COLUMNS) of the transactions with the given ids."""
+        raise NotImplementedError
+
+    # --- Payment status ---
+
+    def fetch_payment_status(self, year=None):
+        """payment_status rows (PAYMENT_STATUS_COLUMNS), optionally for one payment year."""
+        raise NotImplementedError
+
+    # --- Tariffs ---
+    # Tuition fee per class (None = all classes) from an effective date, see tariffs.py
+
+    def fetch_tariffs(self):
+        """Tariff rows {"id", "class_name", "effective_from", "amount"}, oldest first."""
+        raise NotImplementedError
+
+    def insert_tariff(self, data):
+        raise NotImplementedError
+
+    def delete_tariff(self, tariff_id):
+        raise NotImplementedError
+
+
+class SupabaseBackend(StorageBackend):
+    """Cloud storage on Supabase (Postgres via PostgREST)."""
+
+    name = "supabase"
+
+    def __init__(self, url, key, http_client=None):
+        self.url = url
+        # Pooled, retrying HTTP session shared by every thread using this backend
+        self.http_client = http_client or supabase_client.create_http_client()
+        self.client: Client = supabase_client.connect(url, key, self.http_client)
+
+    def close(self):
+        self.http_client.close()
+
+    def create_tables(self):
+        # In Supabase, tables are best created via the SQL Editor in the dashboard
+        # (see supabase_schema.sql).
+        pass
+
+    def insert_student(self, data):
+        response = self.client.table("students").insert(data).execute()
+        if response.data:
+            return response.data[0]['id']
+        return None
+
+    def insert_students(self, rows):
+        # One multi-row INSERT: a single round trip, and all-or-nothing
+        response = self.client.table("students").insert(rows).execute()
+        return [row['id'] for row in response.data or []]
+
+    def update_student(self, student_id, data):
+        response = self.client.table("students").update(data).eq("id", student_id).execute()
+        return len(response.data) > 0
+
+    def delete_student(self, student_id):
+        response = self.client.table("students").delete().eq("id", student_id).execute()
+        return len(response.data) > 0
+
+    def fetch_students(self):
+        response = self.client.table("students").select(", ".join(STUDENT_COLUMNS)).order("name").execute()
+        return response.data or []
+
+    def fetch_students_page(self, filters, limit, offset):
+        filters = filters or {}
+        query = self.client.table("students").select(", ".join(STUDENT_COLUMNS), count="exact")
+        if filters.get("search"):
+            # Backslash is the default LIKE escape in Postgres
+            query = query.ilike("name", f"%{_like_escape(filters['search'])}%")
+        for column in ("class_name", "status"):
+            if filters.get(column):
+                query = query.eq(column, filters[column])
+        response = query.order("name").order("id").range(offset, offset + limit - 1).execute()
+        return response.data or [], response.count or 0
+
+    def fetch_class_names(self):
+        # View defined in supabase_schema.sql
+        response = self.client.table("student_classes").select("class_name").execute()
+        return [row["class_name"] for row in response.data or []]
+
+    def insert_transaction(self, data):
+        response = self.client.table("transactions").insert(data).execute()
+        if response.data:
+            return response.data[0]['id']
+        return None
+
+    def insert_transactions(self, rows):
+        # A multi-row INSERT is a single statement, so PostgREST applies it all or nothing
+        response = self.client.table("transactions").insert(rows).execute()
+        return [row['id'] for row in response.data or []]
+
+    def update_transaction(self, transaction_id, data):
+        response = self.client.table("transactions").update(data).eq("id", transaction_id).execute()
+        return len(response.data) > 0
+
+    def delete_transaction(self, transaction_id):
+        response = self.client.table("transactions").delete().eq("id", transaction_id).execute()
+        return len(response.data) > 0
+
+    @staticmethod
+    def _flatten(items):
+        data = []
+        for item in items:
+            row = {
+                "id": item["id"],
+                "student_id": item["student_id"],
+                "recipient": item["recipient"],
+                "date": item["date"],
+                "type": item["type"],
+                "amount": item["amount"],
+                "payment_month": item["payment_month"],
+                "payment_year": item["payment_year"],
+                "description": item["description"]
+            }
+
+            # Handle Joined Student Data
+            if item.get("students"):
+                row["student_name"] = item["students"]["name"]
+                row["attendance_number"] = item["students"]["attendance_number"]
+            else:
+                # If student is null, it's an expense with a recipient
+                row["student_name"] = item["recipient"] if item["recipient"] else "-"
+                row["attendance_number"] = "-"
+
+            data.append(row)
+        return data
+
+    @staticmethod
+    def _columns(items):
+        """Columnar _flatten: one list per TRANSACTION_COLUMNS field, read straight from the response."""
+        columns = {name: [item[name] for item in items] for name in TRANSACTION_COLUMNS[:-2]}  # all but the student fields
+        students = [item.get("students") for item in items]
+        # Without a joined student it's an expense with a recipient
+        columns["student_name"] = [
+            student["name"] if student else (recipient or "-")
+            for student, recipient in zip(students, columns["recipient"])
+        ]
+        columns["attendance_number"] = [student["attendance_number"] if student else "-" for student in students]
+        return columns
+
+    def fetch_transactions(self):
+        return self.query_transactions({})
+
+    @staticmethod
+    def _apply_filters(query, filters):
+        filters = filters or {}
+        if filters.get("type"):
+            types = filters["type"]
+            query = query.eq("type", types) if isinstance(types, str) else query.in_("type", list(types))
+        for column in ("student_id", "payment_month", "payment_year"):
+            if filters.get(column) is not None:
+                query = query.eq(column, filters[column])
+        if filters.get("date_from"):
+            query = query.gte("date", _date_bound(filters["date_from"]))
+        if filters.get("date_to"):
+            query = query.lte("date", _date_bound(filters["date_to"]))
+        return query
+
+    def fetch_transactions_page(self, filters, limit, offset):
+        query = self.client.table("transactions").select("*, students(name, attendance_number)", count="exact")
+        query = self._apply_filters(query, filters)
+        response = (
+            query.order("date", desc=True).order("id", desc=True)
+            .range(offset, offset + limit - 1).execute()
+        )
+        return self._flatten(response.data or []), response.count or 0
+
+    def query_transactions(self, filters):
+        rows = []
+        for chunk in self.iter_transactions(filters, SUPABASE_PAGE_SIZE):
+            rows.extend(chunk)
+        return rows
+
+    def _pages(self, filters, chunk_size):
+        """Raw response pages of matching transactions with their student, newest first."""
+        # Keyset on (date, id) instead of offsets, so late chunks cost the same as early ones
+        chunk_size = min(chunk_size, SUPABASE_PAGE_SIZE)
+        last = None
+        while True:
+            query = self._apply_filters(self.client.table("transactions").select("*, students(name, attendance_number)"), filters)
+            if last is not None:
+                query = query.or_(f"date.lt.{last['date']},and(date.eq.{last['date']},id.lt.{last['id']})")
+            page = query.order("date", desc=True).order("id", desc=True).limit(chunk_size).execute().data or []
+            if page:
+                yield page
+            if len(page) < chunk_size:
+                return
+            last = page[-1]
+
+    def iter_transactions(self, filters, chunk_size=SUPABASE_PAGE_SIZE):
+        for page in self._pages(filters, chunk_size):
+            yield self._flatten(page)
+
+    def fetch_transaction_columns(self, filters):
+        columns = {name: [] for name in TRANSACTION_COLUMNS}
+        for page in self._pages(filters, SUPABASE_PAGE_SIZE):
+            for name, values in self._columns(page).items():
+                columns[name].extend(values)
+        return columns
+
+    def fetch_transaction_filter_options(self):
+        # View defined in supabase_schema.sql: one (kind, value) row per distinct value
+        response = self.client.table("transaction_filter_options").select("kind, value").execute()
+        options = {"payment_month": [], "payment_year": [], "type": [], "min_date": None, "max_date": None}
+        for row in response.data or []:
+            if row["kind"] in ("min_date", "max_date"):
+                options[row["kind"]] = row["value"]
+            elif row["kind"] == "payment_year":
+                options["payment_year"].append(int(row["value"]))
+            else:
+                options[row["kind"]].append(row["value"])
+        return options
+
+    def find_client_keys(self, table, keys):
+        found = {}
+        # Keys go into the URL, so look them up a hundred at a time
+        for start in range(0, len(keys), 100):
+            response = self.client.table(table).select("id, client_key").in_("client_key", keys[start:start + 100]).execute()
+            found.update((row["client_key"], row["id"]) for row in response.data or [])
+        return found
+
+    def count_students(self, status=None):
+        query = self.client.table("students").select("id", count="exact", head=True)
+        if status:
+            query = query.eq("status", status)
+        return query.execute().count or 0
+
+    def income_by_year(self):
+        # View defined in supabase_schema.sql
+        return self.client.table("income_by_year").select("payment_year, total").execute().data or []
+
+    def expense_by_description(self):
+        return self.client.table("expense_by_description").select("description, total").execute().data or []
+
+    def _fetch_pages(self, build_query, after_id=0):
+        """Keyset-paginate a query on id so results are not cut at the row cap."""
+        rows = []
+        while True:
+            page = build_query().gt("id", after_id).order("id").limit(SUPABASE_PAGE_SIZE).execute().data or []
+            rows.extend(page)
+            if len(page) < SUPABASE_PAGE_SIZE:
+                return rows
+            after_id = page[-1]["id"]
+
+    def probe_transactions(self):
+        table = self.client.table("transactions")
+        head = table.select("id", count="exact").order("id", desc=True).limit(1).execute()
+        latest = table.select("row_version").order("row_version", desc=True, nullsfirst=False).limit(1).execute()
+        return {
+            "count": head.count or 0,
+            "max_id": head.data[0]["id"] if head.data else 0,
+            "max_version": latest.data[0]["row_version"] if latest.data else 0,
+        }
+
+    def fetch_transactions_delta(self, since_version):
+        columns = ", ".join(RAW_TRANSACTION_COLUMNS)
+        table = self.client.table("transactions")
+        return self._fetch_pages(lambda: table.select(columns).gt("row_version", since_version))
+
+    def fetch_transaction_ids(self):
+        table = self.client.table("transactions")
+        return [row["id"] for row in self._fetch_pages(lambda: table.select("id"))]
+
+    def fetch_transactions_by_ids(self, ids):
+        columns = ", ".join(RAW_TRANSACTION_COLUMNS)
+        ids = list(ids)
+        rows = []
+        # Ids go into the URL, so fetch a hundred at a time
+        for start in range(0, len(ids), 100):
+            rows.extend(self.client.table("transactions").select(columns).in_("id", ids[start:start + 100]).execute().data or [])
+        return rows
+
+    def fetch_payment_status(self, year=None):
+        # Table maintained by triggers in supabase_schema.sql, keyed by (payment_year, student_id, payment_month)
+        rows = []
+        offset = 0
+        while True:
+            query = self.client.table("payment_status").select(", ".join(PAYMENT_STATUS_COLUMNS))
+            if year is not None:
+                query = query.eq("payment_year", year)
+            page = (
+                query.order("payment_year").order("student_id").order("payment_month")
+                .range(offset, offset + SUPABASE_PAGE_SIZE - 1).execute().data or []
+            )
+            rows.extend(page)
+            if len(page) < SUPABASE_PAGE_SIZE:
+                return rows
+            offset += SUPABASE_PAGE_SIZE
+
+    def fetch_tariffs(self):
+        return self.client.table("tariffs").select("*").order("effective_from").order("id").execute().data or []
+
+    def insert_tariff(self, data):
+        response = self.client.table("tariffs").insert(data).execute()
+        if response.data:
+            return response.data[0]['id']
+        return None
+
+    def delete_tariff(self, tariff_id):
+        response = self.client.table("tariffs").delete().eq("id", tariff_id).execute()
+        return len(response.data) > 0
+
+
+class SQLiteBackend(StorageBackend):
+    """Local single-file storage, same schema as student_finance.db."""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            class_name TEXT NOT NULL,
+            parent_contact TEXT,
+            status TEXT DEFAULT 'Active',
+            attendance_number TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER,
+            recipient TEXT,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            amount REAL NOT NULL,
+            payment_month TEXT,
+            payment_year INTEGER,
+            description TEXT,
+            row_version INTEGER,
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+        CREATE INDEX IF NOT EXISTS idx_students_status ON students(status);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type);
+        CREATE INDEX IF NOT EXISTS idx_transactions_payment_period ON transactions(payment_year, payment_month);
+        CREATE INDEX IF NOT EXISTS idx_students_name ON students(name);
+        CREATE INDEX IF NOT EXISTS idx_students_class_name ON students(class_name, name);
+
+        CREATE TABLE IF NOT EXISTS tariffs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_name TEXT,
+            effective_from TEXT NOT NULL,
+            amount REAL NOT NULL
+        );
+    """
+
+    # row_version for incremental sync; the counter lives in its own table so
+    # versions of deleted rows are never handed out again
+    SYNC_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sync_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO sync_counters (name, value)
+            SELECT 'transactions', COALESCE(MAX(row_version), 0) FROM transactions;
+
+        CREATE INDEX IF NOT EXISTS idx_transactions_row_version ON transactions(row_version);
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_insert AFTER INSERT ON transactions
+        BEGIN
+            UPDATE sync_counters SET value = value + 1 WHERE name = 'transactions';
+            UPDATE transactions SET row_version = (SELECT value FROM sync_counters WHERE name = 'transactions')
+            WHERE id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_update AFTER UPDATE ON transactions
+        WHEN NEW.row_version IS OLD.row_version
+        BEGIN
+            UPDATE sync_counters SET value = value + 1 WHERE name = 'transactions';
+            UPDATE transactions SET row_version = (SELECT value FROM sync_counters WHERE name = 'transactions')
+            WHERE id = NEW.id;
+        END;
+    """
+
+    # A transaction counts towards payment_status when it is income for a
+    # student and a payment month; {row} is NEW, OLD or the table name
+    _PAID_ROW = (
+        "{row}.type IN (" + ", ".join(f"'{t}'" for t in INCOME_TYPES) + ")"
+        " AND {row}.student_id IS NOT NULL AND {row}.payment_year IS NOT NULL AND {row}.payment_month IS NOT NULL"
+    )
+
+    PAYMENT_STATUS_SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS payment_status (
+            payment_year INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            payment_month TEXT NOT NULL,
+            amount_paid REAL NOT NULL DEFAULT 0,
+            tx_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (payment_year, student_id, payment_month)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_payment_status_student ON payment_status(student_id, payment_year);
+
+        CREATE TRIGGER IF NOT EXISTS trg_payment_status_insert AFTER INSERT ON transactions
+        WHEN {_PAID_ROW.format(row="NEW")}
+        BEGIN
+            INSERT INTO payment_status (payment_year, student_id, payment_month, amount_paid, tx_count)
+            VALUES (NEW.payment_year, NEW.student_id, NEW.payment_month, NEW.amount, 1)
+            ON CONFLICT (payment_year, student_id, payment_month)
+            DO UPDATE SET amount_paid = amount_paid + excluded.amount_paid, tx_count = tx_count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_payment_status_delete AFTER DELETE ON transactions
+        WHEN {_PAID_ROW.format(row="OLD")}
+        BEGIN
+            UPDATE payment_status SET amount_paid = amount_paid - OLD.amount, tx_count = tx_count - 1
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month;
+            DELETE FROM payment_status
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month
+              AND tx_count <= 0;
+        END;
+
+        -- An update moves the row out of its old (student, year, month) and into the new one
+        CREATE TRIGGER IF NOT EXISTS trg_payment_status_update_old
+        AFTER UPDATE OF student_id, type, amount, payment_month, payment_year ON transactions
+        WHEN {_PAID_ROW.format(row="OLD")}
+        BEGIN
+            UPDATE payment_status SET amount_paid = amount_paid - OLD.amount, tx_count = tx_count - 1
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month;
+            DELETE FROM payment_status
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month
+              AND tx_count <= 0;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_payment_status_update_new
+        AFTER UPDATE OF student_id, type, amount, payment_month, payment_year ON transactions
+        WHEN {_PAID_ROW.format(row="NEW")}
+        BEGIN
+            INSERT INTO payment_status (payment_year, student_id, payment_month, amount_paid, tx_count)
+            VALUES (NEW.payment_year, NEW.student_id, NEW.payment_month, NEW.amount, 1)
+            ON CONFLICT (payment_year, student_id, payment_month)
+            DO UPDATE SET amount_paid = amount_paid + excluded.amount_paid, tx_count = tx_count + 1;
+        END;
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by all Streamlit sessions; sqlite3 objects are
+        # not thread-safe on their own, so every statement runs under the lock.
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def _execute(self, sql, params=()):
+        with self.lock, self.conn:
+            return self.conn.execute(sql, params)
+
+    def _insert(self, table, data):
+        columns = ", ".join(data)
+        placeholders = ", ".join("?" for _ in data)
+        cursor = self._execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(data.values()))
+        return cursor.lastrowid
+
+    def _insert_many(self, table, rows):
+        """Insert rows in a single SQLite transaction; returns their ids in order."""
+        ids = []
+        with self.lock, self.conn:
+            for data in rows:
+                columns = ", ".join(data)
+                placeholders = ", ".join("?" for _ in data)
+                cursor = self.conn.execute(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", tuple(data.values()))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def _update(self, table, row_id, data):
+        assignments = ", ".join(f"{col} = ?" for col in data)
+        cursor = self._execute(f"UPDATE {table} SET {assignments} WHERE id = ?", (*data.values(), row_id))
+        return cursor.rowcount > 0
+
+    def _ensure_column(self, table, column, definition):
+        # table_xinfo also lists generated columns
+        columns = [row[1] for row in self.conn.execute(f"PRAGMA table_xinfo({table})")]
+        if column not in columns:
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    # SQLite has no DATE type: dates are ISO "YYYY-MM-DD" text, which sorts
+    # and range-scans on idx_transactions_date like a date. Older rows with a
+    # time part or in dd/mm/yyyy are rewritten to that form on startup.
+    NORMALIZE_DATES = """
+        UPDATE transactions SET date = CASE
+            WHEN date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]?*' THEN substr(date, 1, 10)
+            WHEN date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+                THEN substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+            ELSE date
+        END
+        WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+    """
+
+    def create_tables(self):
+        with self.lock, self.conn:
+            self.conn.executescript(self.SCHEMA)
+            # Databases created before incremental sync: number existing rows by id
+            self._ensure_column("transactions", "row_version", "INTEGER")
+            self.conn.execute("UPDATE transactions SET row_version = id WHERE row_version IS NULL")
+            self.conn.executescript(self.SYNC_SCHEMA)
+            self.conn.execute(self.NORMALIZE_DATES)
+            # Idempotency keys of queued writes (writequeue.py), unique when set
+            for table in ("students", "transactions"):
+                self._ensure_column(table, "client_key", "TEXT")
+                self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_client_key ON {table}(client_key)")
+            # Integer codes of the type and payment_month labels (see categories.py),
+            # derived by SQLite so every writer gets them for free
+            self._ensure_column("transactions", "type_code", f"INTEGER GENERATED ALWAYS AS ({sql_case('type', TYPE_CODES, TYPE_OTHER)}) VIRTUAL")
+            self._ensure_column("transactions", "month_code", f"INTEGER GENERATED ALWAYS AS ({sql_case('payment_month', MONTH_CODES)}) VIRTUAL")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_type_code ON transactions(type_code, payment_year)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_period_code ON transactions(payment_year, month_code)")
+            indexes.apply(self.conn)
+            # Databases created before payment_status: fill it once from the transactions
+            has_status = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'payment_status'").fetchone()
+            self.conn.executescript(self.PAYMENT_STATUS_SCHEMA)
+            if not has_status:
+                self._rebuild_payment_status()
+
+    def insert_student(self, data):
+        return self._insert("students", data)
+
+    def insert_students(self, rows):
+        return self._insert_many("students", rows)
+
+    def update_student(self, student_id, data):
+        return self._update("students", student_id, data)
+
+    def delete_student(self, student_id):
+        # Mirror the ON DELETE CASCADE of the Supabase schema
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM transactions WHERE student_id = ?", (student_id,))
+            cursor = self.conn.execute("DELETE FROM students WHERE id = ?", (student_id,))
+        return cursor.rowcount > 0
+
+    def fetch_students(self):
+        columns = ", ".join(STUDENT_COLUMNS)
+        return self._query(f"SELECT {columns} FROM students ORDER BY name")
+
+    def fetch_students_page(self, filters, limit, offset):
+        filters = filters or {}
+        clauses, params = [], []
+        if filters.get("search"):
+            # LIKE is case-insensitive for ASCII in SQLite
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{_like_escape(filters['search'])}%")
+        for column in ("class_name", "status"):
+            if filters.get(column):
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        total = self._query(f"SELECT COUNT(*) AS n FROM students{where}", params)[0]["n"]
+        columns = ", ".join(STUDENT_COLUMNS)
+        rows = self._query(f"SELECT {columns} FROM students{where} ORDER BY name, id LIMIT ? OFFSET ?", (*params, limit, offset))
+        return rows, total
+
+    def fetch_class_names(self):
+        return [row["class_name"] for row in self._query("SELECT DISTINCT class_name FROM students ORDER BY class_name")]
+
+    def insert_transaction(self, data):
+        return self._insert("transactions", data)
+
+    def insert_transactions(self, rows):
+        return self._insert_many("transactions", rows)
+
+    def update_transaction(self, transaction_id, data):
+        return self._update("transactions", transaction_id, data)
+
+    def delete_transaction(self, transaction_id):
+        cursor = self._execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        return cursor.rowcount > 0
+
+    TRANSACTION_SELECT = """
+        SELECT t.id, t.student_id, t.recipient, t.date, t.type, t.amount,
+               t.payment_month, t.payment_year, t.description,
+               CASE
+                   WHEN s.id IS NOT NULL THEN s.name
+                   ELSE COALESCE(NULLIF(t.recipient, ''), '-')
+               END AS student_name,
+               CASE WHEN s.id IS NOT NULL THEN s.attendance_number ELSE '-' END AS attendance_number
+        FROM transactions t
+        LEFT JOIN students s ON s.id = t.student_id
+    """
+
+    def fetch_transactions(self):
+        return self._query(self.TRANSACTION_SELECT + " ORDER BY t.date DESC")
+
+    @staticmethod
+    def _where(filters):
+        """WHERE clause and parameters for transaction filters (table alias t)."""
+        filters = filters or {}
+        clauses, params = [], []
+        if filters.get("type"):
+            types = [filters["type"]] if isinstance(filters["type"], str) else list(filters["type"])
+            clauses.append(f"t.type IN ({', '.join('?' for _ in types)})")
+            params.extend(types)
+        for column in ("student_id", "payment_month", "payment_year"):
+            if filters.get(column) is not None:
+                clauses.append(f"t.{column} = ?")
+                params.append(filters[column])
+        if filters.get("date_from"):
+            clauses.append("t.date >= ?")
+            params.append(_date_bound(filters["date_from"]))
+        if filters.get("date_to"):
+            clauses.append("t.date <= ?")
+            params.append(_date_bound(filters["date_to"]))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def fetch_transactions_page(self, filters, limit, offset):
+        where, params = self._where(filters)
+        total = self._query(f"SELECT COUNT(*) AS n FROM transactions t{where}", params)[0]["n"]
+        rows = self._query(
+            self.TRANSACTION_SELECT + where + " ORDER BY t.date DESC, t.id DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        )
+        return rows, total
+
+    def query_transactions(self, filters):
+        where, params = self._where(filters)
+        return self._query(self.TRANSACTION_SELECT + where + " ORDER BY t.date DESC, t.id DESC", params)
+
+    def fetch_transaction_columns(self, filters):
+        where, params = self._where(filters)
+        with self.lock:
+            # Plain tuples instead of sqlite3.Row, transposed into one tuple per column
+            cursor = self.conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(self.TRANSACTION_SELECT + where + " ORDER BY t.date DESC, t.id DESC", params).fetchall()
+            names = [column[0] for column in cursor.description]
+        values = zip(*rows) if rows else ([] for _ in names)
+        return dict(zip(names, values))
+
+    def iter_transactions(self, filters, chunk_size=1000):
+        # Keyset on (date, id): each chunk is a short indexed query, and the
+        # connection lock is not held while the caller works on a chunk
+        where, params = self._where(filters)
+        last = None
+        while True:
+            clause, chunk_params = where, list(params)
+            if last is not None:
+                clause += (" AND " if where else " WHERE ") + "(t.date, t.id) < (?, ?)"
+                chunk_params += [last["date"], last["id"]]
+            rows = self._query(
+                self.TRANSACTION_SELECT + clause + " ORDER BY t.date DESC, t.id DESC LIMIT ?",
+                (*chunk_params, chunk_size)
+            )
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1]
+
+    def fetch_transaction_filter_options(self):
+        def distinct(column):
+            sql = f"SELECT DISTINCT {column} AS value FROM transactions WHERE {column} IS NOT NULL"
+            return [row["value"] for row in self._query(sql)]
+
+        bounds = self._query("SELECT MIN(date) AS min_date, MAX(date) AS max_date FROM transactions")[0]
+        return {
+            "payment_month": distinct("payment_month"),
+            "payment_year": distinct("payment_year"),
+            "type": distinct("type"),
+            "min_date": bounds["min_date"],
+            "max_date": bounds["max_date"],
+        }
+
+    def find_client_keys(self, table, keys):
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._query(f"SELECT id, client_key FROM {table} WHERE client_key IN ({placeholders})", tuple(chunk))
+            found.update((row["client_key"], row["id"]) for row in rows)
+        return found
+
+    def count_students(self, status=None):
+        if status:
+            return self._query("SELECT COUNT(*) AS n FROM students WHERE status = ?", (status,))[0]["n"]
+        return self._query("SELECT COUNT(*) AS n FROM students")[0]["n"]
+
+    def income_by_year(self):
+        return self._query("""
+            SELECT payment_year, SUM(amount) AS total FROM transactions
+            WHERE type_code = ? GROUP BY payment_year
+        """, (TYPE_INCOME,))
+
+    def expense_by_description(self):
+        return self._query("""
+            SELECT description, SUM(amount) AS total FROM transactions
+            WHERE type_code = ? GROUP BY description
+        """, (TYPE_EXPENSE,))
+
+    def probe_transactions(self):
+        return self._query("""
+            SELECT COUNT(*) AS count, COALESCE(MAX(id), 0) AS max_id, COALESCE(MAX(row_version), 0) AS max_version
+            FROM transactions
+        """)[0]
+
+    def fetch_transactions_delta(self, since_version):
+        columns = ", ".join(RAW_TRANSACTION_COLUMNS)
+        return self._query(f"SELECT {columns} FROM transactions WHERE row_version > ? ORDER BY id", (since_version,))
+
+    def fetch_transaction_ids(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT id FROM transactions")]
+
+    def fetch_transactions_by_ids(self, ids):
+        columns = ", ".join(RAW_TRANSACTION_COLUMNS)
+        ids = list(ids)
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows.extend(self._query(f"SELECT {columns} FROM transactions WHERE id IN ({placeholders})", tuple(chunk)))
+        return rows
+
+    def fetch_payment_status(self, year=None):
+        columns = ", ".join(PAYMENT_STATUS_COLUMNS)
+        if year is not None:
+            return self._query(f"SELECT {columns} FROM payment_status WHERE payment_year = ?", (int(year),))
+        return self._query(f"SELECT {columns} FROM payment_status")
+
+    def fetch_tariffs(self):
+        return self._query("SELECT id, class_name, effective_from, amount FROM tariffs ORDER BY effective_from, id")
+
+    def insert_tariff(self, data):
+        return self._insert("tariffs", data)
+
+    def delete_tariff(self, tariff_id):
+        cursor = self._execute("DELETE FROM tariffs WHERE id = ?", (tariff_id,))
+        return cursor.rowcount > 0
+
+    def _rebuild_payment_status(self):
+        self.conn.execute("DELETE FROM payment_status")
+        self.conn.execute(f"""
+            INSERT INTO payment_status (payment_year, student_id, payment_month, amount_paid, tx_count)
+            SELECT payment_year, student_id, payment_month, SUM(amount), COUNT(*) FROM transactions
+            WHERE {self._PAID_ROW.format(row="transactions")}
+            GROUP BY payment_year, student_id, payment_month
+        """)
+
+
+def create_backend(name, url=None, key=None, path=None, http_client=None):
+    """
+    Build the backend selected by the DB_BACKEND setting. Supabase uses
+    http_client (see supabase_client.create_http_client) or a default one.
+    """
+    name = (name or "supabase").lower()
+    if name == "supabase":
+        return SupabaseBackend(url, key, http_client)
+    if name == "sqlite":
+        backend = SQLiteBackend(path)
+        backend.create_tables()
+        return backend
+    raise ValueError(f"Unknown DB_BACKEND '{name}' (expected 'supabase' or 'sqlite')")
@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import backends
+import synthetic
+from categories import encode_transactions, transaction_frame
+
+# Benchmark for decoding transactions into the get_transactions frame: the
+# old path (a flat dict per row, then pd.DataFrame and a date parse) against
+# the columnar path (column lists into typed arrays), both followed by
+# encode_transactions. The Supabase case decodes response-shaped rows with a
+# nested students object in memory; the SQLite case reads a seeded database.
+#
+#   python bench_decode.py --rows 50000
+
+def supabase_items(count, rng):
+    """`count` rows shaped like the PostgREST response of transactions with students(...)."""
+    students = synthetic.students(max(count // 12, 1), rng)
+    student_ids = list(range(1, len(students) + 1))
+    rows = []
+    year = 2020
+    while len(rows) < count:
+        rows += synthetic.payments(student_ids, year, rng) + synthetic.expenses(year, rng)
+        year += 1
+    items = []
+    for i, row in enumerate(rows[:count], start=1):
+        student = students[row["student_id"] - 1] if row.get("student_id") else None
+        items.append({
+            "id": i, "student_id": row.get("student_id"), "recipient": row.get("recipient"), "date": row["date"],
+            "type": row["type"], "amount": row["amount"], "payment_month": row["payment_month"],
+            "payment_year": row["payment_year"], "description": row["description"], "row_version": i,
+            "created_at": f"{row['date']}T08:00:00+00:00",
+            "students": {"name": student["name"], "attendance_number": student["attendance_number"]} if student else None,
+        })
+    return items
+
+def legacy_frame(rows):
+    df = pd.DataFrame(rows, columns=backends.TRANSACTION_COLUMNS)
+    df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+    return encode_transactions(df)
+
+def columnar_frame(columns):
+    return encode_transactions(transaction_frame(columns))
+
+def measure(build, repeat):
+    """Median seconds, tracemalloc peak bytes (separate run) and the frame's deep memory size."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = build()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(samples), peak, int(frame.memory_usage(deep=True).sum())
+
+def report(label, legacy, columnar):
+    (t_old, peak_old, size_old), (t_new, peak_new, size_new) = legacy, columnar
+    print(f"{label:<10} {'legacy':>8} {t_old:>8.3f} {peak_old / 1e6:>9.1f} {size_old / 1e6:>9.1f}")
+    print(f"{'':<10} {'columnar':>8} {t_new:>8.3f} {peak_new / 1e6:>9.1f} {size_new / 1e6:>9.1f}"
+          f"   {t_old / t_new:.1f}x faster, peak {1 - peak_new / peak_old:.0%} lower")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decoding transactions into a DataFrame")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print(f"{args.rows} transactions")
+    print(f"{'source':<10} {'path':>8} {'seconds':>8} {'peak MB':>9} {'frame MB':>9}")
+
+    items = supabase_items(args.rows, rng)
+    flatten, columns = backends.SupabaseBackend._flatten, backends.SupabaseBackend._columns
+    report("supabase",
+           measure(lambda: legacy_frame(flatten(items)), args.repeat),
+           measure(lambda: columnar_frame(columns(items)), args.repeat))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "bench.db"))
+        backend.insert_transactions([{key: item[key] for key in backends.TRANSACTION_COLUMNS[:-2] if key != "id"} for item in items])
+        report("sqlite",
+               measure(lambda: legacy_frame(backend.query_transactions({})), args.repeat),
+               measure(lambda: columnar_frame(backend.fetch_transaction_columns({})), args.repeat))
+        backend.conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import backends
+import indexes
+import synthetic
+from categories import INCOME_TYPES
+
+# Benchmark for the composite indexes in indexes.py: seeds a temporary SQLite
+# ledger (students x years of monthly payments plus school expenses), then
+# times the hot queries on the old single-column indexes and again after
+# indexes.apply.
+#
+#   python bench_indexes.py --students 2000 --years 5 --plans
+
+def hot_queries(backend, student_ids, years, rng):
+    """(name, callable) for the queries behind the Laporan, Riwayat and Dashboard pages."""
+    def student():
+        return rng.choice(student_ids)
+
+    def year():
+        return rng.choice(years)
+
+    def paid_months():
+        sql = f"""
+            SELECT payment_month, SUM(amount) FROM transactions
+            WHERE student_id = ? AND payment_year = ? AND type IN ({', '.join('?' for _ in INCOME_TYPES)})
+            GROUP BY payment_month
+        """
+        return backend._query(sql, (student(), year(), *INCOME_TYPES))
+
+    return [
+        ("laporan year+type", lambda: backend.fetch_transactions_page({"payment_year": year(), "type": "Pengeluaran"}, 25, 0)),
+        ("income total year", lambda: backend._query(
+            f"SELECT COUNT(*), SUM(amount) FROM transactions WHERE payment_year = ? AND type IN ({', '.join('?' for _ in INCOME_TYPES)})",
+            (year(), *INCOME_TYPES))),
+        ("student history", lambda: backend.fetch_transactions_page({"student_id": student(), "payment_year": year()}, 25, 0)),
+        ("student paid months", paid_months),
+        ("latest page", lambda: backend.fetch_transactions_page({}, 25, 0)),
+        ("income by year", backend.income_by_year),
+    ]
+
+def time_queries(queries, repeat):
+    """Median milliseconds per query over `repeat` runs."""
+    timings = {}
+    for name, run in queries:
+        run()  # warm the page cache
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+PLAN_SQL = {
+    "laporan year+type": ("SELECT COUNT(*) FROM transactions t WHERE t.type IN (?) AND t.payment_year = ?", ("Pengeluaran", 2024)),
+    "student paid months": ("SELECT payment_month, SUM(amount) FROM transactions WHERE student_id = ? AND payment_year = ? AND type IN (?) GROUP BY payment_month", (1, 2024, "Pemasukan")),
+}
+
+def plans(backend):
+    return {name: " / ".join(row[-1] for row in backend.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+            for name, (sql, params) in PLAN_SQL.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the composite transaction indexes")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--first-year", type=int, default=2020)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--plans", action="store_true", help="print the query plans before and after")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        student_ids, years = synthetic.seed(backend, args.students, args.years, args.first_year, args.seed)
+        rows = backend.probe_transactions()["count"]
+        print(f"{rows} transactions for {args.students} students seeded in {time.perf_counter() - start:.1f}s")
+
+        queries = hot_queries(backend, student_ids, years, rng)
+        results = {}
+        for label, migrate in (("before", indexes.revert), ("after", indexes.apply)):
+            with backend.lock, backend.conn:
+                migrate(backend.conn)
+            if args.plans:
+                for name, plan in plans(backend).items():
+                    print(f"  {label:>6} {name}: {plan}")
+            results[label] = time_queries(queries, args.repeat)
+
+        print(f"{'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name, _ in queries:
+            before, after = results["before"][name], results["after"][name]
+            print(f"{name:<22} {before:>10.3f} {after:>10.3f} {before / after:>7.1f}x")
+        backend.conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import backends
+import reports
+import synthetic
+from categories import MONTHS
+
+# Benchmark for the streaming reports: seeds a temporary SQLite database
+# with one year of monthly payments and times each format per chunk size.
+#
+#   python bench_report.py --students 500 --chunks 250 1000 5000
+
+FORMATS = {"pdf": reports.transactions_pdf, "csv": reports.transactions_csv, "xlsx": reports.transactions_xlsx}
+
+def run(render, backend, filters, chunk_size):
+    # Timed and memory-traced separately: tracemalloc slows rendering down several times
+    start = time.perf_counter()
+    data = render(backend.iter_transactions(filters, chunk_size))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    render(backend.iter_transactions(filters, chunk_size))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, len(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming reports")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[250, 1000, 5000])
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=["pdf", "csv", "xlsx"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "bench.db"))
+        # Every month paid, no expenses: students x 12 rows
+        synthetic.seed(backend, args.students, years=1, first_year=args.year, unpaid_rate=0, expenses_per_month=0)
+        rows = args.students * len(MONTHS)
+        print(f"{rows} transactions, font: {reports.find_font() or 'Helvetica (Latin-1)'}")
+        print(f"{'format':>6} {'chunk':>8} {'seconds':>8} {'rows/s':>8} {'peak MB':>8} {'KB':>8}")
+        for fmt in args.formats:
+            for chunk_size in args.chunks:
+                elapsed, peak, size = run(FORMATS[fmt], backend, {"payment_year": args.year}, chunk_size)
+                print(f"{fmt:>6} {chunk_size:>8} {elapsed:>8.2f} {rows / elapsed:>8.0f} {peak / 1e6:>8.1f} {size / 1e3:>8.0f}")
+        backend.conn.close()
+
+if __name__ == "__main__":
+    main()
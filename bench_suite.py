@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+import pandas as pd
+import arrears
+import backends
+import database
+import recap
+import synthetic
+from categories import INCOME_TYPES
+
+# End-to-end benchmark of the hot paths, run through database.py against a
+# temporary SQLite database filled by synthetic.seed (no network). Each case
+# runs with an empty read cache, like the first page load after a write.
+# Results are JSON; --compare flags cases slower than a saved baseline.
+#
+#   python bench_suite.py --students 2000 --years 5 --output bench.json
+#   python bench_suite.py --compare bench.json
+
+def cases(student_ids, years, workdir):
+    """(name, setup, run): setup() builds the arguments for run() outside the timing."""
+    year = years[-1]
+    cutoff = date(year, 12, 31)
+    import_path = os.path.join(workdir, "import.db")
+    sheet = synthetic.upload_sheet(len(student_ids), random.Random(len(student_ids)))
+
+    def fresh_backend():
+        # Bulk import writes students, so every run starts from an empty database
+        if database.backend is not None and getattr(database.backend, "path", None) == import_path:
+            database.backend.conn.close()
+        if os.path.exists(import_path):
+            os.remove(import_path)
+        database.backend = backends.create_backend("sqlite", path=import_path)
+        return sheet
+
+    no_setup = lambda: None
+    return [
+        ("dashboard.summary", no_setup, lambda _: database.get_dashboard_summary()),
+        ("dashboard.arrears", no_setup, lambda _: arrears.compute_arrears(
+            database.get_all_students(), database.get_payment_status(year), cutoff=cutoff,
+            since_year=years[0], fee=database.get_tariff_schedule())),
+        ("recap.build", no_setup, lambda _: recap.build_recap(
+            database.get_all_students(), database.get_payment_status(year), year, fee=database.get_tariff_schedule())),
+        ("laporan.filter", no_setup, lambda _: database.query_transactions({"payment_year": year, "type": list(INCOME_TYPES)})),
+        ("laporan.page", no_setup, lambda _: database.get_transactions_page({"payment_year": year}, 1, 25)[0]),
+        ("transactions.all", no_setup, lambda _: database.get_transactions()),
+        ("export.csv", no_setup, lambda _: database.transaction_report_csv({"payment_year": year})),
+        ("export.xlsx", no_setup, lambda _: database.transaction_report_xlsx({"payment_year": year})),
+        ("export.pdf", no_setup, lambda _: database.transaction_report_pdf({"payment_year": year})),
+        ("bulk_import", fresh_backend, lambda sheet: database.add_students_bulk(sheet)),
+    ]
+
+def _size(result):
+    """Rows of a frame, bytes of a file, or None."""
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    return None
+
+def run_case(backend, setup, run, repeat):
+    samples, size = [], None
+    for _ in range(repeat):
+        argument = setup()
+        database.clear_cache()
+        start = time.perf_counter()
+        result = run(argument)
+        samples.append(time.perf_counter() - start)
+        size = _size(result)
+    if database.backend is not backend:
+        database.backend.conn.close()
+        database.backend = backend
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "runs": repeat,
+        "size": size,
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+def compare(results, baseline, tolerance):
+    """Print median timings against a baseline; returns the names of cases that got slower."""
+    regressions = []
+    print(f"{'case':<20} {'baseline s':>11} {'now s':>9} {'ratio':>7}")
+    for name, result in results["cases"].items():
+        before = baseline.get("cases", {}).get(name)
+        if before is None:
+            print(f"{name:<20} {'-':>11} {result['median_s']:>9.4f} {'new':>7}")
+            continue
+        ratio = result["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<20} {before['median_s']:>11.4f} {result['median_s']:>9.4f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on a synthetic school")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--first-year", type=int, default=2022)
+    parser.add_argument("--expenses-per-month", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run only these cases")
+    parser.add_argument("--output", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    original_backend = database.backend
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        student_ids, years = synthetic.seed(backend, args.students, args.years, args.first_year, args.seed,
+                                            expenses_per_month=args.expenses_per_month)
+        seeded = time.perf_counter() - start
+        results = {
+            "environment": environment(),
+            "scale": {
+                "students": args.students, "years": years, "seed": args.seed,
+                "transactions": backend.probe_transactions()["count"], "seed_s": seeded,
+            },
+            "cases": {},
+        }
+        database.backend = backend
+        database.reset_metrics()
+        try:
+            for name, setup, run in cases(student_ids, years, tmp):
+                if args.only and name not in args.only:
+                    continue
+                results["cases"][name] = run_case(backend, setup, run, args.repeat)
+                print(f"{name:<20} {results['cases'][name]['median_s']:.4f}s", file=sys.stderr)
+            # Per-operation breakdown of the cases above (see metrics.py)
+            results["operations"] = database.metrics.snapshot()
+        finally:
+            database.backend = original_backend
+            backend.conn.close()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
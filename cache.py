@@ -0,0 +1,101 @@
+import functools
+import threading
+import time
+
+class ReadCache:
+    """
+    Process-wide cache for read queries.
+    Entries expire after `ttl` seconds and are dropped explicitly by writes,
+    so Streamlit reruns only hit the backend when something has changed.
+    If `serve_stale(error)` is true for a failed load (the database is
+    unreachable), the last value loaded for the key is returned instead.
+    """
+
+    def __init__(self, ttl=60, serve_stale=None):
+        self.ttl = ttl
+        self.serve_stale = serve_stale
+        self.lock = threading.Lock()
+        self.entries = {}      # key -> (loaded_at, value)
+        self.last_good = {}    # key -> last loaded value, kept through invalidations
+        self.generations = {}  # key name -> bumped on every invalidation
+        self.epoch = 0         # bumped when the whole cache is cleared
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def _name(key):
+        # Parameterised reads use tuple keys such as ("payment_status", 2024);
+        # they are invalidated together by their name, the first element
+        return key[0] if isinstance(key, tuple) else key
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = (self.epoch, self.generations.get(self._name(key), 0))
+
+        # Load outside the lock so a slow query doesn't block other keys.
+        # Exceptions propagate and nothing is cached.
+        try:
+            value = loader()
+        except Exception as e:
+            with self.lock:
+                if self.serve_stale is not None and key in self.last_good and self.serve_stale(e):
+                    self.stale_hits += 1
+                    return self.last_good[key]
+            raise
+
+        with self.lock:
+            if self.serve_stale is not None:
+                self.last_good[key] = value
+            # A write that happened while we were loading makes this value stale
+            if self.ttl > 0 and (self.epoch, self.generations.get(self._name(key), 0)) == generation:
+                self.entries[key] = (now, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given key names, or everything when called without arguments."""
+        with self.lock:
+            if not keys:
+                self.entries.clear()
+                self.epoch += 1
+            for key in keys:
+                for cached in [k for k in self.entries if self._name(k) == key]:
+                    del self.entries[cached]
+                self.generations[key] = self.generations.get(key, 0) + 1
+
+    def invalidates(self, *keys):
+        """Decorator for write functions: invalidate `keys` after every call."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.invalidate(*keys)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "ttl": self.ttl,
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "stale_hits": self.stale_hits,
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.stale_hits = 0
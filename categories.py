@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# Canonical vocabularies for transactions.type and transactions.payment_month.
+# The text columns keep whatever label was entered; the database derives small
+# integer codes from them (type_code, month_code) and pandas works on codes.
+
+# Transaction types counted as money in / money out
+INCOME_TYPES = ("Income", "Tuition", "Pemasukan")
+EXPENSE_TYPES = ("Expense", "Pengeluaran")
+
+TYPE_OTHER = 0
+TYPE_INCOME = 1
+TYPE_EXPENSE = 2
+TYPE_CODES = {**{label: TYPE_INCOME for label in INCOME_TYPES}, **{label: TYPE_EXPENSE for label in EXPENSE_TYPES}}
+
+# Payment months are stored in English; month_code is 1-12
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+MONTHS_ID = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September", "Oktober", "November", "Desember"]
+MONTH_CODES = {month: code for code, month in enumerate(MONTHS, start=1)}
+
+TYPE_DTYPE = pd.CategoricalDtype(list(INCOME_TYPES) + list(EXPENSE_TYPES))
+MONTH_DTYPE = pd.CategoricalDtype(MONTHS, ordered=True)
+
+def type_code(label):
+    return TYPE_CODES.get(label, TYPE_OTHER)
+
+def month_code(month):
+    """1-12 for an English month name, None otherwise."""
+    return MONTH_CODES.get(month)
+
+def sql_case(column, codes, default="NULL"):
+    """SQL CASE expression mapping text labels of `column` to their codes."""
+    whens = " ".join(f"WHEN '{label}' THEN {code}" for label, code in codes.items())
+    return f"CASE {column} {whens} ELSE {default} END"
+
+def _categorical(values, dtype):
+    """Categorical of `values` that keeps labels outside the vocabulary as extra categories."""
+    current = getattr(values, "dtype", None)
+    if isinstance(current, pd.CategoricalDtype) and list(current.categories[:len(dtype.categories)]) == list(dtype.categories):
+        return values  # already encoded, e.g. by transaction_frame
+    values = pd.Series(values, dtype=object)
+    extra = sorted(set(values.dropna()) - set(dtype.categories))
+    if extra:
+        dtype = pd.CategoricalDtype(list(dtype.categories) + extra, ordered=dtype.ordered)
+    return values.astype(dtype)
+
+# Explicit dtypes of transaction frames; other columns keep pandas' inference
+INT_COLUMNS = ("id", "student_id", "payment_year")
+CATEGORY_COLUMNS = {"type": TYPE_DTYPE, "payment_month": MONTH_DTYPE}
+
+def transaction_frame(columns):
+    """
+    Transaction DataFrame built one column at a time from a mapping of
+    column -> values (a dict of lists or a DataFrame): Int64 ids and
+    payment_year, float64 amount, datetime64 date (NaT if unparseable) and
+    Categorical type and payment_month.
+    """
+    data = {}
+    for name, values in columns.items():
+        if name in INT_COLUMNS:
+            data[name] = pd.array(values, dtype="Int64")
+        elif name == "amount":
+            data[name] = np.asarray(values, dtype=np.float64)
+        elif name == "date":
+            data[name] = pd.to_datetime(values, format='ISO8601', errors='coerce')
+        elif name in CATEGORY_COLUMNS:
+            data[name] = _categorical(values, CATEGORY_COLUMNS[name]).array
+        else:
+            data[name] = values if len(values) else np.array([], dtype=object)
+    return pd.DataFrame(data)
+
+def encode_transactions(df):
+    """
+    Transaction frame with `type` and `payment_month` as Categoricals plus
+    integer columns: type_code (TYPE_*) and month_no (1-12, <NA> if unset).
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    df['type'] = _categorical(df['type'], TYPE_DTYPE)
+    df['payment_month'] = _categorical(df['payment_month'], MONTH_DTYPE)
+    type_lookup = np.array([type_code(c) for c in df['type'].cat.categories] + [TYPE_OTHER], dtype=np.int8)
+    df['type_code'] = type_lookup[df['type'].cat.codes.to_numpy()]
+    months = month_index(df['payment_month'])
+    df['month_no'] = pd.arrays.IntegerArray((months + 1).astype(np.int8), mask=months < 0)
+    return df
+
+def month_index(months):
+    """0-11 month position of each value, -1 for anything that is not a month name."""
+    if isinstance(months.dtype, pd.CategoricalDtype):
+        # Category position -> month position, once per category instead of per row
+        lookup = np.array([MONTH_CODES.get(c, 0) - 1 for c in months.cat.categories] + [-1])
+        return lookup[months.cat.codes.to_numpy()]
+    return pd.Index(MONTHS).get_indexer(months)
+
+def income_mask(types):
+    """Boolean array: which values are income types."""
+    if isinstance(types.dtype, pd.CategoricalDtype):
+        lookup = np.array([c in INCOME_TYPES for c in types.cat.categories] + [False])
+        return lookup[types.cat.codes.to_numpy()]
+    return types.isin(INCOME_TYPES).to_numpy()
@@ -1,167 +1,925 @@
+import atexit
+import os
 import pandas as pd
 from datetime import datetime
 import streamlit as st
-from supabase import create_client, Client
+import backends
+import supabase_client
+from categories import MONTHS, encode_transactions, transaction_frame
+from cache import ReadCache
+from metrics import Metrics, METRIC_COLUMNS
+from tariffs import TariffSchedule, TARIFF_COLUMNS
+from sync import TransactionMirror
+import reports
+from formatting import format_currency
+import parallel
+from writequeue import WriteQueue
+from journal import WriteJournal
 
-# Initialize Supabase client
+# Default file for the local SQLite backend
+DEFAULT_SQLITE_PATH = 'student_finance.db'
+
+def get_setting(name, default=None):
+    """Read a setting from Streamlit Secrets, falling back to environment variables."""
+    try:
+        return st.secrets[name]
+    except Exception:
+        return os.environ.get(name, default)
+
+# Initialize storage backend
+# DB_BACKEND selects "supabase" (default) or "sqlite".
+# Supabase needs SUPABASE_URL and SUPABASE_KEY, SQLite uses SQLITE_PATH (default: DEFAULT_SQLITE_PATH).
 # These should be set in Streamlit Secrets or .streamlit/secrets.toml
-try:
-    url: str = st.secrets["SUPABASE_URL"]
-    key: str = st.secrets["SUPABASE_KEY"]
-    supabase: Client = create_client(url, key)
-except Exception as e:
-    st.error(f"Supabase Configuration Error: {e}")
-    st.info("Pastikan SUPABASE_URL dan SUPABASE_KEY sudah diatur di Streamlit Secrets.")
+BACKEND_NAME = str(get_setting("DB_BACKEND", "supabase")).lower()
+
+@st.cache_resource(show_spinner=False, on_release=lambda backend: backend.close())
+def _connect(name, url=None, key=None, path=None):
+    """
+    The backend for one configuration, shared by every session and thread
+    of the process. Supabase requests go through a pooled keep-alive HTTP
+    client; SUPABASE_TIMEOUT / SUPABASE_CONNECT_TIMEOUT (seconds),
+    SUPABASE_MAX_CONNECTIONS, SUPABASE_MAX_KEEPALIVE, SUPABASE_RETRIES and
+    SUPABASE_BACKOFF (seconds) tune it.
+    """
+    http_client = None
+    if name == "supabase":
+        http_client = supabase_client.create_http_client(
+            timeout=float(get_setting("SUPABASE_TIMEOUT", 30)),
+            connect_timeout=float(get_setting("SUPABASE_CONNECT_TIMEOUT", 5)),
+            max_connections=int(get_setting("SUPABASE_MAX_CONNECTIONS", 20)),
+            max_keepalive=int(get_setting("SUPABASE_MAX_KEEPALIVE", 10)),
+            retries=int(get_setting("SUPABASE_RETRIES", 3)),
+            backoff=float(get_setting("SUPABASE_BACKOFF", 0.5)),
+        )
+    return backends.create_backend(name, url=url, key=key, path=path, http_client=http_client)
+
+def _open_backend():
+    """The configured backend, or None after reporting why it could not be opened."""
+    try:
+        if BACKEND_NAME == "sqlite":
+            return _connect("sqlite", path=get_setting("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+        return _connect(BACKEND_NAME, url=st.secrets["SUPABASE_URL"], key=st.secrets["SUPABASE_KEY"])
+    except Exception as e:
+        if BACKEND_NAME == "sqlite":
+            st.error(f"SQLite Configuration Error: {e}")
+        else:
+            st.error(f"Supabase Configuration Error: {e}")
+            st.info("Pastikan SUPABASE_URL dan SUPABASE_KEY sudah diatur di Streamlit Secrets.")
+    return None
+
+backend = _open_backend()
+
+# Process-wide read cache shared by all sessions.
+# CACHE_TTL (seconds) bounds staleness for changes made outside this app; 0 disables caching.
+# While the database is unreachable the last loaded copy is served instead.
+read_cache = ReadCache(ttl=float(get_setting("CACHE_TTL", 60)), serve_stale=supabase_client.is_unreachable)
+
+# Timing of every operation below and of the page sections in app.py, shown
+# on the Pengaturan page. METRICS = "off" disables recording; METRICS_WINDOW
+# is the number of recent calls per operation kept for the percentiles.
+metrics = Metrics(
+    window=int(get_setting("METRICS_WINDOW", 500)),
+    enabled=str(get_setting("METRICS", "on")).lower() not in ("off", "0", "false"),
+)
+
+# SYNC_MODE = "incremental" keeps a local copy of the transactions table and
+# only fetches rows added or changed since the last sync ("full" refetches everything).
+# SYNC_LAG_VERSIONS row versions below the last one seen are read again on
+# every sync, for writes that committed after a later version was read.
+SYNC_MODE = str(get_setting("SYNC_MODE", "full")).lower()
+mirror = TransactionMirror(
+    backend, lag_versions=int(get_setting("SYNC_LAG_VERSIONS", 100)),
+) if SYNC_MODE == "incremental" and backend is not None else None
+
+# Cache keys made stale by each kind of queued write once it is saved
+WRITE_INVALIDATES = {
+    "add_transactions": ("transactions", "dashboard", "transaction_filter_options", "payment_status"),
+    "update_transaction": ("transactions", "dashboard", "transaction_filter_options", "payment_status"),
+    "add_student": ("students", "dashboard", "student_classes"),
+    "update_student": ("students", "transactions", "dashboard", "student_classes"),
+    "delete_transaction": ("transactions", "dashboard", "transaction_filter_options", "payment_status"),
+    "delete_student": ("students", "transactions", "dashboard", "student_classes", "transaction_filter_options", "payment_status"),
+}
+
+def _invalidate_written(kinds):
+    read_cache.invalidate(*{key for kind in kinds for key in WRITE_INVALIDATES[kind]})
+
+# Data entry forms write through a background queue (writequeue.py): they
+# return at once and the pending rows are shown on top of the cached frames.
+# WRITE_QUEUE = "off" writes synchronously. Every queued write is first saved
+# in the local WRITE_JOURNAL (journal.py), so writes made while the database
+# is unreachable are sent when it is back, also after a restart. Failed writes
+# stay in the journal until retried or dismissed on the Transaksi/Siswa pages.
+WRITE_QUEUE = str(get_setting("WRITE_QUEUE", "on")).lower() not in ("off", "0", "false")
+write_queue = WriteQueue(
+    backend,
+    journal=WriteJournal(get_setting("WRITE_JOURNAL", "write_journal.db")),
+    batch_size=int(get_setting("WRITE_BATCH_SIZE", 200)),
+    on_flush=_invalidate_written,
+    metrics=metrics,
+) if WRITE_QUEUE and backend is not None else None
+if write_queue is not None:
+    # Save what is still queued when the server stops
+    atexit.register(write_queue.close)
+
+def _wait_for_queued_writes(timeout=30):
+    if write_queue is not None:
+        write_queue.flush(timeout)
+
+# PARALLEL_FETCH = "off" runs the reads passed to fetch_together one after another
+PARALLEL_FETCH = str(get_setting("PARALLEL_FETCH", "on")).lower() not in ("off", "0", "false")
+
+def get_cache_stats():
+    """Hit/miss counters of the read cache."""
+    return read_cache.stats()
+
+def get_sync_stats():
+    """State of the incremental transaction mirror, or None in full sync mode."""
+    return mirror.stats() if mirror is not None else None
+
+def get_metrics():
+    """Rolling timings per operation and page section (metrics.METRIC_COLUMNS), slowest first."""
+    return pd.DataFrame(metrics.snapshot(), columns=METRIC_COLUMNS)
+
+def get_metrics_json():
+    """The same timings as a JSON document, also written to the metrics log."""
+    metrics.log_snapshot()
+    return metrics.to_json()
 
+def reset_metrics():
+    metrics.reset()
+
+def clear_cache():
+    """Drop all cached reads, e.g. after editing data directly in Supabase."""
+    read_cache.invalidate()
+    if mirror is not None:
+        mirror.reset()
+
+def reconnect():
+    """
+    Close the shared backend (HTTP pool or SQLite connection) and open a
+    new one, e.g. after changing secrets. Returns True if it is connected.
+    """
+    global backend
+    _connect.clear()
+    backend = _open_backend()
+    if mirror is not None:
+        mirror.backend = backend
+    if write_queue is not None and backend is not None:
+        write_queue.backend = backend
+    clear_cache()
+    return backend is not None
+
+def get_connection_stats():
+    """Requests, retries and failures of the Supabase HTTP pool; None for SQLite."""
+    http_client = getattr(backend, "http_client", None)
+    return supabase_client.pool_stats(http_client) if http_client is not None else None
+
+def fetch_together(*calls):
+    """
+    Run independent reads concurrently and return their results in order:
+        students, fee = database.fetch_together(get_all_students, get_tariff_schedule)
+    Each call keeps its own error handling; the wait is that of the slowest.
+    """
+    if not PARALLEL_FETCH:
+        return tuple(call() for call in calls)
+    return parallel.gather(*calls)
+
+@metrics.timed()
 def create_tables():
     """
-    Note: In Supabase, tables are best created via the SQL Editor in the dashboard.
-    This function is kept for compatibility but doesn't do anything.
+    Create the tables for the local SQLite backend.
+    In Supabase, tables are best created via the SQL Editor in the dashboard
+    (see supabase_schema.sql), so this is a no-op there.
     """
-    pass
+    if backend is not None:
+        backend.create_tables()
 
+def _student_data(name, attendance_number, class_name, parent_contact, status):
+    return {
+        "name": name,
+        "attendance_number": attendance_number,
+        "class_name": class_name,
+        "parent_contact": parent_contact,
+        "status": status
+    }
+
+@metrics.timed()
+@read_cache.invalidates("students", "dashboard", "student_classes")
 def add_student(name, attendance_number, class_name, parent_contact, status='Active'):
-    """Add a new student to Supabase."""
-    try:
-        data = {
-            "name": name,
-            "attendance_number": attendance_number,
-            "class_name": class_name,
-            "parent_contact": parent_contact,
-            "status": status
-        }
-        response = supabase.table("students").insert(data).execute()
-        if response.data:
-            return response.data[0]['id']
+    """Add a new student."""
+    try:
+        data = _student_data(name, attendance_number, class_name, parent_contact, status)
+        return backend.insert_student(data)
     except Exception as e:
         st.error(f"Error adding student: {e}")
     return None
 
+# Bulk upload: Excel columns and how many rows go into one insert request
+UPLOAD_COLUMNS = ['Nama', 'Absen', 'Kelas', 'Kontak']
+BULK_CHUNK_SIZE = int(get_setting("BULK_CHUNK_SIZE", 500))
+
+def _cell_text(series):
+    """Excel cells as text: numbers read as float lose their '.0', blanks become None."""
+    if pd.api.types.is_numeric_dtype(series):
+        numbers = series
+    else:
+        # Mixed column: only actual numbers are converted ("01" keeps its zero)
+        is_number = series.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool))
+        numbers = pd.to_numeric(series.where(is_number), errors='coerce')
+    text = series.astype(str).str.strip().astype(object)
+    whole = numbers.notna() & (numbers % 1 == 0)
+    text[whole] = numbers[whole].astype('int64').astype(str)
+    return text.where(series.notna(), None)
+
+def normalize_student_upload(df):
+    """
+    Turn an uploaded sheet (UPLOAD_COLUMNS) into student rows.
+    Returns (rows, skipped): a DataFrame with the students table columns, indexed
+    like `df`, and the index labels of rows missing Nama or Kelas.
+    """
+    valid = df['Nama'].notna() & df['Kelas'].notna()
+    upload = df[valid]
+    rows = pd.DataFrame({
+        "name": upload['Nama'].astype(str).str.strip(),
+        "attendance_number": _cell_text(upload['Absen']),
+        "class_name": _cell_text(upload['Kelas']),
+        "parent_contact": _cell_text(upload['Kontak']),
+        "status": "Active",
+    }, index=upload.index)
+    return rows, df.index[~valid]
+
+@metrics.timed()
+@read_cache.invalidates("students", "dashboard", "student_classes")
+def add_students_bulk(df, chunk_size=None):
+    """
+    Add all students of an uploaded sheet in chunked multi-row inserts.
+    Returns one result row per sheet row: row (index in `df`), name, status
+    ("Berhasil", "Gagal" or "Dilewati"), id and error.
+    A failing chunk is retried row by row so only the bad rows are reported.
+    """
+    missing = [col for col in UPLOAD_COLUMNS if col not in df.columns]
+    if missing:
+        st.error(f"Format Kolom Salah! Kolom tidak ditemukan: {', '.join(missing)}")
+        return pd.DataFrame(columns=["row", "name", "status", "id", "error"])
+
+    rows, skipped = normalize_student_upload(df)
+    results = [
+        {"row": idx, "name": None, "status": "Dilewati", "id": None, "error": "Nama atau Kelas kosong"}
+        for idx in skipped
+    ]
+
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+    records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+    labels = list(rows.index)
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        chunk_labels = labels[start:start + chunk_size]
+        try:
+            ids = backend.insert_students(chunk)
+            for idx, data, student_id in zip(chunk_labels, chunk, ids):
+                results.append({"row": idx, "name": data["name"], "status": "Berhasil", "id": student_id, "error": None})
+        except Exception:
+            for idx, data in zip(chunk_labels, chunk):
+                try:
+                    student_id = backend.insert_student(data)
+                    results.append({"row": idx, "name": data["name"], "status": "Berhasil", "id": student_id, "error": None})
+                except Exception as e:
+                    results.append({"row": idx, "name": data["name"], "status": "Gagal", "id": None, "error": str(e)})
+
+    return pd.DataFrame(results, columns=["row", "name", "status", "id", "error"]).sort_values("row", kind="stable").reset_index(drop=True)
+
+@metrics.timed()
+@read_cache.invalidates("students", "transactions", "dashboard", "student_classes")
 def update_student(student_id, name, attendance_number, class_name, parent_contact, status):
-    """Update existing student details in Supabase."""
-    try:
-        data = {
-            "name": name,
-            "attendance_number": attendance_number,
-            "class_name": class_name,
-            "parent_contact": parent_contact,
-            "status": status
-        }
-        response = supabase.table("students").update(data).eq("id", student_id).execute()
-        return len(response.data) > 0
+    """Update existing student details."""
+    try:
+        data = _student_data(name, attendance_number, class_name, parent_contact, status)
+        return backend.update_student(student_id, data)
     except Exception as e:
         st.error(f"Error updating student: {e}")
     return False
 
+@metrics.timed()
+@read_cache.invalidates("students", "transactions", "dashboard", "student_classes", "transaction_filter_options", "payment_status")
 def delete_student(student_id):
-    """Delete a student from Supabase."""
+    """Delete a student."""
     try:
-        response = supabase.table("students").delete().eq("id", student_id).execute()
-        return len(response.data) > 0
+        # Queued edits of this row must not land after it is gone
+        _wait_for_queued_writes()
+        return backend.delete_student(student_id)
     except Exception as e:
         st.error(f"Error deleting student: {e}")
     return False
 
+@metrics.timed()
+def _load_students():
+    records = backend.fetch_students()
+    return pd.DataFrame(records) if records else pd.DataFrame()
+
+@metrics.timed()
 def get_all_students():
-    """Retrieve all students from Supabase."""
+    """Retrieve all students, ordered by name."""
     try:
-        response = supabase.table("students").select("*").order("name").execute()
-        if response.data:
-            return pd.DataFrame(response.data)
+        # Callers add columns to the frame, so never hand out the cached object
+        return _with_pending_students(read_cache.get_or_load("students", _load_students).copy())
     except Exception as e:
         st.error(f"Error fetching students: {e}")
     return pd.DataFrame()
 
+@metrics.timed()
+def get_students_page(filters=None, page=1, page_size=25):
+    """
+    One page of students matching `filters` (search, class_name, status),
+    ordered by name. Returns (DataFrame, total matching rows).
+    """
+    try:
+        offset = (max(int(page), 1) - 1) * page_size
+        records, total = backend.fetch_students_page(filters or {}, page_size, offset)
+        students = pd.DataFrame(records)
+        # Queued edits and deletes show at once; queued new students are listed by get_pending_writes
+        changed = _apply_changes(students, write_queue.pending(), "students") if write_queue is not None else None
+        if changed is not None:
+            students = pd.DataFrame(changed, columns=students.columns)
+        return students, total
+    except Exception as e:
+        if supabase_client.is_unreachable(e):
+            return _page(_filter_students(get_all_students(), filters or {}), page, page_size)
+        st.error(f"Error fetching students: {e}")
+    return pd.DataFrame(), 0
+
+@metrics.timed()
+def get_class_names():
+    """Distinct class names for filter dropdowns."""
+    try:
+        return list(read_cache.get_or_load("student_classes", backend.fetch_class_names))
+    except Exception as e:
+        st.error(f"Error fetching classes: {e}")
+    return []
+
+def iso_date(value):
+    """A date, datetime or date text as the "YYYY-MM-DD" stored in transactions.date."""
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def _transaction_data(student_id, date, type_, amount, payment_month, payment_year, description, recipient=None):
+    return {
+        "student_id": int(student_id) if student_id is not None else None,
+        "recipient": recipient,
+        "date": iso_date(date),
+        "type": type_,
+        "amount": float(amount),
+        "payment_month": payment_month,
+        "payment_year": int(payment_year) if payment_year else None,
+        "description": description
+    }
+
+def _transaction_update_data(date, type_, amount, payment_month, payment_year, description):
+    return {
+        "date": iso_date(date),
+        "type": type_,
+        "amount": float(amount),
+        "payment_month": payment_month,
+        "payment_year": int(payment_year) if payment_year else None,
+        "description": description
+    }
+
+@metrics.timed()
+@read_cache.invalidates("transactions", "dashboard", "transaction_filter_options", "payment_status")
 def add_transaction(student_id, date, type_, amount, payment_month, payment_year, description, recipient=None):
-    """Add a new transaction to Supabase."""
-    try:
-        data = {
-            "student_id": student_id,
-            "recipient": recipient,
-            "date": date,
-            "type": type_,
-            "amount": float(amount),
-            "payment_month": payment_month,
-            "payment_year": int(payment_year) if payment_year else None,
-            "description": description
-        }
+    """Add a new transaction."""
+    try:
+        data = _transaction_data(student_id, date, type_, amount, payment_month, payment_year, description, recipient)
         # Postgres expects student_id as BIGINT, but can be NULL
         if student_id is None:
             del data['student_id'] # or set to None explicitly
         
-        response = supabase.table("transactions").insert(data).execute()
-        if response.data:
-            return response.data[0]['id']
+        return backend.insert_transaction(data)
     except Exception as e:
         st.error(f"Error adding transaction: {e}")
     return None
 
+@metrics.timed()
+@read_cache.invalidates("transactions", "dashboard", "transaction_filter_options", "payment_status")
+def add_transactions(transactions):
+    """
+    Add several transactions in one write, e.g. a payment covering several months.
+    `transactions` is a list of dicts with the add_transaction arguments as keys
+    (student_id, date, type_, amount, payment_month, payment_year, description, recipient).
+    The batch is atomic: returns the new ids in order, or None if nothing was saved.
+    """
+    try:
+        # Every row carries the same keys, as required for a multi-row insert
+        rows = [_transaction_data(**t) for t in transactions]
+        if not rows:
+            return []
+        return backend.insert_transactions(rows)
+    except Exception as e:
+        st.error(f"Error adding transactions: {e}")
+    return None
+
+@metrics.timed()
+@read_cache.invalidates("transactions", "dashboard", "transaction_filter_options", "payment_status")
 def update_transaction(transaction_id, date, type_, amount, payment_month, payment_year, description):
-    """Update an existing transaction in Supabase."""
-    try:
-        data = {
-            "date": date,
-            "type": type_,
-            "amount": float(amount),
-            "payment_month": payment_month,
-            "payment_year": int(payment_year) if payment_year else None,
-            "description": description
-        }
-        response = supabase.table("transactions").update(data).eq("id", transaction_id).execute()
-        return len(response.data) > 0
+    """Update an existing transaction."""
+    try:
+        data = _transaction_update_data(date, type_, amount, payment_month, payment_year, description)
+        return backend.update_transaction(transaction_id, data)
     except Exception as e:
         st.error(f"Error updating transaction: {e}")
     return False
 
+@metrics.timed()
+@read_cache.invalidates("transactions", "dashboard", "transaction_filter_options", "payment_status")
 def delete_transaction(transaction_id):
-    """Delete a transaction from Supabase."""
+    """Delete a transaction."""
     try:
-        response = supabase.table("transactions").delete().eq("id", transaction_id).execute()
-        return len(response.data) > 0
+        # Queued edits of this row must not land after it is gone
+        _wait_for_queued_writes()
+        return backend.delete_transaction(transaction_id)
     except Exception as e:
         st.error(f"Error deleting transaction: {e}")
     return False
 
+# --- Queued writes (data entry forms) ---
+
+def queue_student(name, attendance_number, class_name, parent_contact, status='Active'):
+    """
+    Add a student through the write queue. Returns the temporary id it is
+    listed under until saved (the saved id with WRITE_QUEUE off), or None.
+    """
+    if write_queue is None:
+        return add_student(name, attendance_number, class_name, parent_contact, status)
+    try:
+        temp_id = write_queue.temp_id()
+        data = _student_data(name, attendance_number, class_name, parent_contact, status)
+        write_queue.submit("add_student", {"data": data, "temp_id": temp_id})
+        return temp_id
+    except Exception as e:
+        st.error(f"Error adding student: {e}")
+    return None
+
+def queue_student_update(student_id, name, attendance_number, class_name, parent_contact, status):
+    """Update a student through the write queue."""
+    if write_queue is None:
+        return update_student(student_id, name, attendance_number, class_name, parent_contact, status)
+    try:
+        data = _student_data(name, attendance_number, class_name, parent_contact, status)
+        write_queue.submit("update_student", {"id": int(student_id), "data": data})
+        return True
+    except Exception as e:
+        st.error(f"Error updating student: {e}")
+    return False
+
+def queue_student_delete(student_id):
+    """Delete a student (and their transactions) through the write queue."""
+    if write_queue is None:
+        return delete_student(student_id)
+    try:
+        write_queue.submit("delete_student", {"id": int(student_id)})
+        return True
+    except Exception as e:
+        st.error(f"Error deleting student: {e}")
+    return False
+
+def queue_transactions(transactions):
+    """
+    Add transactions (see add_transactions) through the write queue; they
+    are saved together in one insert, batched with other queued inserts.
+    Returns their temporary ids (saved ids with WRITE_QUEUE off), or None.
+    """
+    if write_queue is None:
+        return add_transactions(transactions)
+    try:
+        rows = [_transaction_data(**t) for t in transactions]
+        if not rows:
+            return []
+        temp_ids = [write_queue.temp_id() for _ in rows]
+        write_queue.submit("add_transactions", {"rows": rows, "temp_ids": temp_ids})
+        return temp_ids
+    except Exception as e:
+        st.error(f"Error adding transactions: {e}")
+    return None
+
+def queue_transaction_update(transaction_id, date, type_, amount, payment_month, payment_year, description):
+    """Update a transaction through the write queue."""
+    if write_queue is None:
+        return update_transaction(transaction_id, date, type_, amount, payment_month, payment_year, description)
+    try:
+        data = _transaction_update_data(date, type_, amount, payment_month, payment_year, description)
+        write_queue.submit("update_transaction", {"id": int(transaction_id), "data": data})
+        return True
+    except Exception as e:
+        st.error(f"Error updating transaction: {e}")
+    return False
+
+def queue_transaction_delete(transaction_id):
+    """Delete a transaction through the write queue."""
+    if write_queue is None:
+        return delete_transaction(transaction_id)
+    try:
+        write_queue.submit("delete_transaction", {"id": int(transaction_id)})
+        return True
+    except Exception as e:
+        st.error(f"Error deleting transaction: {e}")
+    return False
+
+def _describe_write(write):
+    payload = write["payload"]
+    if write["kind"] == "add_transactions":
+        rows = payload["rows"]
+        return f"Tambah {len(rows)} transaksi {rows[0]['type']} ({format_currency(sum(row['amount'] for row in rows))})"
+    if write["kind"] == "add_student":
+        return f"Tambah siswa {payload['data']['name']} ({payload['data']['class_name']})"
+    if write["kind"] == "update_student":
+        return f"Ubah siswa {payload['data']['name']}"
+    if write["kind"] == "delete_student":
+        return f"Hapus siswa #{payload['id']}"
+    if write["kind"] == "delete_transaction":
+        return f"Hapus transaksi #{payload['id']}"
+    return f"Ubah transaksi #{payload['id']}"
+
+WRITE_COLUMNS = ["id", "submitted_at", "change", "status", "error"]
+
+def get_pending_writes():
+    """Queued and failed writes (WRITE_COLUMNS), oldest first; empty with WRITE_QUEUE off."""
+    if write_queue is None:
+        return pd.DataFrame(columns=WRITE_COLUMNS)
+    writes = write_queue.failures() + write_queue.pending()
+    return pd.DataFrame(
+        [[w["id"], w["submitted_at"], _describe_write(w), w["status"], w["error"]] for w in writes],
+        columns=WRITE_COLUMNS,
+    )
+
+def get_write_queue_stats():
+    return write_queue.stats() if write_queue is not None else None
+
+def retry_write(write_id):
+    return write_queue is not None and write_queue.retry(write_id)
+
+def dismiss_write(write_id):
+    return write_queue is not None and write_queue.dismiss(write_id)
+
+def _pending_ids(pending, kind):
+    # A row may be changed by its temporary id and saved since
+    return {write_queue.saved_id(w["payload"]["id"]) for w in pending if w["kind"] == kind}
+
+def _apply_changes(df, pending, table):
+    """
+    Records of `df` ("students" or "transactions") with the queued updates
+    and deletes of its rows applied, or None if none of them apply.
+    """
+    singular = table[:-1]
+    updates = {write_queue.saved_id(w["payload"]["id"]): w["payload"]["data"]
+               for w in pending if w["kind"] == f"update_{singular}"}
+    deleted = _pending_ids(pending, f"delete_{singular}")
+    # Deleting a student deletes their transactions too
+    gone_students = _pending_ids(pending, "delete_student") if table == "transactions" else set()
+    if df.empty:
+        return None
+    touched = (updates.keys() | deleted) & set(df["id"].dropna())
+    if not touched and not (gone_students and df["student_id"].isin(gone_students).any()):
+        return None
+    records = []
+    for record in df.to_dict("records"):
+        student_id = record.get("student_id")
+        if record["id"] in deleted or (not pd.isna(student_id) and student_id in gone_students):
+            continue
+        if record["id"] in updates:
+            record.update(updates[record["id"]])
+        records.append(record)
+    return records
+
+def _with_pending_students(df):
+    """Students with queued inserts, edits and deletes applied, as if already saved."""
+    pending = write_queue.pending() if write_queue is not None else []
+    if not pending:
+        return df
+    records = _apply_changes(df, pending, "students")
+    deleted = _pending_ids(pending, "delete_student")
+    added = [dict(w["payload"]["data"], id=w["payload"]["temp_id"]) for w in pending
+             if w["kind"] == "add_student" and w["payload"]["temp_id"] not in deleted]
+    if records is None and not added:
+        return df
+    result = pd.DataFrame((records if records is not None else df.to_dict("records")) + added)
+    if result.empty:
+        return df.iloc[0:0]
+    return result.sort_values("name", kind="stable").reset_index(drop=True) if "name" in result else result
+
+def _with_pending_transactions(df, students):
+    """Encoded transactions with queued inserts, edits and deletes applied, newest first."""
+    pending = write_queue.pending() if write_queue is not None else []
+    deleted = _pending_ids(pending, "delete_transaction")
+    gone_students = _pending_ids(pending, "delete_student")
+    inserts = [w for w in pending if w["kind"] == "add_transactions"]
+    records = _apply_changes(df, pending, "transactions")
+    if not inserts and records is None:
+        return df
+    if records is None:
+        records = df[backends.TRANSACTION_COLUMNS].to_dict("records") if not df.empty else []
+
+    names = students.set_index("id") if not students.empty else None
+    added = []
+    for write in inserts:
+        for temp_id, row in zip(write["payload"]["temp_ids"], write["payload"]["rows"]):
+            # The student may have been saved since the payment was queued
+            student_id = write_queue.saved_id(row["student_id"])
+            if temp_id in deleted or student_id in gone_students:
+                continue
+            student = names.loc[student_id] if names is not None and student_id in names.index else None
+            added.append(dict(
+                row, id=temp_id, student_id=student_id,
+                student_name=student["name"] if student is not None else (row["recipient"] or "-"),
+                attendance_number=student["attendance_number"] if student is not None else "-",
+            ))
+    # Newest first, pending rows ahead of saved ones on the same day
+    combined = transaction_frame(pd.DataFrame(added[::-1] + records, columns=backends.TRANSACTION_COLUMNS))
+    combined = combined.sort_values("date", ascending=False, kind="stable").reset_index(drop=True)
+    return encode_transactions(combined)
+
+# --- Offline reads ---
+# While the database is unreachable, paged and filtered reads are answered
+# from the last loaded copy of the tables (see read_cache), filtered here the
+# way the backends filter in the database.
+
+def _filter_students(df, filters):
+    if df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if filters.get("search"):
+        mask &= df["name"].fillna("").str.contains(filters["search"], case=False, regex=False)
+    for column in ("class_name", "status"):
+        if filters.get(column):
+            mask &= df[column] == filters[column]
+    return df[mask].reset_index(drop=True)
+
+def _filter_transactions(df, filters):
+    if df.empty:
+        return transaction_frame(pd.DataFrame(columns=backends.TRANSACTION_COLUMNS))
+    mask = pd.Series(True, index=df.index)
+    if filters.get("type"):
+        types = filters["type"]
+        mask &= df["type"].isin([types] if isinstance(types, str) else list(types))
+    for column in ("student_id", "payment_month", "payment_year"):
+        if filters.get(column) is not None:
+            mask &= (df[column] == filters[column]).fillna(False).astype(bool)
+    dates = df["date"].dt.normalize()
+    if filters.get("date_from"):
+        mask &= dates >= pd.Timestamp(backends._date_bound(filters["date_from"]))
+    if filters.get("date_to"):
+        mask &= dates <= pd.Timestamp(backends._date_bound(filters["date_to"]))
+    return df.loc[mask, backends.TRANSACTION_COLUMNS].reset_index(drop=True)
+
+def _page(df, page, page_size):
+    offset = (max(int(page), 1) - 1) * page_size
+    return df.iloc[offset:offset + page_size].reset_index(drop=True), len(df)
+
+def is_offline():
+    """True while the database can't be reached and writes wait in the journal."""
+    http_client = getattr(backend, "http_client", None)
+    if http_client is not None and supabase_client.is_offline(http_client):
+        return True
+    return write_queue is not None and not write_queue.online
+
+@metrics.timed()
+def _load_transactions():
+    if mirror is not None:
+        return _load_mirrored_transactions()
+    # Column lists straight into typed arrays, no dict or DataFrame row per transaction
+    return transaction_frame(backend.fetch_transaction_columns({}))
+
+def _load_mirrored_transactions():
+    mirror.refresh()
+    records = mirror.records()
+    if not records:
+        return transaction_frame({column: [] for column in backends.TRANSACTION_COLUMNS})
+
+    # Join student names locally instead of shipping them with every row,
+    # so renamed students show up without refetching their transactions
+    df = pd.DataFrame(records, columns=backends.RAW_TRANSACTION_COLUMNS).drop(columns=["row_version"])
+    students = read_cache.get_or_load("students", _load_students)
+    if students.empty:
+        students = pd.DataFrame(columns=["id", "name", "attendance_number"])
+    students = students.set_index("id")
+    has_student = df["student_id"].isin(students.index)
+
+    df["student_name"] = df["student_id"].map(students["name"]).where(has_student)
+    df["attendance_number"] = df["student_id"].map(students["attendance_number"]).where(has_student, "-")
+    # If student is null, it's an expense with a recipient
+    recipient = df["recipient"].where(df["recipient"].notna() & (df["recipient"] != ""), "-")
+    df["student_name"] = df["student_name"].where(has_student, recipient)
+
+    df = df.sort_values("date", ascending=False, kind="stable").reset_index(drop=True)
+    return transaction_frame(df[backends.TRANSACTION_COLUMNS])
+
+def _load_encoded_transactions():
+    df = _load_transactions()
+    # Timed on its own, apart from the fetch and the name join
+    with metrics.span("encode_transactions"):
+        return encode_transactions(df)
+
+@metrics.timed()
 def get_transactions():
-    """Retrieve all transactions with student names or recipient from Supabase."""
+    """
+    Retrieve all transactions with student names or recipient, typed by
+    categories.transaction_frame (Int64 ids, float64 amount, datetime64 date,
+    Categorical type and payment_month) plus integer type_code and month_no
+    columns (see categories.encode_transactions).
+    """
     try:
-        # Supabase doesn't do complex joins easily in one line without stored procedures 
-        # but we can select columns from related tables if foreign keys are set.
-        # Syntax: select("*, students(name, attendance_number)")
-        query = "*, students(name, attendance_number)"
-        response = supabase.table("transactions").select(query).order("date", desc=True).execute()
-        
-        if response.data:
-            data = []
-            for item in response.data:
-                row = {
-                    "id": item["id"],
-                    "student_id": item["student_id"],
-                    "recipient": item["recipient"],
-                    "date": item["date"],
-                    "type": item["type"],
-                    "amount": item["amount"],
-                    "payment_month": item["payment_month"],
-                    "payment_year": item["payment_year"],
-                    "description": item["description"]
-                }
-                
-                # Handle Joined Student Data
-                if item.get("students"):
-                    row["student_name"] = item["students"]["name"]
-                    row["attendance_number"] = item["students"]["attendance_number"]
-                else:
-                    # If student is null, it's an expense with a recipient
-                    row["student_name"] = item["recipient"] if item["recipient"] else "-"
-                    row["attendance_number"] = "-"
-                
-                data.append(row)
-            
-            return pd.DataFrame(data)
+        transactions = read_cache.get_or_load("transactions", _load_encoded_transactions).copy()
+        if write_queue is None or not write_queue.pending():
+            return transactions
+        return _with_pending_transactions(transactions, get_all_students())
     except Exception as e:
         st.error(f"Error fetching transactions: {e}")
     return pd.DataFrame()
 
+@metrics.timed()
+def get_transactions_page(filters=None, page=1, page_size=25):
+    """
+    One page of transactions matching `filters` (see backends.StorageBackend),
+    newest first. Returns (DataFrame, total matching rows).
+    """
+    try:
+        offset = (max(int(page), 1) - 1) * page_size
+        records, total = backend.fetch_transactions_page(filters or {}, page_size, offset)
+        rows = pd.DataFrame(records, columns=backends.TRANSACTION_COLUMNS)
+        changed = _apply_changes(rows, write_queue.pending(), "transactions") if write_queue is not None else None
+        if changed is not None:
+            rows = pd.DataFrame(changed, columns=backends.TRANSACTION_COLUMNS)
+        return transaction_frame(rows), total
+    except Exception as e:
+        if supabase_client.is_unreachable(e):
+            return _page(_filter_transactions(get_transactions(), filters or {}), page, page_size)
+        st.error(f"Error fetching transactions: {e}")
+    return transaction_frame(pd.DataFrame(columns=backends.TRANSACTION_COLUMNS)), 0
+
+@metrics.timed()
+def query_transactions(filters=None):
+    """
+    All transactions matching `filters` (see backends.StorageBackend), newest
+    first. The filtering runs in the database, so only matching rows are
+    fetched; date_from/date_to are a range scan on the date index.
+    """
+    try:
+        return transaction_frame(backend.fetch_transaction_columns(filters or {}))
+    except Exception as e:
+        if supabase_client.is_unreachable(e):
+            return _filter_transactions(get_transactions(), filters or {})
+        st.error(f"Error fetching transactions: {e}")
+    # Typed even when empty: the pages format the date column with .dt
+    return transaction_frame(pd.DataFrame(columns=backends.TRANSACTION_COLUMNS))
+
+# Rows fetched per round trip when streaming a report
+REPORT_CHUNK_SIZE = int(get_setting("REPORT_CHUNK_SIZE", 1000))
+
+def _transaction_report(render, filters, chunk_size, **kwargs):
+    """
+    Render all transactions matching `filters` with a reports.* function,
+    streamed from the database in chunks of REPORT_CHUNK_SIZE rows.
+    Returns the file bytes, or None on error.
+    """
+    try:
+        chunks = backend.iter_transactions(filters or {}, chunk_size or REPORT_CHUNK_SIZE)
+        return render(chunks, **kwargs)
+    except Exception as e:
+        st.error(f"Error creating report: {e}")
+    return None
+
+@metrics.timed()
+def transaction_report_pdf(filters=None, title="Laporan Keuangan", chunk_size=None):
+    """PDF report of the transactions matching `filters`."""
+    return _transaction_report(reports.transactions_pdf, filters, chunk_size, title=title, font_path=get_setting("REPORT_FONT_PATH"))
+
+@metrics.timed()
+def transaction_report_csv(filters=None, chunk_size=None):
+    """CSV export of the transactions matching `filters`."""
+    return _transaction_report(reports.transactions_csv, filters, chunk_size)
+
+@metrics.timed()
+def transaction_report_xlsx(filters=None, chunk_size=None):
+    """Excel export of the transactions matching `filters`."""
+    return _transaction_report(reports.transactions_xlsx, filters, chunk_size)
+
+@metrics.timed()
+def _load_filter_options():
+    options = backend.fetch_transaction_filter_options()
+    # Calendar order for months, anything unexpected after them
+    month_order = {m: i for i, m in enumerate(MONTHS)}
+    options["payment_month"] = sorted(options["payment_month"], key=lambda m: (month_order.get(m, len(MONTHS)), m))
+    options["payment_year"] = sorted(int(y) for y in options["payment_year"])
+    options["type"] = sorted(options["type"])
+    return options
+
+@metrics.timed()
+def get_transaction_filter_options():
+    """Distinct payment months, payment years and types, plus the date range of all transactions."""
+    try:
+        return read_cache.get_or_load("transaction_filter_options", _load_filter_options)
+    except Exception as e:
+        st.error(f"Error fetching filter options: {e}")
+    return {"payment_month": [], "payment_year": [], "type": [], "min_date": None, "max_date": None}
+
+@metrics.timed()
+def get_payment_status(year=None):
+    """
+    Precomputed payment status (backends.PAYMENT_STATUS_COLUMNS): which
+    student paid which month, with the amount and number of transactions.
+    Maintained by the database on every transaction write; optionally one year.
+    """
+    def load():
+        return pd.DataFrame(backend.fetch_payment_status(year), columns=backends.PAYMENT_STATUS_COLUMNS)
+
+    try:
+        return read_cache.get_or_load(("payment_status", year), load).copy()
+    except Exception as e:
+        st.error(f"Error fetching payment status: {e}")
+    return pd.DataFrame(columns=backends.PAYMENT_STATUS_COLUMNS)
+
+@metrics.timed()
+def get_tariffs():
+    """All tuition tariffs (tariffs.TARIFF_COLUMNS), oldest effective date first."""
+    try:
+        rows = read_cache.get_or_load(("tariffs", "rows"), backend.fetch_tariffs)
+        return pd.DataFrame(rows, columns=TARIFF_COLUMNS)
+    except Exception as e:
+        st.error(f"Error fetching tariffs: {e}")
+    return pd.DataFrame(columns=TARIFF_COLUMNS)
+
+@metrics.timed()
+def get_tariff_schedule():
+    """
+    The tariffs precomputed for fee lookups (tariffs.TariffSchedule), cached
+    until the next tariff change. Falls back to the default fee on error.
+    """
+    try:
+        return read_cache.get_or_load(("tariffs", "schedule"), lambda: TariffSchedule(backend.fetch_tariffs()))
+    except Exception as e:
+        st.error(f"Error fetching tariffs: {e}")
+    return TariffSchedule()
+
+@metrics.timed()
+@read_cache.invalidates("tariffs")
+def add_tariff(class_name, effective_from, amount):
+    """Add a tariff; an empty class_name applies it to all classes."""
+    try:
+        data = {"class_name": class_name or None, "effective_from": str(effective_from), "amount": amount}
+        return backend.insert_tariff(data)
+    except Exception as e:
+        st.error(f"Error adding tariff: {e}")
+    return None
+
+@metrics.timed()
+@read_cache.invalidates("tariffs")
+def delete_tariff(tariff_id):
+    """Delete a tariff."""
+    try:
+        return backend.delete_tariff(tariff_id)
+    except Exception as e:
+        st.error(f"Error deleting tariff: {e}")
+    return False
+
+@metrics.timed()
+def _load_dashboard_summary():
+    income_rows, expense_rows, active_students = fetch_together(
+        backend.income_by_year, backend.expense_by_description, lambda: backend.count_students("Active")
+    )
+    income = pd.DataFrame(income_rows, columns=["payment_year", "total"])
+    expense = pd.DataFrame(expense_rows, columns=["description", "total"])
+    income["total"] = income["total"].astype(float)
+    expense["total"] = expense["total"].astype(float)
+
+    # Totals include rows without a year/description; the breakdowns don't
+    income_by_year = income.dropna(subset=["payment_year"])
+    expense_by_desc = expense.dropna(subset=["description"])
+    return {
+        "has_transactions": not (income.empty and expense.empty),
+        "total_income": income["total"].sum(),
+        "income_by_year": income_by_year.set_index(income_by_year["payment_year"].astype(int))["total"].sort_index(),
+        "total_expense": expense["total"].sum(),
+        "expense_by_desc": expense_by_desc.set_index("description")["total"].sort_values(ascending=False),
+        "active_students": active_students,
+    }
+
+@metrics.timed()
+def get_dashboard_summary():
+    """
+    Dashboard figures aggregated by the database: total income, income per
+    payment year, total expense, expense per description and active students.
+    """
+    try:
+        return read_cache.get_or_load("dashboard", _load_dashboard_summary)
+    except Exception as e:
+        st.error(f"Error fetching dashboard summary: {e}")
+    return {
+        "has_transactions": False,
+        "total_income": 0.0,
+        "income_by_year": pd.Series(dtype=float),
+        "total_expense": 0.0,
+        "expense_by_desc": pd.Series(dtype=float),
+        "active_students": 0,
+    }
+
 if __name__ == '__main__':
     # For testing connectivity locally if env vars are set
     pass
\ No newline at end of file
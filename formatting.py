@@ -0,0 +1,6 @@
+def format_currency(amount):
+    return f"Rp {amount:,.0f}"
+
+def format_currency_list(amounts):
+    """format_currency over a whole column, without a per-row pandas apply."""
+    return [f"Rp {amount:,.0f}" for amount in amounts]
@@ -0,0 +1,51 @@
+# Composite indexes for the hot transaction queries, applied to SQLite by
+# SQLiteBackend.create_tables (supabase_schema.sql has the same indexes for
+# Postgres). Each one serves a filter the app runs on every page load:
+#
+#   idx_transactions_year_type       Laporan/Riwayat: payment_year + type,
+#                                    and their COUNT/SUM(amount) from the index alone
+#   idx_transactions_student_period  one student's payments by year and month
+#                                    (Riwayat per student, paid-month checks)
+#
+# Newest-first ordering is already served by idx_transactions_date: SQLite
+# stores the rowid (= id) in every index, so it is (date, id).
+
+# name -> (table, columns)
+COMPOSITE_INDEXES = {
+    "idx_transactions_year_type": ("transactions", "payment_year, type, amount"),
+    "idx_transactions_student_period": ("transactions", "student_id, payment_year, payment_month, type, amount"),
+}
+
+# Single-column indexes that are a prefix of a composite one above and only
+# cost writes once it exists: name -> (table, columns)
+SUPERSEDED_INDEXES = {
+    "idx_transactions_student_id": ("transactions", "student_id"),
+}
+
+def _existing(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def apply(conn):
+    """
+    Create the composite indexes and drop the ones they supersede. Runs
+    ANALYZE when something was created, so the planner knows the new
+    indexes are selective. Returns the names of the indexes created.
+    """
+    existing = _existing(conn)
+    created = [name for name in COMPOSITE_INDEXES if name not in existing]
+    for name in created:
+        table, columns = COMPOSITE_INDEXES[name]
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    if created:
+        conn.execute("ANALYZE")
+    return created
+
+def revert(conn):
+    """Back to the single-column indexes only (used by bench_indexes.py to time the old schema)."""
+    for name in COMPOSITE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, (table, columns) in SUPERSEDED_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+    conn.execute("ANALYZE")
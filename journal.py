@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Write-ahead journal of the write queue (writequeue.py) in a local SQLite
+# file in WAL mode. A write is appended, and on disk, before the form that
+# made it reports success; it is marked done once the backend has it. Open
+# writes are replayed in order after a restart or an outage, with their
+# idempotency keys so a write that was saved but not acknowledged isn't
+# saved twice. Done writes are kept for `retention_days` as an audit trail.
+
+class WriteJournal:
+    """Durable, ordered record of queued writes and the ids they were saved under."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS writes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            submitted_at TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued, failed, done or dismissed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            closed_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_writes_status ON writes(status, seq);
+
+        -- Temporary ids of queued inserts and the ids they were saved under,
+        -- for open writes that still refer to them
+        CREATE TABLE IF NOT EXISTS resolved (temp_id INTEGER PRIMARY KEY, saved_id INTEGER NOT NULL);
+    """
+
+    def __init__(self, path, retention_days=7):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # Each append is synced to disk before it is acknowledged
+            self.conn.execute("PRAGMA synchronous=FULL")
+            self.conn.executescript(self.SCHEMA)
+            cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat(timespec="seconds")
+            self.conn.execute("DELETE FROM writes WHERE status IN ('done', 'dismissed') AND closed_at < ?", (cutoff,))
+            if not self.conn.execute("SELECT 1 FROM writes WHERE status IN ('queued', 'failed') LIMIT 1").fetchone():
+                self.conn.execute("DELETE FROM resolved")
+
+    def _execute(self, sql, params=()):
+        with self.lock, self.conn:
+            return self.conn.execute(sql, params)
+
+    def append(self, write):
+        self._execute(
+            "INSERT INTO writes (key, kind, payload, submitted_at, status) VALUES (?, ?, ?, ?, ?)",
+            (write["key"], write["kind"], json.dumps(write["payload"]), write["submitted_at"], write["status"]),
+        )
+
+    def open_writes(self):
+        """Queued and failed writes, in the order they were made."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, kind, payload, submitted_at, status, attempts, error FROM writes"
+                " WHERE status IN ('queued', 'failed') ORDER BY seq"
+            ).fetchall()
+        return [dict(row, payload=json.loads(row["payload"])) for row in rows]
+
+    def resolved(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT temp_id, saved_id FROM resolved").fetchall())
+
+    def attempt(self, keys):
+        """Count a send attempt before it is made: after a crash, attempts > 0 means "maybe saved"."""
+        placeholders = ", ".join("?" for _ in keys)
+        self._execute(f"UPDATE writes SET attempts = attempts + 1 WHERE key IN ({placeholders})", tuple(keys))
+
+    def done(self, keys, resolved=()):
+        """Mark writes saved, together with the ids their temporary ids were saved under."""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO resolved (temp_id, saved_id) VALUES (?, ?)", list(resolved))
+            self.conn.executemany("UPDATE writes SET status = 'done', error = NULL, closed_at = ? WHERE key = ?",
+                                  [(now, key) for key in keys])
+
+    def fail(self, key, error):
+        self._execute("UPDATE writes SET status = 'failed', error = ? WHERE key = ?", (error, key))
+
+    def requeue(self, key):
+        """Queue a failed write again, after everything queued since."""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT * FROM writes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            # A new seq puts it at the back, where the queue also replays it
+            self.conn.execute("DELETE FROM writes WHERE key = ?", (key,))
+            self.conn.execute(
+                "INSERT INTO writes (key, kind, payload, submitted_at, status, attempts) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (row["key"], row["kind"], row["payload"], row["submitted_at"], row["attempts"]),
+            )
+
+    def dismiss(self, key):
+        now = datetime.now().isoformat(timespec="seconds")
+        self._execute("UPDATE writes SET status = 'dismissed', closed_at = ? WHERE key = ?", (now, key))
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM writes GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ("queued", "failed", "done", "dismissed")}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,159 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Timing of database.py operations and page sections. Every call records its
+# wall time, rows returned and bytes received from the database service;
+# the last `window` samples per operation give rolling percentiles.
+# Recording is a few microseconds per call, so it stays on in production.
+
+logger = logging.getLogger("student_finance.metrics")
+
+METRIC_COLUMNS = ["operation", "calls", "errors", "p50_ms", "p90_ms", "p99_ms", "max_ms", "total_s", "rows_avg", "bytes_total"]
+
+# Spans running on this thread, innermost last; received bytes count for all of them
+_active = threading.local()
+# Spans carried to worker threads (carry_spans) get bytes from several threads
+_bytes_lock = threading.Lock()
+
+def _spans():
+    if not hasattr(_active, "spans"):
+        _active.spans = []
+    return _active.spans
+
+def add_bytes(count):
+    """Count `count` bytes received from the database for every span running on this thread."""
+    spans = _spans()
+    if spans:
+        with _bytes_lock:
+            for span in spans:
+                span.bytes += count
+
+def carry_spans(func):
+    """
+    Wrap `func` to run on another thread as if inside the spans running on
+    this thread now, so bytes it receives count for the calling page.
+    """
+    parent = list(_spans())
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _active.spans = list(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.spans = []
+    return wrapper
+
+def result_rows(result):
+    """Rows in an operation result: frames and lists count, (frame, total) pages count the frame."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (pd.DataFrame, pd.Series, list)):
+        return len(result)
+    return None
+
+class Metrics:
+    """Per-operation samples of (seconds, rows, bytes), safe to share between sessions."""
+
+    def __init__(self, window=500, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=None, nbytes=0, error=False):
+        with self._lock:
+            op = self._ops.get(name)
+            if op is None:
+                op = self._ops[name] = {"samples": deque(maxlen=self.window), "calls": 0, "errors": 0, "total_s": 0.0, "bytes_total": 0}
+            op["samples"].append((seconds, rows, nbytes))
+            op["calls"] += 1
+            op["errors"] += error
+            op["total_s"] += seconds
+            op["bytes_total"] += nbytes
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"operation": name, "ms": round(seconds * 1000, 3), "rows": rows, "bytes": nbytes, "error": error}))
+
+    def span(self, name):
+        """Context manager timing a block, e.g. a page section."""
+        return _Span(self, name)
+
+    def timed(self, name=None):
+        """Decorator recording every call of the function under `name` (default: its name without leading "_")."""
+        def decorator(func):
+            op_name = name or func.__name__.lstrip("_")
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, op_name) as span:
+                    result = func(*args, **kwargs)
+                    span.rows = result_rows(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """One dict per operation (METRIC_COLUMNS), slowest p90 first."""
+        with self._lock:
+            ops = {name: (list(op["samples"]), dict(op)) for name, op in self._ops.items()}
+        rows = []
+        for name, (samples, op) in ops.items():
+            ms = np.array([s[0] for s in samples]) * 1000
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99]) if len(ms) else (0.0, 0.0, 0.0)
+            counted = [s[1] for s in samples if s[1] is not None]
+            rows.append({
+                "operation": name,
+                "calls": op["calls"],
+                "errors": op["errors"],
+                "p50_ms": round(float(p50), 3),
+                "p90_ms": round(float(p90), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(ms.max()), 3) if len(ms) else 0.0,
+                "total_s": round(op["total_s"], 4),
+                "rows_avg": round(sum(counted) / len(counted), 1) if counted else None,
+                "bytes_total": op["bytes_total"],
+            })
+        return sorted(rows, key=lambda r: r["p90_ms"], reverse=True)
+
+    def to_json(self):
+        return json.dumps({"window": self.window, "operations": self.snapshot()}, indent=2)
+
+    def log_snapshot(self):
+        """Write the snapshot to the metrics logger, one JSON line per operation."""
+        for row in self.snapshot():
+            logger.info(json.dumps(row))
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+
+class _Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.rows = None
+        self.bytes = 0
+
+    def __enter__(self):
+        _spans().append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        spans = _spans()
+        if spans and spans[-1] is self:
+            spans.pop()
+        if self.metrics.enabled:
+            # Streamlit's rerun/stop signals are BaseExceptions, not errors
+            error = exc_type is not None and issubclass(exc_type, Exception)
+            self.metrics.record(self.name, elapsed, self.rows, self.bytes, error)
+        return False
@@ -0,0 +1,44 @@
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import metrics
+
+# Fan-out of independent reads: a page that needs students, payment status
+# and tariffs waits for the slowest of them instead of their sum. Each extra
+# call gets a short-lived thread that carries the session's Streamlit context
+# (so st.error from database.py still reaches the page) and the running
+# metrics spans. The first call runs on the calling thread, so nested
+# gathers never wait on a busy pool.
+
+def gather(*calls):
+    """
+    Run the zero-argument `calls` concurrently and return their results as
+    a tuple, in order. An exception from any call is raised once all finish.
+    """
+    if len(calls) < 2:
+        return tuple(call() for call in calls)
+
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def run(index):
+        try:
+            results[index] = calls[index]()
+        except BaseException as e:  # re-raised on the calling thread
+            errors[index] = e
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    threads = []
+    for index in range(1, len(calls)):
+        thread = threading.Thread(target=metrics.carry_spans(run), args=(index,), daemon=True)
+        if ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        thread.start()
+        threads.append(thread)
+    run(0)
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error
+    return tuple(results)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from categories import MONTHS, income_mask, month_index
+from formatting import format_currency, format_currency_list
+from tariffs import DEFAULT_FEE, fee_matrix
+
+# Payment recap (Rekap): one row per active student, one column per month.
+
+MONTHLY_FEE = DEFAULT_FEE  # when no tariff schedule is given
+PAID = "Sudah Bayar"
+UNPAID = "-"
+
+def paid_matrix(student_ids, transactions, year):
+    """
+    Boolean array [student, month]: True where the student has an income
+    transaction for that payment month in `year`. Built in one scatter
+    instead of filtering the transactions once per student.
+    `transactions` may also be payment_status rows, which have no type
+    column because they only count income.
+    """
+    student_ids = pd.Index(student_ids)
+    matrix = np.zeros((len(student_ids), len(MONTHS)), dtype=bool)
+    if transactions.empty:
+        return matrix
+
+    paid = transactions[transactions['payment_year'] == year]
+    if 'type' in paid:
+        paid = paid[income_mask(paid['type'])]
+    rows = student_ids.get_indexer(paid['student_id'])
+    cols = month_index(paid['payment_month'])
+    hit = (rows >= 0) & (cols >= 0)
+    matrix[rows[hit], cols[hit]] = True
+    return matrix
+
+def _attendance_for_display(values):
+    """Numeric attendance numbers as int (for native sorting), anything else as text."""
+    numeric = pd.to_numeric(values, errors='coerce')
+    as_int = (numeric.notna() & (numeric % 1 == 0)).to_numpy()
+    text = values.fillna("").to_numpy(dtype=object)
+    result = text.copy()
+    result[as_int] = numeric[as_int].astype(int).to_numpy()
+    return result
+
+def build_recap(students, transactions, year, fee=MONTHLY_FEE, sort_by_absen=False):
+    """
+    Recap table for `year`: "No Absen", "Nama Siswa", the twelve months
+    ("Sudah Bayar" / "-"), "Jumlah" (months paid) and "Rupiah" (fees of the
+    paid months), followed by a TOTAL row (paid count per month) and a RUPIAH
+    row (fees paid per month). `fee` is a flat monthly amount or a
+    tariffs.TariffSchedule, looked up by the students' class_name.
+    `transactions` are transaction rows or payment_status rows (see paid_matrix).
+    Returns an empty DataFrame when there are no active students.
+    """
+    if students.empty:
+        return pd.DataFrame()
+    active = students[students['status'] == 'Active']
+    if active.empty:
+        return pd.DataFrame()
+
+    matrix = paid_matrix(active['id'], transactions, year)
+    class_names = active['class_name'] if 'class_name' in active else [None] * len(active)
+    paid_fees = np.where(matrix, fee_matrix(fee, class_names, year), 0)
+    jumlah = matrix.sum(axis=1)
+    rupiah = paid_fees.sum(axis=1)
+
+    body = pd.DataFrame(np.where(matrix, PAID, UNPAID), columns=MONTHS)
+    body.insert(0, "No Absen", _attendance_for_display(active['attendance_number'].reset_index(drop=True)))
+    body.insert(1, "Nama Siswa", active['name'].to_numpy())
+    body["Jumlah"] = jumlah
+    body["Rupiah"] = format_currency_list(rupiah)
+
+    if sort_by_absen:
+        order = pd.to_numeric(body['No Absen'], errors='coerce').sort_values(kind='stable').index
+        body = body.loc[order].reset_index(drop=True)
+
+    month_counts = matrix.sum(axis=0)
+    month_rupiah = paid_fees.sum(axis=0)
+    total_jumlah = int(jumlah.sum())
+    total_rupiah = int(rupiah.sum())
+
+    total_row = {"No Absen": "", "Nama Siswa": "TOTAL", "Jumlah": total_jumlah, "Rupiah": format_currency(total_rupiah)}
+    total_row.update(zip(MONTHS, month_counts.tolist()))
+
+    rupiah_row = {"No Absen": "", "Nama Siswa": "RUPIAH", "Jumlah": format_currency(total_rupiah), "Rupiah": format_currency(total_rupiah)}
+    rupiah_row.update(zip(MONTHS, format_currency_list(month_rupiah)))
+
+    footer = pd.DataFrame([total_row, rupiah_row], columns=body.columns)
+    return pd.concat([body.astype(object), footer.astype(object)], ignore_index=True)
@@ -0,0 +1,266 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from functools import lru_cache
+import xlsxwriter
+from fpdf import FPDF
+from categories import INCOME_TYPES, EXPENSE_TYPES
+from formatting import format_currency
+
+# Transaction report (Laporan) as a PDF table, CSV or XLSX. Rows arrive in
+# chunks from a generator (see StorageBackend.iter_transactions) and are
+# written as they come, so neither the source rows nor a formatted copy of
+# them are ever all in memory.
+
+# (field, header, relative width, alignment)
+REPORT_COLUMNS = [
+    ("date", "Tanggal", 11, "L"),
+    ("student_name", "Nama Siswa", 24, "L"),
+    ("attendance_number", "Absen", 6, "C"),
+    ("type", "Jenis", 11, "L"),
+    ("amount", "Nominal", 13, "R"),
+    ("payment_month", "Bulan Bayar", 11, "L"),
+    ("payment_year", "Tahun Bayar", 8, "C"),
+    ("description", "Keterangan", 22, "L"),
+]
+
+# Unicode TrueType fonts, tried in order. Without one the report falls back
+# to the built-in Helvetica and characters outside Latin-1 become "?".
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu-sans-fonts/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+]
+
+ROW_HEIGHT = 6
+FONT_SIZE = 8
+
+def find_font(font_path=None):
+    """The first existing Unicode font file: font_path, then FONT_CANDIDATES."""
+    for path in ([font_path] if font_path else []) + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+@lru_cache(maxsize=4096)
+def _format_date(value):
+    """ISO date text as dd-mmm-yyyy (20-Jan-2024); reports repeat dates a lot, hence the cache."""
+    try:
+        return date.fromisoformat(value[:10]).strftime('%d-%b-%Y')
+    except ValueError:
+        return value
+
+def _cell_text(field, value):
+    if value is None or value != value:  # None or NaN
+        return ""
+    if field == "date":
+        return _format_date(str(value))
+    if field == "amount":
+        return format_currency(value)
+    if field == "payment_year":
+        return str(int(value))
+    return str(value)
+
+class TransactionReport(FPDF):
+    """A4 landscape table of transactions, written one row at a time."""
+
+    def __init__(self, title="Laporan Keuangan", subtitle="", font_path=None):
+        super().__init__(orientation='L', unit='mm', format='A4')
+        self.report_title = title
+        self.report_subtitle = subtitle
+        self.alias_nb_pages()
+        self.set_auto_page_break(True, margin=15)
+
+        font_file = find_font(font_path)
+        if font_file:
+            self.add_font("ReportFont", "", font_file, uni=True)
+            bold_file = font_file.replace(".ttf", "-Bold.ttf")
+            self.add_font("ReportFont", "B", bold_file if os.path.exists(bold_file) else font_file, uni=True)
+            self.text_font = "ReportFont"
+        else:
+            self.text_font = "Helvetica"
+        self.unicode = font_file is not None
+
+        # Column widths are fixed once from the usable page width
+        usable = self.w - self.l_margin - self.r_margin
+        total_weight = sum(weight for _, _, weight, _ in REPORT_COLUMNS)
+        self.widths = [usable * weight / total_weight for _, _, weight, _ in REPORT_COLUMNS]
+        self._fitted = {}
+
+        self.row_count = 0
+        self.total_income = 0.0
+        self.total_expense = 0.0
+
+    def _text(self, text):
+        if self.unicode:
+            return text
+        return text.encode('latin-1', 'replace').decode('latin-1')
+
+    def _fit(self, text, width):
+        """Cut text with "..." so it stays inside its column."""
+        key = (text, width)
+        if key in self._fitted:
+            return self._fitted[key]
+        fitted = text
+        limit = width - 2
+        if self.get_string_width(fitted) > limit:
+            while fitted and self.get_string_width(fitted + "...") > limit:
+                fitted = fitted[:-1]
+            fitted += "..."
+        if len(self._fitted) < 4096:
+            self._fitted[key] = fitted
+        return fitted
+
+    def header(self):
+        if self.page_no() == 1:
+            self.set_font(self.text_font, 'B', 14)
+            self.cell(0, 8, self._text(self.report_title), ln=1, align='C')
+            if self.report_subtitle:
+                self.set_font(self.text_font, '', 9)
+                self.cell(0, 6, self._text(self.report_subtitle), ln=1, align='C')
+            self.ln(2)
+
+        # Column headers on every page
+        self.set_font(self.text_font, 'B', FONT_SIZE)
+        self.set_fill_color(220, 220, 220)
+        for (_, label, _, _), width in zip(REPORT_COLUMNS, self.widths):
+            self.cell(width, ROW_HEIGHT + 1, self._text(label), border=1, align='C', fill=1)
+        self.ln()
+        self.set_font(self.text_font, '', FONT_SIZE)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font(self.text_font, '', 7)
+        self.cell(0, 6, f"Halaman {self.page_no()}/{{nb}}", align='C')
+
+    def add_row(self, row):
+        fill = self.row_count % 2
+        self.set_fill_color(245, 245, 245)
+        for (field, _, _, align), width in zip(REPORT_COLUMNS, self.widths):
+            text = self._fit(self._text(_cell_text(field, row.get(field))), width)
+            self.cell(width, ROW_HEIGHT, text, border=1, align=align, fill=fill)
+        self.ln()
+
+        self.row_count += 1
+        if row.get("type") in INCOME_TYPES:
+            self.total_income += row.get("amount") or 0
+        elif row.get("type") in EXPENSE_TYPES:
+            self.total_expense += row.get("amount") or 0
+
+    def compact(self):
+        """
+        FPDF records every character written with a Unicode font in a list
+        that it later scans once per glyph; keeping it deduplicated between
+        chunks keeps memory and the final output time flat.
+        """
+        for font in self.fonts.values():
+            if "subset" in font:
+                font["subset"] = sorted(set(font["subset"]))
+
+    def add_summary(self):
+        self.ln(4)
+        self.set_font(self.text_font, 'B', 9)
+        label_width = sum(self.widths[:4])
+        for label, value in [
+            ("Jumlah Transaksi", str(self.row_count)),
+            ("Total Pemasukan", format_currency(self.total_income)),
+            ("Total Pengeluaran", format_currency(self.total_expense)),
+            ("Saldo", format_currency(self.total_income - self.total_expense)),
+        ]:
+            self.cell(label_width, ROW_HEIGHT, self._text(label))
+            self.cell(self.widths[4], ROW_HEIGHT, self._text(value), align='R', ln=1)
+
+def transactions_pdf(chunks, title="Laporan Keuangan", subtitle="", font_path=None):
+    """
+    Render transaction rows (flat dicts, TRANSACTION_COLUMNS) to PDF bytes.
+    `chunks` is an iterable of row lists, e.g. backend.iter_transactions(filters).
+    """
+    report = TransactionReport(title, subtitle or f"Dibuat {datetime.now():%d-%m-%Y %H:%M}", font_path)
+    report.add_page()
+    for chunk in chunks:
+        for row in chunk:
+            report.add_row(row)
+        report.compact()
+    report.add_summary()
+    return report.output(dest='S').encode('latin-1')
+
+def cursor_chunks(cursor, chunk_size=1000):
+    """Row chunks (lists of dicts) from an executed DB-API cursor, via fetchmany."""
+    columns = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [dict(zip(columns, row)) for row in rows]
+
+def write_transactions_csv(chunks, stream):
+    """Write rows as CSV text to `stream`, formatted like the Laporan table. Returns the row count."""
+    writer = csv.writer(stream)
+    writer.writerow([label for _, label, _, _ in REPORT_COLUMNS])
+    fields = [field for field, _, _, _ in REPORT_COLUMNS]
+    count = 0
+    for chunk in chunks:
+        writer.writerows([_cell_text(field, row.get(field)) for field in fields] for row in chunk)
+        count += len(chunk)
+    return count
+
+def transactions_csv(chunks):
+    """CSV bytes (UTF-8) of transaction rows."""
+    buffer = io.BytesIO()
+    with io.TextIOWrapper(buffer, encoding='utf-8', newline='', write_through=True) as stream:
+        write_transactions_csv(chunks, stream)
+        return buffer.getvalue()
+
+# Spreadsheet column widths (characters) and cell formats; values stay numbers
+# and dates, Excel applies the Rupiah and date formatting when displaying them
+XLSX_WIDTHS = [13, 30, 7, 13, 14, 13, 11, 35]
+XLSX_FORMATS = {
+    "date": {'num_format': 'dd-mmm-yyyy', 'align': 'left'},
+    "amount": {'num_format': '"Rp "#,##0'},
+    "payment_year": {'num_format': '0', 'align': 'center'},
+}
+
+def write_transactions_xlsx(chunks, target, sheet_name="Laporan"):
+    """
+    Write rows to an .xlsx file or file object. The workbook runs in
+    xlsxwriter's constant_memory mode: each row goes to a temporary file as
+    soon as it is written. Returns the row count.
+    """
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet(sheet_name)
+        header = workbook.add_format({'bold': True, 'bg_color': '#DDDDDD', 'border': 1})
+        formats = {field: workbook.add_format(spec) for field, spec in XLSX_FORMATS.items()}
+        for col, ((_, label, _, _), width) in enumerate(zip(REPORT_COLUMNS, XLSX_WIDTHS)):
+            sheet.set_column(col, col, width)
+            sheet.write_string(0, col, label, header)
+        sheet.freeze_panes(1, 0)
+
+        row_index = 0
+        for chunk in chunks:
+            for row in chunk:
+                row_index += 1
+                for col, (field, _, _, _) in enumerate(REPORT_COLUMNS):
+                    value = row.get(field)
+                    if value is None or value != value:
+                        continue
+                    if field == "date":
+                        try:
+                            sheet.write_datetime(row_index, col, date.fromisoformat(str(value)[:10]), formats["date"])
+                        except ValueError:
+                            sheet.write_string(row_index, col, str(value))
+                    elif field in formats:
+                        sheet.write_number(row_index, col, value, formats[field])
+                    else:
+                        sheet.write_string(row_index, col, str(value))
+        sheet.autofilter(0, 0, max(row_index, 1), len(REPORT_COLUMNS) - 1)
+    finally:
+        workbook.close()
+    return row_index
+
+def transactions_xlsx(chunks):
+    """XLSX bytes of transaction rows."""
+    buffer = io.BytesIO()
+    write_transactions_xlsx(chunks, buffer)
+    return buffer.getvalue()
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+import httpx
+from postgrest.exceptions import APIError
+from supabase import create_client, ClientOptions
+import metrics
+
+# The HTTP layer under SupabaseBackend: one httpx.Client per backend with a
+# keep-alive connection pool, explicit timeouts and retries with exponential
+# backoff on transient failures. httpx clients are thread-safe, so every
+# Streamlit session shares the pool (database.py keeps the backend in
+# st.cache_resource).
+
+# Responses worth another try: rate limiting, timeouts and gateway errors
+RETRY_STATUSES = {408, 429, 502, 503, 504}
+# Requests that can be sent twice without changing the outcome; inserts
+# (POST) are only retried when the server never received them
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# PostgREST error codes that mean the service, not the request, is at fault
+UNAVAILABLE_CODES = {"408", "429", "502", "503", "504", "520"}
+
+def is_unreachable(error):
+    """True if `error` means the database could not be reached (offline, timeout, outage)."""
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True
+    return isinstance(error, APIError) and str(error.code) in UNAVAILABLE_CODES
+
+class RetryTransport(httpx.BaseTransport):
+    """
+    Retry wrapper around an httpx transport, with jittered exponential backoff.
+    After a request fails for good on the network, further requests fail at
+    once for offline_cooldown seconds instead of each waiting out the retries.
+    """
+
+    def __init__(self, transport, retries=3, backoff=0.5, max_backoff=8.0, sleep=time.sleep, offline_cooldown=15.0):
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.offline_cooldown = offline_cooldown
+        self.offline_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    @property
+    def offline(self):
+        return time.monotonic() < self.offline_until
+
+    def _give_up(self):
+        self._count("failures")
+        self.offline_until = time.monotonic() + self.offline_cooldown
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def delay(self, attempt, response=None):
+        """Seconds before retry number attempt + 1: Retry-After if the server sent one."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        base = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return base / 2 + random.random() * base / 2
+
+    def handle_request(self, request):
+        self._count("requests")
+        if self.offline:
+            self._count("failures")
+            raise httpx.ConnectError("Database unreachable, retrying later", request=request)
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                # Never reached the server: safe to resend any request
+                if attempt >= self.retries:
+                    self._give_up()
+                    raise
+            except (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError):
+                if attempt >= self.retries or not idempotent:
+                    self._give_up()
+                    raise
+            else:
+                # 429 means the request was not processed, so even inserts can go again
+                retryable = response.status_code in RETRY_STATUSES and (idempotent or response.status_code == 429)
+                if not retryable or attempt >= self.retries:
+                    self.offline_until = 0.0
+                    return response
+                response.close()
+            self._count("retries")
+            self.sleep(self.delay(attempt, response))
+            attempt += 1
+
+    def close(self):
+        self.transport.close()
+
+def _count_response_bytes(response):
+    response.read()
+    metrics.add_bytes(len(response.content))
+
+def create_http_client(timeout=30.0, connect_timeout=5.0, max_connections=20, max_keepalive=10,
+                       keepalive_expiry=30.0, retries=3, backoff=0.5, offline_cooldown=15.0):
+    """
+    Pooled httpx.Client for PostgREST: up to max_connections concurrent
+    requests, max_keepalive idle connections kept open for keepalive_expiry
+    seconds, `retries` retries of transient failures, and fail-fast for
+    offline_cooldown seconds once the server is unreachable.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                          keepalive_expiry=keepalive_expiry)
+    transport = RetryTransport(httpx.HTTPTransport(limits=limits, http2=True), retries=retries, backoff=backoff,
+                               offline_cooldown=offline_cooldown)
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout, pool=timeout),
+        follow_redirects=True,
+        # Response sizes for metrics.py: bytes received per timed operation
+        event_hooks={"response": [_count_response_bytes]},
+    )
+
+def connect(url, key, http_client=None):
+    """Supabase client whose REST, auth and storage calls go through http_client."""
+    http_client = http_client or create_http_client()
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+def pool_stats(http_client):
+    """Request, retry and failure counts of a client made by create_http_client."""
+    transport = getattr(http_client, "_transport", None)
+    return dict(transport.stats) if isinstance(transport, RetryTransport) else None
+
+def is_offline(http_client):
+    """True while a client made by create_http_client fails fast after losing the server."""
+    transport = getattr(http_client, "_transport", None)
+    return isinstance(transport, RetryTransport) and transport.offline
@@ -14,7 +14,7 @@ CREATE TABLE transactions (
     id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     student_id BIGINT REFERENCES students(id) ON DELETE CASCADE,
     recipient TEXT,
-    date TEXT NOT NULL,
+    date DATE NOT NULL,
     type TEXT NOT NULL,
     amount NUMERIC NOT NULL,
     payment_month TEXT,
@@ -27,3 +27,203 @@ CREATE TABLE transactions (
 CREATE INDEX idx_transactions_student_id ON transactions(student_id);
 CREATE INDEX idx_transactions_date ON transactions(date);
 CREATE INDEX idx_students_status ON students(status);
+
+-- Incremental sync support (safe to re-run on an existing project)
+-- Every insert/update stamps row_version from a sequence, so clients can
+-- fetch only rows changed since the highest version they have seen
+CREATE SEQUENCE IF NOT EXISTS transactions_row_version_seq;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS row_version BIGINT;
+UPDATE transactions SET row_version = nextval('transactions_row_version_seq') WHERE row_version IS NULL;
+ALTER TABLE transactions ALTER COLUMN row_version SET DEFAULT nextval('transactions_row_version_seq');
+
+CREATE OR REPLACE FUNCTION bump_row_version() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.row_version = nextval('transactions_row_version_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_row_version ON transactions;
+CREATE TRIGGER trg_transactions_row_version
+    BEFORE UPDATE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+CREATE INDEX IF NOT EXISTS idx_transactions_row_version ON transactions(row_version);
+
+-- Dashboard aggregates, computed in the database instead of the app
+CREATE OR REPLACE VIEW income_by_year AS
+SELECT payment_year, SUM(amount) AS total
+FROM transactions
+WHERE type IN ('Income', 'Tuition', 'Pemasukan')
+GROUP BY payment_year;
+
+CREATE OR REPLACE VIEW expense_by_description AS
+SELECT description, SUM(amount) AS total
+FROM transactions
+WHERE type IN ('Expense', 'Pengeluaran')
+GROUP BY description;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type);
+
+-- Paginated history: ORDER BY date DESC, id DESC LIMIT/OFFSET
+CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions(date DESC, id DESC);
+
+-- Student list: ORDER BY name with name/class/status filters
+CREATE INDEX IF NOT EXISTS idx_students_name ON students(name);
+CREATE INDEX IF NOT EXISTS idx_students_class_name ON students(class_name, name);
+-- Substring search (ILIKE '%term%') needs a trigram index
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_students_name_trgm ON students USING gin (name gin_trgm_ops);
+
+CREATE OR REPLACE VIEW student_classes AS
+SELECT DISTINCT class_name FROM students ORDER BY class_name;
+
+-- Laporan filters: payment period predicates and dropdown options
+CREATE INDEX IF NOT EXISTS idx_transactions_payment_period ON transactions(payment_year, payment_month);
+
+CREATE OR REPLACE VIEW transaction_filter_options AS
+SELECT 'payment_month' AS kind, payment_month AS value FROM transactions WHERE payment_month IS NOT NULL GROUP BY payment_month
+UNION ALL
+SELECT 'payment_year', payment_year::TEXT FROM transactions WHERE payment_year IS NOT NULL GROUP BY payment_year
+UNION ALL
+SELECT 'type', type FROM transactions GROUP BY type
+UNION ALL
+SELECT 'min_date', MIN(date)::TEXT FROM transactions
+UNION ALL
+SELECT 'max_date', MAX(date)::TEXT FROM transactions;
+
+-- Payment status: one row per (student, payment year, payment month) with
+-- income, maintained by a trigger so Rekap and arrears read it directly.
+-- Re-running this section rebuilds the table from transactions.
+CREATE TABLE IF NOT EXISTS payment_status (
+    payment_year INTEGER NOT NULL,
+    student_id BIGINT NOT NULL,
+    payment_month TEXT NOT NULL,
+    amount_paid NUMERIC NOT NULL DEFAULT 0,
+    tx_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (payment_year, student_id, payment_month)
+);
+CREATE INDEX IF NOT EXISTS idx_payment_status_student ON payment_status(student_id, payment_year);
+
+CREATE OR REPLACE FUNCTION apply_payment_status() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.type IN ('Income', 'Tuition', 'Pemasukan') AND OLD.student_id IS NOT NULL
+           AND OLD.payment_year IS NOT NULL AND OLD.payment_month IS NOT NULL THEN
+            UPDATE payment_status SET amount_paid = amount_paid - OLD.amount, tx_count = tx_count - 1
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month;
+            DELETE FROM payment_status
+            WHERE payment_year = OLD.payment_year AND student_id = OLD.student_id AND payment_month = OLD.payment_month
+              AND tx_count <= 0;
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.type IN ('Income', 'Tuition', 'Pemasukan') AND NEW.student_id IS NOT NULL
+           AND NEW.payment_year IS NOT NULL AND NEW.payment_month IS NOT NULL THEN
+            INSERT INTO payment_status (payment_year, student_id, payment_month, amount_paid, tx_count)
+            VALUES (NEW.payment_year, NEW.student_id, NEW.payment_month, NEW.amount, 1)
+            ON CONFLICT (payment_year, student_id, payment_month)
+            DO UPDATE SET amount_paid = payment_status.amount_paid + EXCLUDED.amount_paid,
+                          tx_count = payment_status.tx_count + 1;
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_payment_status ON transactions;
+CREATE TRIGGER trg_transactions_payment_status
+    AFTER INSERT OR DELETE OR UPDATE OF student_id, type, amount, payment_month, payment_year ON transactions
+    FOR EACH ROW EXECUTE FUNCTION apply_payment_status();
+
+BEGIN;
+LOCK TABLE transactions IN SHARE MODE;
+DELETE FROM payment_status;
+INSERT INTO payment_status (payment_year, student_id, payment_month, amount_paid, tx_count)
+SELECT payment_year, student_id, payment_month, SUM(amount), COUNT(*)
+FROM transactions
+WHERE type IN ('Income', 'Tuition', 'Pemasukan')
+  AND student_id IS NOT NULL AND payment_year IS NOT NULL AND payment_month IS NOT NULL
+GROUP BY payment_year, student_id, payment_month;
+COMMIT;
+
+-- Tuition tariffs: fee per class (NULL = all classes) from an effective date
+CREATE TABLE IF NOT EXISTS tariffs (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    class_name TEXT,
+    effective_from DATE NOT NULL,
+    amount NUMERIC NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Integer codes for the type and payment_month labels (keep in sync with categories.py):
+-- type_code 1 = income, 2 = expense, 0 = other; month_code 1-12
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS type_code SMALLINT GENERATED ALWAYS AS (
+    CASE type WHEN 'Income' THEN 1 WHEN 'Tuition' THEN 1 WHEN 'Pemasukan' THEN 1
+              WHEN 'Expense' THEN 2 WHEN 'Pengeluaran' THEN 2 ELSE 0 END
+) STORED;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS month_code SMALLINT GENERATED ALWAYS AS (
+    CASE payment_month WHEN 'January' THEN 1 WHEN 'February' THEN 2 WHEN 'March' THEN 3 WHEN 'April' THEN 4
+                       WHEN 'May' THEN 5 WHEN 'June' THEN 6 WHEN 'July' THEN 7 WHEN 'August' THEN 8
+                       WHEN 'September' THEN 9 WHEN 'October' THEN 10 WHEN 'November' THEN 11 WHEN 'December' THEN 12 END
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_transactions_type_code ON transactions(type_code, payment_year);
+CREATE INDEX IF NOT EXISTS idx_transactions_period_code ON transactions(payment_year, month_code);
+
+CREATE OR REPLACE VIEW income_by_year AS
+SELECT payment_year, SUM(amount) AS total
+FROM transactions
+WHERE type_code = 1
+GROUP BY payment_year;
+
+CREATE OR REPLACE VIEW expense_by_description AS
+SELECT description, SUM(amount) AS total
+FROM transactions
+WHERE type_code = 2
+GROUP BY description;
+
+-- transactions.date as a real DATE (databases created when it was TEXT).
+-- Text values are normalized first: ISO dates with or without a time part,
+-- and dd/mm/yyyy; anything unparseable falls back to the row's created_at.
+-- The filter options view reads date, so it is recreated around the change;
+-- idx_transactions_date and idx_transactions_date_id are rebuilt on DATE.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'transactions' AND column_name = 'date') = 'text' THEN
+        DROP VIEW IF EXISTS transaction_filter_options;
+        ALTER TABLE transactions ALTER COLUMN date TYPE DATE USING (
+            CASE
+                WHEN btrim(date) ~ '^\d{4}-\d{2}-\d{2}' THEN left(btrim(date), 10)::DATE
+                WHEN btrim(date) ~ '^\d{1,2}/\d{1,2}/\d{4}$' THEN to_date(btrim(date), 'DD/MM/YYYY')
+                ELSE COALESCE(created_at, NOW())::DATE
+            END
+        );
+    END IF;
+END $$;
+
+CREATE OR REPLACE VIEW transaction_filter_options AS
+SELECT 'payment_month' AS kind, payment_month AS value FROM transactions WHERE payment_month IS NOT NULL GROUP BY payment_month
+UNION ALL
+SELECT 'payment_year', payment_year::TEXT FROM transactions WHERE payment_year IS NOT NULL GROUP BY payment_year
+UNION ALL
+SELECT 'type', type FROM transactions GROUP BY type
+UNION ALL
+SELECT 'min_date', MIN(date)::TEXT FROM transactions
+UNION ALL
+SELECT 'max_date', MAX(date)::TEXT FROM transactions;
+
+-- Composite indexes for the hot filters (keep in sync with indexes.py):
+-- payment_year + type with amount for index-only COUNT/SUM, and one
+-- student's payments by period. idx_transactions_student_id is a prefix
+-- of the latter and is dropped.
+CREATE INDEX IF NOT EXISTS idx_transactions_year_type ON transactions(payment_year, type) INCLUDE (amount);
+CREATE INDEX IF NOT EXISTS idx_transactions_student_period ON transactions(student_id, payment_year, payment_month) INCLUDE (type, amount);
+DROP INDEX IF EXISTS idx_transactions_student_id;
+ANALYZE transactions;
+
+-- Idempotency keys of writes from the offline journal (journal.py). A write
+-- whose response was lost may have been saved, so before it is sent again
+-- its rows are looked up by key; UNIQUE rejects a duplicate in any case.
+ALTER TABLE students ADD COLUMN IF NOT EXISTS client_key TEXT UNIQUE;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS client_key TEXT UNIQUE;
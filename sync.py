@@ -0,0 +1,82 @@
+import threading
+
+class TransactionMirror:
+    """
+    Local copy of the transactions table kept current with delta fetches.
+
+    Inserts and edits are found through the row_version high-water mark.
+    Versions come from a sequence and are not handed out in commit order, so
+    a write can land after a sync with a version below the mark: each delta
+    re-reads the last `lag_versions` versions to catch those. Deletions don't
+    leave a trace, so after applying a delta the local row count is compared
+    with the remote one and, only if they differ, the id list is fetched to
+    drop the rows that are gone and fetch the ones still missing.
+    """
+
+    def __init__(self, backend, lag_versions=100):
+        self.backend = backend
+        self.lag_versions = lag_versions
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.rows = {}  # id -> raw transaction row
+        self.max_id = 0
+        self.max_version = 0
+        self.last_delta_rows = 0
+        self.syncs = 0
+
+    def _apply(self, rows):
+        """Store rows; returns how many were new or changed."""
+        changed = 0
+        for row in rows:
+            changed += self.rows.get(row["id"]) != row
+            self.rows[row["id"]] = row
+            self.max_id = max(self.max_id, row["id"])
+            self.max_version = max(self.max_version, row["row_version"] or 0)
+        return changed
+
+    def refresh(self):
+        """Bring the mirror up to date. Returns True if anything changed."""
+        with self.lock:
+            probe = self.backend.probe_transactions()
+            # Any insert or edit we haven't seen carries a version above ours;
+            # a lower remote max only means the newest rows were deleted
+            if (probe["count"] == len(self.rows)
+                    and probe["max_id"] == self.max_id
+                    and probe["max_version"] <= self.max_version):
+                self.last_delta_rows = 0
+                return False
+
+            since = max(self.max_version - self.lag_versions, 0) if self.rows else 0
+            self.last_delta_rows = self._apply(self.backend.fetch_transactions_delta(since))
+
+            if len(self.rows) != probe["count"]:
+                remote_ids = set(self.backend.fetch_transaction_ids())
+                for row_id in set(self.rows) - remote_ids:
+                    del self.rows[row_id]
+                # Rows committed late, with a version below the re-read window
+                missing = remote_ids - set(self.rows)
+                if missing:
+                    self.last_delta_rows += self._apply(self.backend.fetch_transactions_by_ids(missing))
+                # The deleted rows may have carried the max id; the version
+                # watermark stays, versions are never reused
+                self.max_id = max(self.rows, default=0)
+
+            self.syncs += 1
+            return True
+
+    def records(self):
+        """Snapshot of the mirrored rows."""
+        with self.lock:
+            return list(self.rows.values())
+
+    def stats(self):
+        with self.lock:
+            return {
+                "rows": len(self.rows),
+                "max_id": self.max_id,
+                "max_version": self.max_version,
+                "syncs": self.syncs,
+                "last_delta_rows": self.last_delta_rows,
+            }
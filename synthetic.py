@@ -0,0 +1,74 @@
+import random
+import pandas as pd
+from categories import MONTHS
+from tariffs import DEFAULT_FEE
+
+# Seeded synthetic school data for benchmarks: students, monthly tuition
+# payments and school expenses at any scale. The same seed always gives the
+# same rows, so timings from different runs describe the same ledger.
+
+FIRST_NAMES = ["Adi", "Budi", "Citra", "Dewi", "Eko", "Fitri", "Gilang", "Hana", "Indra", "Joko",
+               "Kartika", "Lestari", "Made", "Nur", "Oka", "Putri", "Rizky", "Sari", "Tono", "Wayan"]
+# A few names outside Latin-1, so the PDF font path is exercised too
+LAST_NAMES = ["Santoso", "Wijaya", "Pratama", "Saputra", "Hidayat", "Kusuma", "Nugroho", "Ñoël", "Łukasz", "Şahin"]
+EXPENSES = [("Toko Buku Sinar", "Buku"), ("CV Alat Tulis", "ATK"), ("PLN", "Listrik"), ("PDAM", "Air"),
+            ("Koperasi Guru", "Honor"), ("Bengkel Jaya", "Perbaikan"), ("Toko Olahraga", "Perlengkapan")]
+
+def class_names(count):
+    """Class names 7A, 8A, 9A, 7B, ... for `count` classes."""
+    return [f"{7 + i % 3}{chr(ord('A') + i // 3)}" for i in range(count)]
+
+def students(count, rng, classes=30, inactive_rate=0.05):
+    """Student rows for backend.insert_students, spread evenly over the classes."""
+    names = class_names(classes)
+    return [
+        {"name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i:05d}",
+         "attendance_number": str(i // classes + 1),
+         "class_name": names[i % classes],
+         "parent_contact": f"08{rng.randint(10**9, 10**10 - 1)}",
+         "status": "Inactive" if rng.random() < inactive_rate else "Active"}
+        for i in range(count)
+    ]
+
+def upload_sheet(count, rng, classes=30):
+    """An uploaded student sheet (UPLOAD_COLUMNS), shaped like pd.read_excel output."""
+    rows = students(count, rng, classes)
+    return pd.DataFrame({
+        "Nama": [r["name"] for r in rows],
+        "Absen": [float(r["attendance_number"]) for r in rows],
+        "Kelas": [r["class_name"] for r in rows],
+        "Kontak": [float(r["parent_contact"]) for r in rows],
+    })
+
+def payments(student_ids, year, rng, unpaid_rate=0.1, fee=DEFAULT_FEE):
+    """One tuition payment per student and month of `year`, minus a share left unpaid."""
+    return [
+        {"student_id": student_id, "date": f"{year}-{m + 1:02d}-{rng.randint(1, 28):02d}", "type": "Pemasukan",
+         "amount": float(fee), "payment_month": month, "payment_year": year, "description": "SPP"}
+        for student_id in student_ids
+        for m, month in enumerate(MONTHS)
+        if rng.random() >= unpaid_rate
+    ]
+
+def expenses(year, rng, per_month=40):
+    """School expenses of `year`: per_month rows in every month."""
+    rows = []
+    for m, month in enumerate(MONTHS):
+        for _ in range(per_month):
+            recipient, description = rng.choice(EXPENSES)
+            rows.append({"recipient": recipient, "date": f"{year}-{m + 1:02d}-{rng.randint(1, 28):02d}",
+                         "type": "Pengeluaran", "amount": float(rng.randint(10, 500) * 1000),
+                         "payment_month": month, "payment_year": year, "description": description})
+    return rows
+
+def seed(backend, student_count=500, years=3, first_year=2022, seed=1, unpaid_rate=0.1, expenses_per_month=40):
+    """
+    Fill an empty backend with a synthetic school. Transactions are written
+    one year at a time. Returns the student ids and the years seeded.
+    """
+    rng = random.Random(seed)
+    student_ids = backend.insert_students(students(student_count, rng))
+    year_list = list(range(first_year, first_year + years))
+    for year in year_list:
+        backend.insert_transactions(payments(student_ids, year, rng, unpaid_rate) + expenses(year, rng, expenses_per_month))
+    return student_ids, year_list
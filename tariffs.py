@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# Tuition tariffs (SPP): a fee per class that applies from an effective date
+# until a later tariff for the same class replaces it. Rows without a class
+# apply to every class that has no tariff of its own.
+
+DEFAULT_FEE = 66000
+TARIFF_COLUMNS = ["id", "class_name", "effective_from", "amount"]
+MONTH_COUNT = 12
+
+def month_ordinal(year, month):
+    """Months since year 0; month is 1-12."""
+    return int(year) * MONTH_COUNT + int(month) - 1
+
+class TariffSchedule:
+    """
+    Tariff rows precomputed into per-year [class, month] fee arrays, so
+    recap and arrears get the fees of a whole school with one indexer lookup.
+    """
+
+    def __init__(self, rows=(), default_fee=DEFAULT_FEE):
+        self.default_fee = float(default_fee)
+        # class_name (None = all classes) -> (sorted effective month ordinals, amounts)
+        timelines = {}
+        for row in sorted(rows, key=lambda r: str(r["effective_from"])):
+            effective = pd.Timestamp(row["effective_from"])
+            class_name = row.get("class_name") or None
+            starts, amounts = timelines.setdefault(class_name, ([], []))
+            starts.append(month_ordinal(effective.year, effective.month))
+            amounts.append(float(row["amount"]))
+        self.timelines = {key: (np.array(starts), np.array(amounts)) for key, (starts, amounts) in timelines.items()}
+        self.classes = [key for key in self.timelines if key is not None]
+        self.class_index = pd.Index(self.classes)
+        self._years = {}
+
+    def _timeline_fees(self, timeline, months, fallback):
+        starts, amounts = timeline
+        # Latest tariff whose effective month is on or before each month
+        position = np.searchsorted(starts, months, side='right') - 1
+        return np.where(position >= 0, amounts[np.maximum(position, 0)], fallback)
+
+    def year_fees(self, year):
+        """Array [class, month] for `year`: one row per self.classes, then the all-classes row last."""
+        year = int(year)
+        if year not in self._years:
+            months = np.arange(month_ordinal(year, 1), month_ordinal(year, 12) + 1)
+            default = np.full(MONTH_COUNT, self.default_fee)
+            if None in self.timelines:
+                default = self._timeline_fees(self.timelines[None], months, default)
+            rows = [self._timeline_fees(self.timelines[name], months, default) for name in self.classes]
+            self._years[year] = np.vstack(rows + [default])
+        return self._years[year]
+
+    def fee_matrix(self, class_names, year):
+        """Fees [student, month] in `year` for students of the given classes."""
+        positions = self.class_index.get_indexer(pd.Index(class_names))
+        positions[positions < 0] = len(self.classes)  # no own tariff: all-classes row
+        return self.year_fees(year)[positions]
+
+    def fee(self, class_name, year, month):
+        """Fee of one class for one month (1-12)."""
+        return float(self.fee_matrix([class_name], year)[0, int(month) - 1])
+
+def fee_matrix(fee, class_names, year):
+    """Fees [student, month] from a TariffSchedule or a flat amount per month."""
+    if isinstance(fee, TariffSchedule):
+        return fee.fee_matrix(class_names, year)
+    return np.full((len(class_names), MONTH_COUNT), float(fee))
@@ -0,0 +1,46 @@
+from datetime import date
+import pandas as pd
+import arrears
+
+def mock_data():
+    students = pd.DataFrame([
+        {"id": 1, "name": "Adam", "attendance_number": "1", "class_name": "8J", "status": "Active"},
+        {"id": 2, "name": "Budi", "attendance_number": "2", "class_name": "8J", "status": "Active"},
+        {"id": 3, "name": "Cici", "attendance_number": "3", "class_name": "8K", "status": "Active"},
+        {"id": 4, "name": "Dodi", "attendance_number": "4", "class_name": "8K", "status": "Inactive"},
+    ])
+    paid = [(1, 2024, m) for m in arrears.MONTHS[:3]] + [(2, 2024, "January"), (2, 2023, "December")]
+    status = pd.DataFrame(paid, columns=["student_id", "payment_year", "payment_month"])
+    return students, status
+
+def test_due_mask():
+    cutoff = date(2024, 3, 15)
+    assert arrears.due_mask(2024, cutoff) == 0b111, "January to March are due"
+    assert arrears.due_mask(2023, cutoff) == arrears.ALL_MONTHS
+    assert arrears.due_mask(2025, cutoff) == 0
+
+def test_compute_arrears():
+    print("Testing Arrears Engine...")
+    students, status = mock_data()
+    result = arrears.compute_arrears(students, status, cutoff=date(2024, 3, 15))
+
+    # Adam paid everything due, Dodi is inactive; worst debtor first
+    assert result['Nama Siswa'].tolist() == ["Cici", "Budi"]
+    assert result['Jumlah Bulan'].tolist() == [3, 2]
+    assert result['Tunggakan'].tolist() == [3 * 66000, 2 * 66000]
+    assert result['Bulan Tunggakan'].tolist() == ["Jan, Feb, Mar", "Feb, Mar"]
+
+    # Across years every unpaid month of the earlier year counts
+    result = arrears.compute_arrears(students, status, cutoff=date(2024, 1, 31), since_year=2023)
+    budi = result[result['Nama Siswa'] == "Budi"].iloc[0]
+    assert budi['Jumlah Bulan'] == 11 and budi['Bulan Tunggakan'].endswith("Nov 2023")
+
+    assert arrears.compute_arrears(students, status, cutoff=date(2024, 3, 15), fee=50000)['Tunggakan'].iloc[0] == 150000
+    assert arrears.compute_arrears(pd.DataFrame(), status).empty
+    nothing_due = arrears.compute_arrears(students, status, cutoff=date(2024, 3, 15), since_year=2025)
+    assert nothing_due.empty and nothing_due.columns.tolist() == arrears.ARREARS_COLUMNS
+    print("SUCCESS: Arrears are counted per month up to the cutoff.")
+
+if __name__ == "__main__":
+    test_due_mask()
+    test_compute_arrears()
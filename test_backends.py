@@ -0,0 +1,255 @@
+import os
+import tempfile
+import backends
+import indexes
+
+def test_sqlite_backend():
+    print("Testing SQLite Backend...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        backend = backends.create_backend("sqlite", path=path)
+        assert os.path.exists(path), "Database file not created"
+
+        # 1. Students
+        student_id = backend.insert_student({
+            "name": "John Doe", "attendance_number": "01", "class_name": "10A",
+            "parent_contact": "08123456789", "status": "Active"
+        })
+        assert student_id is not None, "Failed to add student"
+        students = backend.fetch_students()
+        assert len(students) == 1 and students[0]["name"] == "John Doe", "Student mismatch"
+
+        # 2. Income with student, expense with recipient
+        backend.insert_transaction({
+            "student_id": student_id, "recipient": None, "date": "2024-01-15", "type": "Pemasukan",
+            "amount": 66000.0, "payment_month": "January", "payment_year": 2024, "description": "SPP"
+        })
+        expense_id = backend.insert_transaction({
+            "recipient": "Toko Buku", "date": "2024-02-01", "type": "Pengeluaran",
+            "amount": 25000.0, "payment_month": None, "payment_year": 2024, "description": "Buku"
+        })
+        transactions = backend.fetch_transactions()
+        assert [t["date"] for t in transactions] == ["2024-02-01", "2024-01-15"], "Order mismatch"
+        assert transactions[0]["student_name"] == "Toko Buku" and transactions[0]["attendance_number"] == "-"
+        assert transactions[1]["student_name"] == "John Doe" and transactions[1]["attendance_number"] == "01"
+        assert list(transactions[0]) == backends.TRANSACTION_COLUMNS, "Column mismatch"
+
+        # 3. Update & delete
+        assert backend.update_transaction(expense_id, {"amount": 30000.0})
+        assert backend.fetch_transactions()[0]["amount"] == 30000.0
+        assert backend.delete_transaction(expense_id)
+        assert not backend.delete_transaction(expense_id), "Deleting twice should report nothing deleted"
+
+        # Deleting a student cascades to its transactions, like Supabase
+        assert backend.delete_student(student_id)
+        assert backend.fetch_transactions() == []
+        backend.conn.close()
+
+    print("SUCCESS: SQLite backend works correctly.")
+
+def test_sqlite_aggregates():
+    print("Testing SQLite Aggregates...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        active = backend.insert_student({"name": "Adam", "class_name": "8J", "status": "Active"})
+        backend.insert_student({"name": "Budi", "class_name": "8J", "status": "Inactive"})
+
+        rows = [
+            (active, "Pemasukan", 66000.0, 2023, "SPP"),
+            (active, "Tuition", 66000.0, 2024, "SPP"),
+            (active, "Income", 34000.0, 2024, "SPP"),
+            (None, "Pengeluaran", 10000.0, 2024, "Buku"),
+            (None, "Expense", 5000.0, 2024, "Buku"),
+            (None, "Pengeluaran", 20000.0, 2024, "Listrik"),
+        ]
+        for student_id, type_, amount, year, desc in rows:
+            backend.insert_transaction({
+                "student_id": student_id, "date": f"{year}-01-10", "type": type_,
+                "amount": amount, "payment_year": year, "description": desc
+            })
+
+        income = {r["payment_year"]: r["total"] for r in backend.income_by_year()}
+        assert income == {2023: 66000.0, 2024: 100000.0}, income
+        expense = {r["description"]: r["total"] for r in backend.expense_by_description()}
+        assert expense == {"Buku": 15000.0, "Listrik": 20000.0}, expense
+        assert backend.count_students("Active") == 1 and backend.count_students() == 2
+
+        # The integer codes are derived by the database from the labels
+        codes = backend._query("SELECT type, type_code FROM transactions")
+        assert all(r["type_code"] == (1 if r["type"] in backends.INCOME_TYPES else 2) for r in codes)
+        backend.conn.close()
+
+    print("SUCCESS: SQLite aggregates match the dashboard definitions.")
+
+def test_sqlite_transaction_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        student_id = backend.insert_student({"name": "Adam", "class_name": "8J", "status": "Active"})
+        backend.insert_transactions([
+            {"student_id": student_id, "date": f"2024-01-{day:02d}", "type": "Pemasukan", "amount": 66000.0,
+             "payment_month": "January", "payment_year": 2024 if day <= 20 else 2025, "description": "SPP"}
+            for day in range(1, 31)
+        ] + [{"recipient": "Toko", "date": "2024-01-15", "type": "Pengeluaran", "amount": 1000.0,
+              "payment_year": 2024, "description": "Buku"}])
+
+        rows, total = backend.fetch_transactions_page({}, limit=10, offset=0)
+        assert total == 31 and len(rows) == 10
+        assert rows[0]["date"] == "2024-01-30", "Newest first"
+
+        rows, total = backend.fetch_transactions_page({"type": backends.INCOME_TYPES, "payment_year": 2024}, limit=10, offset=15)
+        assert total == 20 and [r["date"] for r in rows] == [f"2024-01-{d:02d}" for d in range(5, 0, -1)]
+
+        rows, total = backend.fetch_transactions_page({"type": "Pengeluaran", "date_from": "2024-01-15", "date_to": "2024-01-15"}, 10, 0)
+        assert total == 1 and rows[0]["student_name"] == "Toko"
+
+        # Laporan: the full filtered result, plus the dropdown values
+        rows = backend.query_transactions({"payment_year": 2025})
+        assert len(rows) == 10 and rows[0]["date"] == "2024-01-30"
+        options = backend.fetch_transaction_filter_options()
+        assert sorted(options["payment_year"]) == [2024, 2025] and options["payment_month"] == ["January"]
+        assert (options["min_date"], options["max_date"]) == ("2024-01-01", "2024-01-30")
+
+        # Streamed in chunks, same rows and order as the single query
+        chunks = list(backend.iter_transactions({}, chunk_size=7))
+        assert [len(c) for c in chunks] == [7, 7, 7, 7, 3]
+        assert [r["id"] for c in chunks for r in c] == [r["id"] for r in backend.query_transactions({})]
+
+        # Column lists: the same values as the rows, one list per field
+        rows = backend.query_transactions({"payment_year": 2024})
+        columns = backend.fetch_transaction_columns({"payment_year": 2024})
+        assert list(columns) == backends.TRANSACTION_COLUMNS
+        assert all(list(columns[name]) == [r[name] for r in rows] for name in columns)
+        assert all(len(values) == 0 for values in backend.fetch_transaction_columns({"payment_year": 1999}).values())
+
+        # Supabase responses: the columnar decode matches the per-row one
+        items = [{**{k: r[k] for k in backends.TRANSACTION_COLUMNS[:-2]},
+                  "students": {"name": r["student_name"], "attendance_number": r["attendance_number"]} if r["student_id"] else None}
+                 for r in rows]
+        flat, decoded = backends.SupabaseBackend._flatten(items), backends.SupabaseBackend._columns(items)
+        assert all(decoded[name] == [r[name] for r in flat] for name in backends.TRANSACTION_COLUMNS)
+        backend.conn.close()
+
+def test_sqlite_student_page():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        backend.insert_students([
+            {"name": f"Siswa {i:02d}", "class_name": "8J" if i % 2 else "8K", "status": "Active" if i < 30 else "Inactive"}
+            for i in range(40)
+        ] + [{"name": "100%_Ok", "class_name": "8J", "status": "Active"}])
+
+        rows, total = backend.fetch_students_page({}, limit=10, offset=10)
+        assert total == 41 and [r["name"] for r in rows][:2] == ["Siswa 09", "Siswa 10"]
+
+        rows, total = backend.fetch_students_page({"search": "siswa 1", "class_name": "8J", "status": "Active"}, 10, 0)
+        assert total == 5 and all(r["class_name"] == "8J" for r in rows)
+
+        # LIKE wildcards in the search text are matched literally
+        assert backend.fetch_students_page({"search": "%_"}, 10, 0)[1] == 1
+        assert backend.fetch_class_names() == ["8J", "8K"]
+
+        # Tariffs come back oldest first
+        later = backend.insert_tariff({"class_name": "8J", "effective_from": "2025-01-01", "amount": 70000.0})
+        backend.insert_tariff({"class_name": None, "effective_from": "2024-07-01", "amount": 66000.0})
+        assert [t["effective_from"] for t in backend.fetch_tariffs()] == ["2024-07-01", "2025-01-01"]
+        assert backend.delete_tariff(later) and len(backend.fetch_tariffs()) == 1
+        backend.conn.close()
+
+def test_sqlite_payment_status():
+    print("Testing Payment Status Triggers...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        backend = backends.create_backend("sqlite", path=path)
+        adam = backend.insert_student({"name": "Adam", "class_name": "8J", "status": "Active"})
+        budi = backend.insert_student({"name": "Budi", "class_name": "8J", "status": "Active"})
+
+        def payment(student_id, month, amount=66000.0, type_="Pemasukan"):
+            return {"student_id": student_id, "date": "2024-03-01", "type": type_, "amount": amount,
+                    "payment_month": month, "payment_year": 2024, "description": "SPP"}
+
+        first, second, _, _ = backend.insert_transactions([
+            payment(adam, "January"), payment(adam, "January", 1000.0), payment(budi, "January"),
+            payment(budi, "February", type_="Pengeluaran"),
+        ])
+
+        def status():
+            return {(r["student_id"], r["payment_month"]): (r["amount_paid"], r["tx_count"]) for r in backend.fetch_payment_status(2024)}
+
+        assert status() == {(adam, "January"): (67000.0, 2), (budi, "January"): (66000.0, 1)}, status()
+
+        # Moving a payment to another month, then deleting, keeps the summary exact
+        backend.update_transaction(second, {"payment_month": "February"})
+        assert status()[(adam, "January")] == (66000.0, 1) and status()[(adam, "February")] == (1000.0, 1)
+        backend.delete_transaction(first)
+        assert (adam, "January") not in status()
+        backend.delete_student(budi)
+        assert status() == {(adam, "February"): (1000.0, 1)}
+        assert backend.fetch_payment_status(2023) == []
+
+        # Databases from before payment_status are filled on startup
+        backend.conn.executescript("DROP TABLE payment_status; DROP TRIGGER trg_payment_status_insert;")
+        backend.insert_transaction(payment(adam, "March"))
+        backend.conn.close()
+        backend = backends.create_backend("sqlite", path=path)
+        assert sorted(m for _, m in status()) == ["February", "March"]
+        backend.conn.close()
+
+    print("SUCCESS: payment_status follows every transaction write.")
+
+def test_sqlite_date_normalization():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        backend = backends.create_backend("sqlite", path=path)
+        student_id = backend.insert_student({"name": "Adam", "class_name": "8J", "status": "Active"})
+        # Dates as older versions of the app and hand edits left them
+        for raw in ["2024-01-05 00:00:00", "15/02/2024", "2024-03-01", "2024-04-10T08:30:00"]:
+            backend.insert_transaction({"student_id": student_id, "date": raw, "type": "Pemasukan", "amount": 66000.0,
+                                        "payment_month": "January", "payment_year": 2024, "description": "SPP"})
+        backend.conn.close()
+
+        backend = backends.create_backend("sqlite", path=path)
+        assert [r["date"] for r in backend.query_transactions({})] == ["2024-04-10", "2024-03-01", "2024-02-15", "2024-01-05"]
+        rows = backend.query_transactions({"date_from": "2024-02-01", "date_to": "2024-03-31"})
+        assert [r["date"] for r in rows] == ["2024-03-01", "2024-02-15"]
+
+        # The range filter is a scan of the date index, not of the table
+        plan = " ".join(row[-1] for row in backend.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM transactions WHERE date >= ? AND date <= ?", ("2024-02-01", "2024-03-31")))
+        assert "idx_transactions_date" in plan, plan
+        backend.conn.close()
+
+def test_sqlite_composite_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        backend = backends.create_backend("sqlite", path=path)
+        names = {row[0] for row in backend.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert set(indexes.COMPOSITE_INDEXES) <= names
+        assert not set(indexes.SUPERSEDED_INDEXES) & names
+
+        def plan(sql, params):
+            return " ".join(row[-1] for row in backend.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+        assert "COVERING INDEX idx_transactions_year_type" in plan(
+            "SELECT COUNT(*), SUM(amount) FROM transactions WHERE payment_year = ? AND type = ?", (2024, "Pemasukan"))
+        assert "COVERING INDEX idx_transactions_student_period" in plan(
+            "SELECT payment_month, SUM(amount) FROM transactions WHERE student_id = ? AND payment_year = ? AND type = ? GROUP BY payment_month",
+            (1, 2024, "Pemasukan"))
+
+        # Databases with the old single-column index are migrated on startup
+        indexes.revert(backend.conn)
+        backend.conn.close()
+        backend = backends.create_backend("sqlite", path=path)
+        names = {row[0] for row in backend.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_transactions_student_period" in names and "idx_transactions_student_id" not in names
+        backend.conn.close()
+
+if __name__ == "__main__":
+    test_sqlite_backend()
+    test_sqlite_aggregates()
+    test_sqlite_transaction_page()
+    test_sqlite_student_page()
+    test_sqlite_payment_status()
+    test_sqlite_date_normalization()
+    test_sqlite_composite_indexes()
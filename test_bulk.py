@@ -0,0 +1,90 @@
+import os
+import tempfile
+import pandas as pd
+import backends
+import database
+
+def upload_sheet():
+    # Shaped like pd.read_excel output: numeric cells come back as float
+    return pd.DataFrame({
+        'Nama': ["Adam", "Budi", None, "Cici", "Dodi"],
+        'Absen': [1.0, 2.0, 3.0, None, 5.0],
+        'Kelas': ["8J", "8J", "8J", "8J", None],
+        'Kontak': [8123456789.0, None, 8111.0, 8222.0, 8333.0],
+    })
+
+def test_normalize_student_upload():
+    rows, skipped = database.normalize_student_upload(upload_sheet())
+    assert list(skipped) == [2, 4], "Rows without Nama/Kelas should be skipped"
+    assert rows['attendance_number'].tolist() == ["1", "2", None]
+    assert rows['parent_contact'].tolist() == ["8123456789", None, "8222"]
+
+    # Text cells keep leading zeros, numbers in mixed columns lose '.0'
+    mixed = pd.DataFrame({'Nama': ["A", "B"], 'Absen': ["01", 2.0], 'Kelas': ["8J", "8J"], 'Kontak': ["0812", 812.0]})
+    rows, _ = database.normalize_student_upload(mixed)
+    assert rows['attendance_number'].tolist() == ["01", "2"]
+    assert rows['parent_contact'].tolist() == ["0812", "812"]
+
+def test_add_students_bulk():
+    print("Testing Bulk Student Upload...")
+    original_backend = database.backend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        try:
+            results = database.add_students_bulk(upload_sheet(), chunk_size=2)
+            assert results['status'].tolist() == ["Berhasil", "Berhasil", "Dilewati", "Berhasil", "Dilewati"]
+            assert results['id'].notna().sum() == 3
+
+            students = database.backend.fetch_students()
+            assert sorted(s['name'] for s in students) == ["Adam", "Budi", "Cici"]
+
+            # A chunk that fails is retried row by row: only the bad row fails
+            bad = pd.DataFrame({'Nama': ["Eka", "Fajar"], 'Absen': [6, 7], 'Kelas': ["8J", "8J"], 'Kontak': [None, None]})
+            database.backend.conn.execute("""
+                CREATE TRIGGER reject_fajar BEFORE INSERT ON students WHEN NEW.name = 'Fajar'
+                BEGIN SELECT RAISE(ABORT, 'rejected'); END
+            """)
+            results = database.add_students_bulk(bad, chunk_size=10)
+            assert results['status'].tolist() == ["Berhasil", "Gagal"], results
+            assert "rejected" in results['error'].iloc[1]
+            assert len(database.backend.fetch_students()) == 4
+        finally:
+            database.backend.conn.close()
+            database.backend = original_backend
+
+    print("SUCCESS: Bulk upload inserts in chunks and reports per-row results.")
+
+def test_add_transactions_atomic():
+    print("Testing Batched Payment Write...")
+    original_backend = database.backend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        try:
+            student_id = database.backend.insert_student({"name": "Adam", "class_name": "8J", "status": "Active"})
+
+            def payment(month):
+                return {"student_id": student_id, "date": "2024-03-01", "type_": "Pemasukan", "amount": 66000,
+                        "payment_month": month, "payment_year": 2024, "description": "SPP"}
+
+            ids = database.add_transactions([payment(m) for m in ["January", "February", "March"]])
+            assert len(ids) == 3 and len(database.backend.fetch_transactions()) == 3
+
+            # One bad month rolls back the whole payment
+            database.backend.conn.execute("""
+                CREATE TRIGGER reject_may BEFORE INSERT ON transactions WHEN NEW.payment_month = 'May'
+                BEGIN SELECT RAISE(ABORT, 'rejected'); END
+            """)
+            assert database.add_transactions([payment(m) for m in ["April", "May", "June"]]) is None
+            assert len(database.backend.fetch_transactions()) == 3, "Partial payment must not be saved"
+        finally:
+            database.backend.conn.close()
+            database.backend = original_backend
+
+    print("SUCCESS: Multi-month payments are saved all or nothing.")
+
+if __name__ == "__main__":
+    test_normalize_student_upload()
+    test_add_students_bulk()
+    test_add_transactions_atomic()
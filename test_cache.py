@@ -0,0 +1,99 @@
+import time
+from cache import ReadCache
+
+def test_read_cache():
+    print("Testing Read Cache...")
+    cache = ReadCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    # 1. Miss then hit
+    assert cache.get_or_load("students", loader) == 1
+    assert cache.get_or_load("students", loader) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # 2. Writes invalidate only their keys
+    @cache.invalidates("students")
+    def add_student():
+        return "ok"
+
+    cache.get_or_load("transactions", loader)
+    assert add_student() == "ok"
+    assert cache.get_or_load("students", loader) == 3, "Students should reload after a write"
+    assert cache.get_or_load("transactions", loader) == 2, "Transactions should still be cached"
+
+    # 3. TTL expiry
+    cache.ttl = 0.01
+    time.sleep(0.02)
+    assert cache.get_or_load("students", loader) == 4
+
+    print("SUCCESS: Read cache hit/miss/invalidation works correctly.")
+
+def test_invalidation_during_load():
+    cache = ReadCache(ttl=60)
+
+    def stale_loader():
+        # A write lands while the query is in flight
+        cache.invalidate("transactions")
+        return "stale"
+
+    assert cache.get_or_load("transactions", stale_loader) == "stale"
+    assert cache.get_or_load("transactions", lambda: "fresh") == "fresh", "Stale result must not be cached"
+
+def test_failed_load_not_cached():
+    cache = ReadCache(ttl=60)
+
+    def failing():
+        raise ConnectionError("offline")
+
+    try:
+        cache.get_or_load("students", failing)
+        assert False, "Loader error should propagate"
+    except ConnectionError:
+        pass
+    assert cache.get_or_load("students", lambda: "ok") == "ok"
+
+def test_stale_while_unreachable():
+    cache = ReadCache(ttl=60, serve_stale=lambda e: isinstance(e, ConnectionError))
+
+    def offline():
+        raise ConnectionError("offline")
+
+    def rejected():
+        raise ValueError("bad query")
+
+    assert cache.get_or_load("students", lambda: "saved") == "saved"
+    cache.invalidate("students")
+    assert cache.get_or_load("students", offline) == "saved", "The last copy is served while offline"
+    assert cache.stats()["stale_hits"] == 1
+    try:
+        cache.get_or_load("students", rejected)
+        assert False, "Other errors should propagate"
+    except ValueError:
+        pass
+    try:
+        cache.get_or_load("transactions", offline)
+        assert False, "Nothing to serve for a key never loaded"
+    except ConnectionError:
+        pass
+
+def test_keyed_entries():
+    cache = ReadCache(ttl=60)
+    assert cache.get_or_load(("payment_status", 2024), lambda: "2024") == "2024"
+    assert cache.get_or_load(("payment_status", 2025), lambda: "2025") == "2025"
+    assert cache.get_or_load(("payment_status", 2024), lambda: "reloaded") == "2024"
+
+    # Invalidating the name drops every year
+    cache.invalidate("payment_status")
+    assert cache.get_or_load(("payment_status", 2024), lambda: "new") == "new"
+    assert cache.get_or_load(("payment_status", 2025), lambda: "new") == "new"
+
+if __name__ == "__main__":
+    test_read_cache()
+    test_invalidation_during_load()
+    test_failed_load_not_cached()
+    test_stale_while_unreachable()
+    test_keyed_entries()
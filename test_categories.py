@@ -0,0 +1,69 @@
+import pandas as pd
+import categories
+import database
+
+def sample():
+    return pd.DataFrame({
+        "type": ["Pemasukan", "Income", "Tuition", "Pengeluaran", "Hibah", None],
+        "payment_month": ["January", "March", None, "December", "Bulan13", "May"],
+    })
+
+def test_encode_transactions():
+    print("Testing Categorical Encoding...")
+    df = categories.encode_transactions(sample())
+    assert isinstance(df['type'].dtype, pd.CategoricalDtype)
+    assert df['payment_month'].cat.ordered, "Months sort in calendar order"
+    assert df['type_code'].tolist() == [1, 1, 1, 2, 0, 0]
+    assert df['month_no'].tolist() == [1, 3, pd.NA, 12, pd.NA, 5]
+    # Unknown labels are kept, not turned into NaN
+    assert df['type'].iloc[4] == "Hibah" and df['payment_month'].iloc[4] == "Bulan13"
+    print("SUCCESS: Types and months are encoded as categories and codes.")
+
+def test_masks_match_text():
+    raw = sample()
+    encoded = categories.encode_transactions(raw)
+    assert categories.income_mask(raw['type']).tolist() == categories.income_mask(encoded['type']).tolist() == [True, True, True, False, False, False]
+    assert categories.month_index(raw['payment_month']).tolist() == categories.month_index(encoded['payment_month']).tolist() == [0, 2, -1, 11, -1, 4]
+
+def test_transaction_frame():
+    df = categories.transaction_frame({
+        "id": [1, 2, 3], "student_id": [7, None, 7], "date": ["2024-01-05", "2024-02-01 10:00:00", "bukan tanggal"],
+        "type": ["Pemasukan", "Pengeluaran", "Hibah"], "amount": [66000, 1500.5, None],
+        "payment_month": ["January", None, "May"], "payment_year": [2024, None, 2024], "description": ["SPP", None, "x"],
+    })
+    assert str(df['id'].dtype) == "Int64" and str(df['student_id'].dtype) == "Int64" and str(df['payment_year'].dtype) == "Int64"
+    assert df['student_id'].isna().tolist() == [False, True, False]
+    assert df['amount'].dtype == "float64" and pd.isna(df['amount'].iloc[2])
+    assert df['date'].tolist()[:2] == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-02-01 10:00")] and pd.isna(df['date'].iloc[2])
+    assert isinstance(df['type'].dtype, pd.CategoricalDtype) and df['type'].iloc[2] == "Hibah"
+
+    # Encoding a typed frame keeps its categoricals and gives the same codes
+    encoded = categories.encode_transactions(df)
+    assert encoded['type'].dtype == df['type'].dtype
+    assert encoded['type_code'].tolist() == [1, 2, 0]
+
+    empty = categories.transaction_frame({"id": [], "type": [], "description": []})
+    assert empty.empty and str(empty['id'].dtype) == "Int64" and empty['description'].dtype == object
+
+def test_failed_query_is_typed():
+    class Broken:
+        def __getattr__(self, name):
+            raise RuntimeError("query failed")
+
+    original_backend = database.backend
+    database.backend = Broken()
+    try:
+        for df in [database.query_transactions({}), database.get_transactions_page({})[0]]:
+            assert df.empty and df['date'].dt.strftime('%d/%m/%Y').tolist() == []
+    finally:
+        database.backend = original_backend
+
+def test_sql_case():
+    assert categories.sql_case("type", categories.TYPE_CODES, 0).startswith("CASE type WHEN 'Income' THEN 1")
+
+if __name__ == "__main__":
+    test_encode_transactions()
+    test_masks_match_text()
+    test_transaction_frame()
+    test_failed_query_is_typed()
+    test_sql_case()
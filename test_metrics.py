@@ -0,0 +1,82 @@
+import json
+import time
+import pandas as pd
+import metrics
+
+def test_timed_operations():
+    m = metrics.Metrics(window=100)
+
+    @m.timed()
+    def _load_rows(n):
+        return pd.DataFrame({"a": range(n)})
+
+    @m.timed("page")
+    def page(n):
+        return _load_rows(n), n
+
+    for n in range(1, 11):
+        page(n)
+    rows = {r["operation"]: r for r in m.snapshot()}
+    assert set(rows) == {"load_rows", "page"}, "Leading underscores are dropped from names"
+    assert rows["load_rows"]["calls"] == 10 and rows["load_rows"]["rows_avg"] == 5.5
+    assert rows["page"]["rows_avg"] == 5.5, "(frame, total) counts the frame"
+    assert rows["page"]["p50_ms"] <= rows["page"]["p90_ms"] <= rows["page"]["p99_ms"] <= rows["page"]["max_ms"]
+
+    # Only the last `window` samples make the percentiles; counters keep going
+    small = metrics.Metrics(window=3)
+    for seconds in [9.0, 9.0, 0.001, 0.001, 0.001]:
+        small.record("op", seconds)
+    (row,) = small.snapshot()
+    assert row["calls"] == 5 and row["max_ms"] == 1.0 and row["total_s"] == 18.003
+
+    assert json.loads(m.to_json())["operations"][0]["operation"] in ("load_rows", "page")
+    m.reset()
+    assert m.snapshot() == []
+
+def test_bytes_and_errors():
+    m = metrics.Metrics()
+    metrics.add_bytes(10)  # outside any span: ignored
+    with m.span("page.Laporan"):
+        metrics.add_bytes(100)
+        with m.span("query"):
+            metrics.add_bytes(50)
+    rows = {r["operation"]: r for r in m.snapshot()}
+    assert rows["page.Laporan"]["bytes_total"] == 150 and rows["query"]["bytes_total"] == 50
+
+    @m.timed()
+    def broken():
+        raise ValueError("boom")
+
+    try:
+        broken()
+    except ValueError:
+        pass
+    assert {r["operation"]: r for r in m.snapshot()}["broken"]["errors"] == 1
+
+    # Control-flow BaseExceptions (Streamlit's rerun) are not errors
+    try:
+        with m.span("rerun"):
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    assert {r["operation"]: r for r in m.snapshot()}["rerun"]["errors"] == 0
+    assert metrics._spans() == [], "Spans are closed on errors too"
+
+def test_disabled_and_overhead():
+    m = metrics.Metrics(enabled=False)
+    m.timed()(lambda: 1)()
+    assert m.snapshot() == []
+
+    m = metrics.Metrics()
+    op = m.timed()(lambda: None)
+    start = time.perf_counter()
+    for _ in range(10000):
+        op()
+    per_call = (time.perf_counter() - start) / 10000
+    assert per_call < 100e-6, f"{per_call * 1e6:.1f}us per call"
+    print(f"SUCCESS: Metrics cost {per_call * 1e6:.1f}us per call.")
+
+if __name__ == "__main__":
+    test_timed_operations()
+    test_bytes_and_errors()
+    test_disabled_and_overhead()
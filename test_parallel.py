@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import backends
+import database
+import metrics
+import parallel
+import synthetic
+
+def slow(value, seconds=0.2):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+def test_gather():
+    start = time.perf_counter()
+    assert parallel.gather(slow("a"), slow("b"), slow("c")) == ("a", "b", "c")
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.45, f"Three 0.2s calls took {elapsed:.2f}s; they should overlap"
+
+    # Nested gathers (a loader fanning out inside a page fan-out) don't block
+    assert parallel.gather(lambda: parallel.gather(slow(1), slow(2)), slow(3)) == ((1, 2), 3)
+    assert parallel.gather() == () and parallel.gather(slow(1, 0)) == (1,)
+
+    # Errors surface on the caller, after every call has finished
+    finished = []
+    def broken():
+        raise ValueError("boom")
+    try:
+        parallel.gather(broken, lambda: finished.append(slow(1)()))
+        assert False, "The error should be raised"
+    except ValueError:
+        assert finished == [1]
+
+def test_bytes_follow_the_page():
+    m = metrics.Metrics()
+
+    def received(count):
+        def call():
+            metrics.add_bytes(count)
+        return call
+
+    with m.span("page.Rekap"):
+        parallel.gather(received(100), received(20), received(3))
+    assert m.snapshot()[0]["bytes_total"] == 123, "Worker threads count for the page span"
+
+def test_dashboard_summary_fan_out():
+    original_backend = database.backend
+    with tempfile.TemporaryDirectory() as tmp:
+        database.backend = backends.create_backend("sqlite", path=os.path.join(tmp, "test.db"))
+        try:
+            synthetic.seed(database.backend, student_count=20, years=1, first_year=2024, unpaid_rate=0, expenses_per_month=1)
+            database.clear_cache()
+            summary, students, fee = database.fetch_together(
+                database.get_dashboard_summary, database.get_all_students, database.get_tariff_schedule
+            )
+            assert summary["active_students"] == (students["status"] == "Active").sum()
+            assert summary["income_by_year"].index.tolist() == [2024]
+            assert fee.fee("X-1", 2024, 1) > 0
+        finally:
+            database.backend.conn.close()
+            database.backend = original_backend
+            database.clear_cache()
+    print("SUCCESS: Independent reads run concurrently.")
+
+if __name__ == "__main__":
+    test_gather()
+    test_bytes_follow_the_page()
+    test_dashboard_summary_fan_out()
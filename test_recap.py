@@ -1,143 +1,100 @@
-import database
 import pandas as pd
-from datetime import datetime
+import recap
+import tariffs
+
+def mock_data():
+    students = pd.DataFrame([
+        {"id": 1, "name": "Zara", "attendance_number": "10", "status": "Active"},
+        {"id": 2, "name": "Adam", "attendance_number": "1", "status": "Active"},
+        {"id": 3, "name": "Budi", "attendance_number": "2", "status": "Active"},
+        {"id": 4, "name": "Cici", "attendance_number": "3", "status": "Inactive"},
+    ])
+    payments = [
+        (1, "January", 2024, "Pemasukan"),
+        (2, "January", 2024, "Income"),
+        (2, "February", 2024, "Tuition"),
+        (3, "January", 2024, "Pemasukan"),
+        (3, "February", 2024, "Pemasukan"),
+        (3, "March", 2024, "Pemasukan"),
+        (3, "March", 2024, "Pemasukan"),    # Duplicate month counts once
+        (1, "February", 2023, "Pemasukan"),  # Other year
+        (4, "January", 2024, "Pemasukan"),   # Inactive student
+    ]
+    transactions = pd.DataFrame(
+        [{"student_id": s, "payment_month": m, "payment_year": y, "type": t, "amount": 66000.0} for s, m, y, t in payments]
+        + [{"student_id": None, "payment_month": None, "payment_year": 2024, "type": "Pengeluaran", "amount": 5000.0}]
+    )
+    return students, transactions
 
 def test_recap():
     print("Testing Recap Logic...")
-    
-    # 1. Setup Mock Data
-    current_year = 2024 # Force 2024 for test
-    selected_year = current_year
-    
-    students = database.get_all_students()
-    print(f"Students: {len(students)}")
-    
-    transactions = database.get_transactions()
-    print(f"Transactions: {len(transactions)}")
-    
-    # Filter like in app
-    paid_trans = pd.DataFrame()
-    if not transactions.empty:
-        # Check types present in DB
-        print("Transaction Types in DB:", transactions['type'].unique())
-        
-        paid_trans = transactions[
-            (transactions['payment_year'] == selected_year) & 
-            (transactions['type'].isin(['Pemasukan', 'Income', 'Tuition']))
-        ]
-        print(f"Paid Transactions for {selected_year}: {len(paid_trans)}")
-
-    months = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-    
-    active_students = students[students['status'] == 'Active']
-    
-    recap_data = []
-    
-    for idx, student in active_students.iterrows():
-        row_data = {
-            "No Absen": student['attendance_number'] if pd.notna(student['attendance_number']) else "",
-            "Nama Siswa": student['name']
-        }
-        
-        student_payments = []
-        if not paid_trans.empty:
-            student_payments = paid_trans[paid_trans['student_id'] == student['id']]['payment_month'].unique()
-        
-        for month in months:
-            if month in student_payments:
-                row_data[month] = "Sudah Bayar"
-            else:
-                row_data[month] = "-"
-        
-        # Mock calculation for test consistency
-        row_data["Jumlah"] = len([m for m in months if m in student_payments])
-        
-    # Mock Data for Sorting
-    recap_data = [
-        {"No Absen": "10", "Nama Siswa": "Zara", "Jumlah": 1, "Rupiah": 66000, "January": "Sudah Bayar"},
-        {"No Absen": "1", "Nama Siswa": "Adam", "Jumlah": 2, "Rupiah": 132000, "January": "Sudah Bayar", "February": "Sudah Bayar"},
-        {"No Absen": "2", "Nama Siswa": "Budi", "Jumlah": 3, "Rupiah": 198000, "January": "Sudah Bayar", "February": "Sudah Bayar", "March": "Sudah Bayar"}
-    ]
-    recap_df = pd.DataFrame(recap_data)
-    
-    # Fill missing months with "-"
-    months = ["January", "February", "March"]
-    for m in months:
-        if m not in recap_df.columns:
-            recap_df[m] = "-"
-        recap_df[m] = recap_df[m].fillna("-")
+    students, transactions = mock_data()
 
     print("\n--- Testing Sorting Logic ---")
-    print("Original Order:", recap_df['No Absen'].tolist())
-    
-    # Test Sort Logic
-    try:
-        recap_df['No Absen Temp'] = pd.to_numeric(recap_df['No Absen'], errors='coerce')
-        recap_df = recap_df.sort_values('No Absen Temp').drop(columns=['No Absen Temp'])
-    except:
-        recap_df = recap_df.sort_values('No Absen')
-        
-    print("Sorted Order:", recap_df['No Absen'].tolist())
-    
-    if recap_df['No Absen'].tolist() == ["1", "2", "10"]:
-        print("SUCCESS: Numeric sorting works correctly.")
-    else:
-        print("FAILURE: Numeric sorting failed.")
-        
-    # --- Test Total & Rupiah Logic ---
-    print("\n--- Testing Total & Rupiah Rows ---")
-    
-    if not recap_df.empty:
-        # 1. TOTAL Row
-        total_row = {col: None for col in recap_df.columns}
-        total_row["Nama Siswa"] = "TOTAL"
-        
-        total_jumlah = recap_df['Jumlah'].sum()
-        total_rupiah_col = recap_df['Rupiah'].sum()
-        
-        total_row["Jumlah"] = total_jumlah
-        total_row["Rupiah"] = total_rupiah_col
-        
-        month_counts = {}
-        for month in months:
-            count = recap_df[month].apply(lambda x: 1 if x == "Sudah Bayar" else 0).sum()
-            total_row[month] = count
-            month_counts[month] = count
-            
-        recap_df = pd.concat([recap_df, pd.DataFrame([total_row])], ignore_index=True)
-        
-        # 2. RUPIAH Row
-        rupiah_row = {col: None for col in recap_df.columns}
-        rupiah_row["Nama Siswa"] = "RUPIAH"
-        
-        def format_currency(x): return f"Rp {x:,.0f}"
-        
-        for month in months:
-            rupiah_row[month] = format_currency(month_counts[month] * 66000)
-        
-        rupiah_row["Jumlah"] = format_currency(total_jumlah * 66000)
-        rupiah_row["Rupiah"] = format_currency(total_rupiah_col)
-        
-        recap_df = pd.concat([recap_df, pd.DataFrame([rupiah_row])], ignore_index=True)
+    recap_df = recap.build_recap(students, transactions, 2024, sort_by_absen=True)
+    body = recap_df[~recap_df['Nama Siswa'].isin(["TOTAL", "RUPIAH"])]
+    print("Sorted Order:", body['No Absen'].tolist())
+    assert body['No Absen'].tolist() == [1, 2, 10], "Numeric sorting failed"
+    print("SUCCESS: Numeric sorting works correctly.")
 
-    print("\nResult Dataframe Tail (Last 3 rows):")
+    # --- Test Matrix, Total & Rupiah Logic ---
+    print("\n--- Testing Total & Rupiah Rows ---")
     print(recap_df.tail(3))
-    
+
+    budi = body[body['Nama Siswa'] == "Budi"].iloc[0]
+    assert [budi[m] for m in recap.MONTHS[:4]] == ["Sudah Bayar", "Sudah Bayar", "Sudah Bayar", "-"]
+    assert budi['Jumlah'] == 3 and budi['Rupiah'] == "Rp 198,000"
+
     # Check TOTAL row
     total_row = recap_df[recap_df['Nama Siswa'] == 'TOTAL'].iloc[0]
-    if total_row['Jumlah'] == 6 and total_row['January'] == 3: # 1+2+3 = 6; All 3 paid Jan
-        print("SUCCESS: TOTAL row calculation (Jumlah & Months) correct.")
-    else:
-        print(f"FAILURE: TOTAL row incorrect. Jumlah: {total_row['Jumlah']}, Jan: {total_row['January']}")
+    assert total_row['Jumlah'] == 6 and total_row['January'] == 3, \
+        f"TOTAL row incorrect. Jumlah: {total_row['Jumlah']}, Jan: {total_row['January']}"
+    assert total_row['December'] == 0
+    print("SUCCESS: TOTAL row calculation (Jumlah & Months) correct.")
+
+    # Check RUPIAH row: Jan Count 3 * 66000 = 198,000
+    rupiah_row = recap_df[recap_df['Nama Siswa'] == 'RUPIAH'].iloc[0]
+    assert rupiah_row['January'] == "Rp 198,000", f"RUPIAH row incorrect. Got {rupiah_row['January']}"
+    assert rupiah_row['Jumlah'] == "Rp 396,000" and rupiah_row['Rupiah'] == "Rp 396,000"
+    print(f"SUCCESS: RUPIAH row calculation correct. Jan: {rupiah_row['January']}")
+
+    assert list(recap_df.columns) == ["No Absen", "Nama Siswa"] + recap.MONTHS + ["Jumlah", "Rupiah"]
+
+def test_recap_without_payments():
+    students, _ = mock_data()
+    recap_df = recap.build_recap(students, pd.DataFrame(), 2024)
+    assert len(recap_df) == 3 + 2
+    assert recap_df.iloc[-2]['Jumlah'] == 0
+    assert recap.build_recap(pd.DataFrame(), pd.DataFrame(), 2024).empty
+
+def test_recap_from_payment_status():
+    students, transactions = mock_data()
+    income = transactions[transactions['type'] != "Pengeluaran"]
+    status = (
+        income.groupby(['student_id', 'payment_year', 'payment_month'], as_index=False)
+        .agg(amount_paid=('amount', 'sum'), tx_count=('amount', 'size'))
+    )
+    from_status = recap.build_recap(students, status, 2024)
+    assert from_status.equals(recap.build_recap(students, transactions, 2024))
+
+def test_recap_with_tariffs():
+    students, transactions = mock_data()
+    students['class_name'] = ["8J", "8J", "9A", "9A"]
+    schedule = tariffs.TariffSchedule([
+        {"class_name": "9A", "effective_from": "2024-01-01", "amount": 80000},
+        {"class_name": None, "effective_from": "2024-02-01", "amount": 70000},
+    ])
+    recap_df = recap.build_recap(students, transactions, 2024, fee=schedule)
+    budi = recap_df[recap_df['Nama Siswa'] == "Budi"].iloc[0]
+    assert budi['Rupiah'] == "Rp 240,000", "Budi (9A) pays the class tariff for 3 months"
 
-    # Check RUPIAH row
+    # January: Zara and Adam 66,000 (before the all-classes tariff), Budi 80,000
     rupiah_row = recap_df[recap_df['Nama Siswa'] == 'RUPIAH'].iloc[0]
-    # Jan Count 3 * 66000 = 198,000
-    expected_jan = "Rp 198,000"
-    if rupiah_row['January'] == expected_jan:
-        print(f"SUCCESS: RUPIAH row calculation correct. Jan: {rupiah_row['January']}")
-    else:
-        print(f"FAILURE: RUPIAH row incorrect. Expected {expected_jan}, Got {rupiah_row['January']}")
+    assert rupiah_row['January'] == "Rp 212,000" and rupiah_row['February'] == "Rp 150,000"
+    assert rupiah_row['Jumlah'] == "Rp 442,000"
 
 if __name__ == "__main__":
     test_recap()
+    test_recap_without_payments()
+    test_recap_from_payment_status()
+    test_recap_with_tariffs()
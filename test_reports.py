@@ -0,0 +1,62 @@
+import csv
+import io
+import sqlite3
+import openpyxl
+import reports
+
+def sample_rows(count):
+    return [
+        {"date": f"2024-01-{i % 28 + 1:02d}", "student_name": f"Siswa {i} Ñoël Şahin", "attendance_number": str(i),
+         "type": "Pemasukan" if i % 4 else "Pengeluaran", "amount": 66000.0, "payment_month": "January",
+         "payment_year": 2024, "description": "SPP " + "panjang " * 20}
+        for i in range(count)
+    ]
+
+def test_transactions_pdf():
+    print("Testing PDF Report...")
+    rows = sample_rows(100)
+    pdf = reports.transactions_pdf([rows[:30], rows[30:], []])
+    assert pdf.startswith(b"%PDF"), "Not a PDF"
+    assert pdf.count(b"/Type /Page\n") > 1, "100 rows should span several pages"
+
+    report = reports.TransactionReport()
+    report.add_page()
+    for row in rows:
+        report.add_row(row)
+    assert report.row_count == 100
+    assert report.total_income == 75 * 66000.0 and report.total_expense == 25 * 66000.0
+
+    # Long text is cut to its column instead of overflowing
+    fitted = report._fit("x" * 500, report.widths[-1])
+    assert fitted.endswith("...") and report.get_string_width(fitted) <= report.widths[-1]
+    print("SUCCESS: PDF report paginates and totals the streamed rows.")
+
+def test_cell_text():
+    assert reports._cell_text("date", "2024-01-20") == "20-Jan-2024"
+    assert reports._cell_text("amount", 66000.0) == "Rp 66,000"
+    assert reports._cell_text("payment_year", 2024.0) == "2024"
+    assert reports._cell_text("payment_month", None) == ""
+
+def test_exports_from_cursor():
+    print("Testing CSV/XLSX Export...")
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (date TEXT, student_name TEXT, type TEXT, amount REAL, payment_year INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?, ?, ?)", [(f"2024-02-{d:02d}", f"Siswa {d}", "Pemasukan", 66000.0, 2024) for d in range(1, 26)])
+
+    data = reports.transactions_csv(reports.cursor_chunks(conn.execute("SELECT * FROM t ORDER BY date"), chunk_size=10))
+    lines = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+    assert len(lines) == 26 and lines[0][0] == "Tanggal"
+    assert lines[1] == ["01-Feb-2024", "Siswa 1", "", "Pemasukan", "Rp 66,000", "", "2024", ""]
+
+    # XLSX keeps real numbers and dates, formatted by the cell number format
+    data = reports.transactions_xlsx(reports.cursor_chunks(conn.execute("SELECT * FROM t ORDER BY date"), chunk_size=10))
+    sheet = openpyxl.load_workbook(io.BytesIO(data)).active
+    assert sheet.max_row == 26 and sheet["E2"].value == 66000 and sheet["E2"].number_format == '"Rp "#,##0'
+    assert sheet["A2"].value.day == 1 and sheet["A2"].number_format == "dd-mmm-yyyy"
+    conn.close()
+    print("SUCCESS: Exports stream rows from a cursor.")
+
+if __name__ == "__main__":
+    test_transactions_pdf()
+    test_cell_text()
+    test_exports_from_cursor()
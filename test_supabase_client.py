@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+from urllib.parse import unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+from postgrest.exceptions import APIError
+import backends
+import supabase_client
+
+# A local stand-in for PostgREST: each request pops the next (status, delay)
+# from `script` (then 200 with no delay) and is answered with a JSON list.
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real service
+
+    def _reply(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        with server.lock:
+            server.log.append((self.command, self.path, self.client_address))
+            status, delay = server.script.pop(0) if server.script else (200, 0)
+        if delay:
+            time.sleep(delay)
+        body = json.dumps(server.rows if status < 300 else {"message": "busy"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            pass  # the client timed out and hung up
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(script=(), rows=(), port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.script, server.rows, server.log = list(script), list(rows), []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def stop_stub(server):
+    server.shutdown()
+    server.server_close()
+
+def test_retries_transient_errors():
+    server, url = start_stub(script=[(503, 0), (502, 0)], rows=[{"id": 1}])
+    client = supabase_client.create_http_client(retries=3, backoff=0.001)
+    try:
+        response = client.get(f"{url}/rest/v1/students")
+        assert response.status_code == 200 and response.json() == [{"id": 1}]
+        assert supabase_client.pool_stats(client) == {"requests": 1, "retries": 2, "failures": 0}
+
+        # Inserts are not resent after a server error, only after 429
+        server.script = [(503, 0)]
+        assert client.post(f"{url}/rest/v1/students", json={}).status_code == 503
+        server.script = [(429, 0)]
+        assert client.post(f"{url}/rest/v1/students", json={}).status_code == 200
+        assert supabase_client.pool_stats(client)["retries"] == 3
+        assert [m for m, _, _ in server.log].count("POST") == 3
+    finally:
+        client.close()
+        stop_stub(server)
+
+def test_connections_are_reused():
+    server, url = start_stub()
+    client = supabase_client.create_http_client()
+    try:
+        for _ in range(10):
+            client.get(f"{url}/rest/v1/students")
+        ports = {address[1] for _, _, address in server.log}
+        assert len(server.log) == 10 and len(ports) == 1, f"{len(ports)} connections for 10 requests"
+
+        # Concurrent sessions share the pool without going over max_connections
+        server.log.clear()
+        threads = [threading.Thread(target=client.get, args=(f"{url}/rest/v1/students",)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(server.log) == 8
+    finally:
+        client.close()
+        stop_stub(server)
+
+def test_timeouts_and_unreachable_server():
+    server, url = start_stub(script=[(200, 0.5), (200, 0.5)])
+    client = supabase_client.create_http_client(timeout=0.1, retries=1, backoff=0.001)
+    try:
+        try:
+            client.get(f"{url}/rest/v1/students")
+            assert False, "A slow server should time out"
+        except httpx.ReadTimeout:
+            pass
+        assert supabase_client.pool_stats(client) == {"requests": 1, "retries": 1, "failures": 1}
+    finally:
+        client.close()
+        stop_stub(server)
+
+    # Nothing listens on the stub's old port: connection errors are retried, then raised
+    client = supabase_client.create_http_client(retries=2, backoff=0.001)
+    try:
+        client.get(f"{url}/rest/v1/students")
+        assert False, "An unreachable server should raise"
+    except httpx.ConnectError:
+        assert supabase_client.pool_stats(client)["retries"] == 2
+    finally:
+        client.close()
+
+def test_fails_fast_while_offline():
+    server, url = start_stub(script=[])
+    stop_stub(server)
+    client = supabase_client.create_http_client(retries=2, backoff=0.001, offline_cooldown=0.3)
+    try:
+        try:
+            client.get(f"{url}/rest/v1/students")
+        except httpx.ConnectError as e:
+            assert supabase_client.is_unreachable(e)
+        assert supabase_client.is_offline(client)
+
+        # No retries while the server is known to be down
+        start = time.perf_counter()
+        try:
+            client.post(f"{url}/rest/v1/transactions", json=[{}])
+            assert False, "Requests fail at once while offline"
+        except httpx.ConnectError:
+            pass
+        assert time.perf_counter() - start < 0.05
+        assert supabase_client.pool_stats(client) == {"requests": 2, "retries": 2, "failures": 2}
+
+        # After the cooldown the server is tried again, and one answer ends offline mode
+        server, url = start_stub(script=[], port=int(url.rsplit(":", 1)[1]))
+        time.sleep(0.35)
+        assert client.get(f"{url}/rest/v1/students").status_code == 200
+        assert not supabase_client.is_offline(client)
+        stop_stub(server)
+    finally:
+        client.close()
+
+    assert supabase_client.is_unreachable(APIError({"message": "Service Unavailable", "code": "503"}))
+    assert not supabase_client.is_unreachable(APIError({"message": "duplicate key", "code": "23505"}))
+    assert not supabase_client.is_unreachable(ValueError("bad date"))
+
+def test_backend_uses_shared_client():
+    rows = [{"id": 1, "name": "Budi", "attendance_number": "1", "class_name": "X-1", "contact": None}]
+    server, url = start_stub(script=[(503, 0)], rows=rows)
+    client = supabase_client.create_http_client(retries=2, backoff=0.001)
+    backend = backends.create_backend("supabase", url=url, key="test-key", http_client=client)
+    try:
+        assert backend.fetch_students() == rows
+        assert all(path.startswith("/rest/v1/students") for _, path, _ in server.log)
+        assert supabase_client.pool_stats(backend.http_client)["retries"] == 1
+    finally:
+        backend.close()
+        stop_stub(server)
+    assert client.is_closed, "close() releases the pool"
+    print("SUCCESS: Supabase requests share a pooled, retrying client.")
+
+def test_search_wildcards_are_literal():
+    server, url = start_stub()
+    backend = backends.create_backend("supabase", url=url, key="test-key",
+                                      http_client=supabase_client.create_http_client(retries=0))
+    try:
+        backend.fetch_students_page({"search": "50%_a"}, 25, 0)
+        (_, path, _), = server.log
+        assert "name=ilike.%50\\%\\_a%" in unquote(path), path
+    finally:
+        backend.close()
+        stop_stub(server)
+
+if __name__ == "__main__":
+    test_retries_transient_errors()
+    test_connections_are_reused()
+    test_timeouts_and_unreachable_server()
+    test_fails_fast_while_offline()
+    test_backend_uses_shared_client()
+    test_search_wildcards_are_literal()
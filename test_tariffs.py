@@ -0,0 +1,33 @@
+import numpy as np
+import tariffs
+
+def schedule():
+    return tariffs.TariffSchedule([
+        {"class_name": None, "effective_from": "2024-07-01", "amount": 70000},
+        {"class_name": "9A", "effective_from": "2024-01-01", "amount": 80000},
+        {"class_name": "9A", "effective_from": "2025-01-15", "amount": 90000},
+    ])
+
+def test_tariff_schedule():
+    print("Testing Tariff Schedule...")
+    s = schedule()
+
+    # No tariff yet: default fee; all-classes tariff from July 2024
+    assert s.fee("8J", 2024, 6) == tariffs.DEFAULT_FEE and s.fee("8J", 2024, 7) == 70000
+    # A class tariff wins over the all-classes one; mid-month dates apply to that month
+    assert s.fee("9A", 2024, 8) == 80000 and s.fee("9A", 2025, 1) == 90000
+    assert s.fee("9A", 2023, 12) == tariffs.DEFAULT_FEE
+
+    fees = s.fee_matrix(["8J", "9A", None], 2024)
+    assert fees.shape == (3, 12)
+    assert fees[0].tolist() == [66000.0] * 6 + [70000.0] * 6
+    assert (fees[1] == 80000).all() and (fees[2] == fees[0]).all()
+    print("SUCCESS: Tariffs resolve per class and month.")
+
+def test_flat_fee_matrix():
+    assert np.array_equal(tariffs.fee_matrix(50000, ["8J", "8K"], 2024), np.full((2, 12), 50000.0))
+    assert tariffs.fee_matrix(schedule(), ["9A"], 2025)[0, 0] == 90000
+
+if __name__ == "__main__":
+    test_tariff_schedule()
+    test_flat_fee_matrix()
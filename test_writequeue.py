@@ -0,0 +1,252 @@
+import os
+import tempfile
+import threading
+import backends
+import database
+from journal import WriteJournal
+from writequeue import WriteQueue
+
+def payment(student_id, month, amount=50000, description=""):
+    return {"student_id": student_id, "recipient": None, "date": "2024-07-01", "type": "Pemasukan", "amount": float(amount),
+            "payment_month": month, "payment_year": 2024, "description": description}
+
+def unreachable(*args, **kwargs):
+    raise ConnectionError("database unreachable")
+
+class FlakyBackend:
+    """
+    SQLite backend whose inserts fail for rows described as "rusak", that can
+    hold writes back, be unreachable (`down`) or lose the reply to an insert.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.broken = True
+        self.down = False
+        self.lose_reply = False
+        self.gate = threading.Event()
+        self.gate.set()
+        self.insert_calls = 0
+
+    def __getattr__(self, name):
+        if self.down and name.split("_")[0] in ("fetch", "find", "query", "update", "delete"):
+            return unreachable
+        return getattr(self.backend, name)
+
+    def insert_transactions(self, rows):
+        self.gate.wait()
+        if self.down:
+            unreachable()
+        self.insert_calls += 1
+        if self.broken and any(row["description"] == "rusak" for row in rows):
+            raise RuntimeError("invalid row")
+        ids = self.backend.insert_transactions(rows)
+        if self.lose_reply:
+            # Saved, but the connection drops before the ids come back
+            self.lose_reply = False
+            unreachable()
+        return ids
+
+    def insert_student(self, data):
+        self.gate.wait()
+        if self.down:
+            unreachable()
+        if self.broken and data["name"] == "rusak":
+            raise RuntimeError("invalid student")
+        return self.backend.insert_student(data)
+
+def test_batches_and_temp_ids():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        flushed = []
+        queue = WriteQueue(backend, linger=0.05, on_flush=flushed.append)
+        backend.gate.clear()
+
+        # A new student and their payments, entered before anything is saved
+        student_temp = queue.temp_id()
+        queue.submit("add_student", {"data": {"name": "Adam", "class_name": "8J", "status": "Active"}, "temp_id": student_temp})
+        for month in ["January", "February", "March"]:
+            queue.submit("add_transactions", {"rows": [payment(student_temp, month)], "temp_ids": [queue.temp_id()]})
+        assert len(queue.pending()) == 4
+        backend.gate.set()
+
+        assert queue.flush(timeout=10)
+        assert queue.stats() == {"queued": 0, "failed": 0, "written": 4, "batches": 2, "online": True}
+        assert backend.insert_calls == 1, "Consecutive inserts share one request"
+        assert flushed == [{"add_student"}, {"add_transactions"}]
+        (student,) = backend.fetch_students()
+        assert {t["student_id"] for t in backend.fetch_transactions()} == {student["id"]}
+        queue.close()
+        backend.conn.close()
+
+def test_failures_are_kept_and_retried():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        journal_path = os.path.join(tmp, "journal.db")
+        queue = WriteQueue(backend, journal=WriteJournal(journal_path))
+        backend.gate.clear()
+        bad_student = queue.temp_id()
+        queue.submit("add_student", {"data": {"name": "rusak", "class_name": "8J", "status": "Active"}, "temp_id": bad_student})
+        for description in ["ok", "rusak", "ok"]:
+            queue.submit("add_transactions", {"rows": [payment(None, "May", description=description)], "temp_ids": [queue.temp_id()]})
+        queue.submit("add_transactions", {"rows": [payment(bad_student, "June")], "temp_ids": [queue.temp_id()]})
+        backend.gate.set()
+        assert queue.flush(timeout=10)
+
+        # The bad rows fail alone; the payment of the unsaved student fails with it
+        assert len(backend.fetch_transactions()) == 2
+        failures = queue.failures()
+        assert [f["kind"] for f in failures] == ["add_student", "add_transactions", "add_transactions"]
+        assert "Depends on row" in failures[2]["error"]
+        queue.close()
+        queue.journal.close()
+
+        # Failures survive a restart, and new temporary ids don't reuse theirs
+        queue = WriteQueue(backend, journal=WriteJournal(journal_path))
+        assert len(queue.failures()) == 3 and queue.temp_id() < min(f["payload"]["temp_ids"][0] for f in failures[1:])
+        backend.broken = False
+        for write in queue.failures():
+            assert queue.retry(write["id"])
+        assert queue.flush(timeout=10) and queue.failures() == []
+        assert len(backend.fetch_transactions()) == 4 and len(backend.fetch_students()) == 1
+        assert queue.journal.stats() == {"queued": 0, "failed": 0, "done": 5, "dismissed": 0}
+        queue.close()
+        queue.journal.close()
+        backend.conn.close()
+
+def test_offline_writes_are_replayed():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        journal_path = os.path.join(tmp, "journal.db")
+        queue = WriteQueue(backend, journal=WriteJournal(journal_path), retry_delay=0.01, max_retry_delay=0.05)
+        backend.down = True
+
+        # Entered offline: kept in order, retried, never marked failed
+        student_temp = queue.temp_id()
+        queue.submit("add_student", {"data": {"name": "Adam", "class_name": "8J", "status": "Active"}, "temp_id": student_temp})
+        queue.submit("add_transactions", {"rows": [payment(student_temp, "July")], "temp_ids": [queue.temp_id()]})
+        assert not queue.flush(timeout=0.3)
+        assert queue.stats()["online"] is False and queue.failures() == [] and len(queue.pending()) == 2
+
+        # The app restarts before the database is back; the journal still has both writes
+        queue.close(timeout=0.1)
+        queue.journal.close()
+        backend.down = False
+        queue = WriteQueue(backend, journal=WriteJournal(journal_path), retry_delay=0.01)
+        assert [w["kind"] for w in queue.pending()] == ["add_student", "add_transactions"]
+        assert queue.flush(timeout=10) and queue.stats()["online"] is True
+        (student,) = backend.fetch_students()
+        assert [t["student_id"] for t in backend.fetch_transactions()] == [student["id"]]
+        assert queue.journal.stats()["done"] == 2
+        queue.close()
+        queue.journal.close()
+        backend.conn.close()
+
+def test_lost_reply_is_not_saved_twice():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        queue = WriteQueue(backend, journal=WriteJournal(os.path.join(tmp, "journal.db")), retry_delay=0.01)
+        backend.lose_reply = True
+        queue.submit("add_transactions", {"rows": [payment(None, "May"), payment(None, "June")],
+                                          "temp_ids": [queue.temp_id(), queue.temp_id()]})
+        assert queue.flush(timeout=10) and queue.failures() == []
+
+        # The retry finds both rows by their idempotency keys instead of inserting them again
+        assert len(backend.fetch_transactions()) == 2 and backend.insert_calls == 1
+        queue.close()
+        queue.journal.close()
+        backend.conn.close()
+
+def test_optimistic_reads():
+    original_backend, original_queue = database.backend, database.write_queue
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        database.backend = backend
+        database.write_queue = WriteQueue(backend, on_flush=database._invalidate_written, retry_delay=0.01)
+        try:
+            database.clear_cache()
+            saved_id = database.add_student("Budi", "2", "8J", None)
+            assert len(database.get_transactions()) == 0  # cached before the queued writes
+            backend.gate.clear()
+
+            temp_id = database.queue_student("Adam", "1", "8J", None)
+            ids = database.queue_transactions([
+                {"student_id": temp_id, "date": "2024-07-01", "type_": "Pemasukan", "amount": 50000,
+                 "payment_month": month, "payment_year": 2024, "description": ""} for month in ["January", "February"]
+            ])
+            database.queue_student_update(saved_id, "Budi Santoso", "2", "8J", None, "Active")
+
+            # Shown at once, before anything reaches the database
+            students = database.get_all_students()
+            assert students["name"].tolist() == ["Adam", "Budi Santoso"] and temp_id in students["id"].tolist()
+            transactions = database.get_transactions()
+            assert transactions["id"].tolist() == ids[::-1] and set(transactions["student_name"]) == {"Adam"}
+            assert transactions["type_code"].tolist() == [1, 1]
+            assert len(database.get_pending_writes()) == 3
+
+            backend.gate.set()
+            assert database.write_queue.flush(timeout=10)
+            transactions = database.get_transactions()
+            assert len(transactions) == 2 and (transactions["id"] > 0).all()
+            assert database.get_all_students()["name"].tolist() == ["Adam", "Budi Santoso"]
+            assert database.get_pending_writes().empty
+            # The idempotency keys of the saved rows are not part of the frames
+            assert database.get_all_students().columns.tolist() == backends.STUDENT_COLUMNS
+            assert database.get_students_page()[0].columns.tolist() == backends.STUDENT_COLUMNS
+
+            # Offline: deletes are queued and hidden at once, pages are filtered from the last copy
+            database.get_transactions_page({"type": "Pemasukan"})
+            backend.down = True
+            assert database.queue_transaction_delete(ids[0])
+            page, total = database.get_transactions_page({"type": "Pemasukan", "payment_month": "February"})
+            assert total == 1 and page["payment_month"].tolist() == ["February"]
+            assert database.get_transactions_page({"type": "Pemasukan", "payment_month": "January"})[1] == 0
+            students, total = database.get_students_page({"search": "budi"})
+            assert students["name"].tolist() == ["Budi Santoso"] and total == 1
+            assert not database.write_queue.flush(timeout=0.3) and database.is_offline()
+
+            backend.down = False
+            assert database.write_queue.flush(timeout=10) and not database.is_offline()
+            assert len(backend.fetch_transactions()) == 1
+        finally:
+            database.write_queue.close()
+            backend.conn.close()
+            database.backend, database.write_queue = original_backend, original_queue
+            database.clear_cache()
+
+def test_payment_queued_after_its_student_is_saved():
+    original_backend, original_queue = database.backend, database.write_queue
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FlakyBackend(backends.create_backend("sqlite", path=os.path.join(tmp, "test.db")))
+        database.backend = backend
+        database.write_queue = WriteQueue(backend, on_flush=database._invalidate_written)
+        try:
+            database.clear_cache()
+            temp_id = database.queue_student("Adam", "1", "8J", None)
+            assert database.write_queue.flush(timeout=10)
+            (student,) = backend.fetch_students()
+
+            # The form still knows the student by the temporary id
+            backend.gate.clear()
+            database.queue_transactions([{"student_id": temp_id, "date": "2024-07-01", "type_": "Pemasukan", "amount": 50000,
+                                          "payment_month": "July", "payment_year": 2024, "description": ""}])
+            (row,) = database.get_transactions().to_dict("records")
+            assert row["student_id"] == student["id"] and row["student_name"] == "Adam"
+
+            backend.gate.set()
+            assert database.write_queue.flush(timeout=10)
+            assert [t["student_id"] for t in backend.fetch_transactions()] == [student["id"]]
+        finally:
+            database.write_queue.close()
+            backend.conn.close()
+            database.backend, database.write_queue = original_backend, original_queue
+            database.clear_cache()
+    print("SUCCESS: Queued writes are batched, shown at once and never dropped.")
+
+if __name__ == "__main__":
+    test_batches_and_temp_ids()
+    test_failures_are_kept_and_retried()
+    test_offline_writes_are_replayed()
+    test_lost_reply_is_not_saved_twice()
+    test_optimistic_reads()
+    test_payment_queued_after_its_student_is_saved()
@@ -1,5 +1,6 @@
 import database
 import pandas as pd
+from categories import INCOME_TYPES, EXPENSE_TYPES
 
 def verify_calculations():
     print("Verifying Dashboard Logic...")
@@ -16,14 +17,14 @@ def verify_calculations():
     # 2. Verify Financials
     if not transactions.empty:
         # Pemasukan
-        income_df = transactions[transactions['type'].isin(['Income', 'Tuition', 'Pemasukan'])]
+        income_df = transactions[transactions['type'].isin(INCOME_TYPES)]
         total_income = income_df['amount'].sum()
         print(f"Total Income (Calculated): {total_income}")
         print("Income Transactions:")
         print(income_df[['type', 'amount']])
         
         # Pengeluaran
-        expense_df = transactions[transactions['type'].isin(['Expense', 'Pengeluaran'])]
+        expense_df = transactions[transactions['type'].isin(EXPENSE_TYPES)]
         total_expense = expense_df['amount'].sum()
         print(f"Total Expense (Calculated): {total_expense}")
         print("Expense Transactions:")
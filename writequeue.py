@@ -0,0 +1,335 @@
+import contextlib
+import itertools
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+import supabase_client
+
+# Background writer for data entry. Forms submit inserts, updates and deletes
+# here and return at once; a worker thread writes them in order and in
+# batches (consecutive transaction inserts become one multi-row insert).
+# Until a write is done database.py shows it on top of the cached frames.
+#
+# With a journal (journal.py) every write is on disk before submit returns.
+# While the database is unreachable the worker keeps the writes queued and
+# tries again with backoff, so nothing entered offline is lost; after a
+# restart the open writes are replayed. Writes rejected by the database stay
+# listed as failed until they are retried or dismissed.
+
+logger = logging.getLogger("student_finance.writes")
+
+# Write kinds and their payloads:
+#   add_transactions    -- {"rows": [transaction rows], "temp_ids": [...]}
+#   add_student         -- {"data": student row, "temp_id": ...}
+#   update_transaction  -- {"id": transaction id, "data": changed columns}
+#   update_student      -- {"id": student id, "data": changed columns}
+#   delete_transaction  -- {"id": transaction id}
+#   delete_student      -- {"id": student id}
+# New rows get negative temporary ids until they are saved; later writes may
+# refer to them (a payment for a student that is still queued). Inserted rows
+# carry the write's key as client_key, "<key>:<n>" for the n-th transaction.
+KINDS = ("add_transactions", "add_student", "update_transaction", "update_student", "delete_transaction", "delete_student")
+
+class WriteFailed(Exception):
+    pass
+
+class WriteQueue:
+    """Queue of pending writes, flushed to `backend` by one worker thread."""
+
+    def __init__(self, backend, journal=None, batch_size=200, linger=0.05, on_flush=None, metrics=None,
+                 retry_delay=1.0, max_retry_delay=30.0, is_unreachable=supabase_client.is_unreachable):
+        self.backend = backend
+        self.journal = journal
+        self.batch_size = batch_size  # transaction rows per insert request
+        self.linger = linger          # seconds to wait for a burst of submits to join a batch
+        self.on_flush = on_flush      # called with the kinds just written, e.g. to invalidate caches
+        self.metrics = metrics
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.is_unreachable = is_unreachable
+        self.cond = threading.Condition()
+        self.stopped = threading.Event()
+        self.writes = {}              # write id -> write, in submit order
+        self.resolved = {}            # temporary id -> saved id
+        self._ids = itertools.count(1)
+        self._temp_ids = itertools.count(-1, -1)
+        self.written = 0
+        self.batches = 0
+        self.online = True
+        self.last_error = None
+        self.closing = False
+        self._replay_journal()
+        self.worker = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self.worker.start()
+
+    def temp_id(self):
+        with self.cond:
+            return next(self._temp_ids)
+
+    def saved_id(self, row_id):
+        """The id a temporary id was saved under; other ids, and rows not saved yet, as is."""
+        with self.cond:
+            return self.resolved.get(row_id, row_id)
+
+    def submit(self, kind, payload):
+        """Queue a write (journaled first); returns it as a dict with id, key, kind, payload and status."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown write kind: {kind}")
+        with self.cond:
+            if self.closing:
+                raise WriteFailed("The write queue is closed")
+            write = {"id": next(self._ids), "key": uuid.uuid4().hex, "kind": kind, "payload": payload,
+                     "status": "queued", "attempts": 0, "error": None,
+                     "submitted_at": datetime.now().isoformat(timespec="seconds")}
+            if self.journal is not None:
+                self.journal.append(write)
+            self.writes[write["id"]] = write
+            self.cond.notify_all()
+            return write
+
+    def pending(self, kind=None):
+        """Writes not saved yet (queued or being written), oldest first."""
+        with self.cond:
+            return [dict(w) for w in self.writes.values()
+                    if w["status"] != "failed" and (kind is None or w["kind"] == kind)]
+
+    def failures(self):
+        with self.cond:
+            return [dict(w) for w in self.writes.values() if w["status"] == "failed"]
+
+    def retry(self, write_id):
+        """Queue a failed write again."""
+        with self.cond:
+            write = self.writes.get(write_id)
+            if write is None or write["status"] != "failed":
+                return False
+            # Back of the queue: it may depend on writes submitted since
+            if self.journal is not None:
+                self.journal.requeue(write["key"])
+            del self.writes[write_id]
+            write.update(status="queued", error=None)
+            self.writes[write_id] = write
+            self.cond.notify_all()
+            return True
+
+    def dismiss(self, write_id):
+        """Drop a failed write for good."""
+        with self.cond:
+            write = self.writes.get(write_id)
+            if write is None or write["status"] != "failed":
+                return False
+            if self.journal is not None:
+                self.journal.dismiss(write["key"])
+            del self.writes[write_id]
+            return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued write is saved or has failed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while any(w["status"] != "failed" for w in self.writes.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Write what is queued (what is left stays in the journal), then stop the worker."""
+        self.flush(timeout)
+        with self.cond:
+            self.closing = True
+            left = len(self._queued())
+            self.cond.notify_all()
+        self.stopped.set()
+        self.worker.join(timeout)
+        if left and self.journal is None:
+            logger.error("%s queued writes were not saved", left)
+
+    def stats(self):
+        with self.cond:
+            statuses = [w["status"] for w in self.writes.values()]
+            return {
+                "queued": len(statuses) - statuses.count("failed"),
+                "failed": statuses.count("failed"),
+                "written": self.written,
+                "batches": self.batches,
+                "online": self.online,
+            }
+
+    # --- worker ---
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            with self.cond:
+                while not self._queued() and not self.closing:
+                    self.cond.wait()
+                if self.closing:
+                    return
+            time.sleep(self.linger)
+            with self.cond:
+                batch = self._take_batch()
+            for index, group in enumerate(batch):
+                if not self._write_group(group):
+                    break
+            else:
+                delay = self.retry_delay
+                continue
+            # Unreachable: everything not written goes back in order and is retried later
+            with self.cond:
+                for write in (w for g in batch[index:] for w in g):
+                    if write["status"] == "writing":
+                        write["status"] = "queued"
+            self.stopped.wait(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _queued(self):
+        return [w for w in self.writes.values() if w["status"] == "queued"]
+
+    def _take_batch(self):
+        """Queued writes in order, consecutive transaction inserts grouped up to batch_size rows."""
+        groups = []
+        for write in self._queued():
+            write["status"] = "writing"
+            rows = len(write["payload"]["rows"]) if write["kind"] == "add_transactions" else 0
+            last = groups[-1] if groups else None
+            if (rows and last and last[0]["kind"] == "add_transactions"
+                    and sum(len(w["payload"]["rows"]) for w in last) + rows <= self.batch_size):
+                last.append(write)
+            else:
+                groups.append([write])
+        return groups
+
+    def _span(self, kind):
+        return self.metrics.span(f"queue.{kind}") if self.metrics is not None else contextlib.nullcontext()
+
+    def _write_group(self, group):
+        """Write a group; False if the database could not be reached and the group is still queued."""
+        kind = group[0]["kind"]
+        for write in group:
+            write["attempts"] += 1
+        try:
+            if self.journal is not None:
+                self.journal.attempt([w["key"] for w in group])
+            with self._span(kind):
+                resolved = self._apply(group)
+        except Exception as e:
+            if self.is_unreachable(e):
+                with self.cond:
+                    self.online = False
+                    self.last_error = str(e)
+                return False
+            with self.cond:
+                self.online = True  # the database answered, it just refused the write
+            if len(group) > 1:
+                # One bad write shouldn't sink the others: write them one by one
+                return all(self._write_group([write]) for write in group)
+            self._fail(group[0], e)
+            return True
+
+        if self.journal is not None:
+            self.journal.done([w["key"] for w in group], resolved.items())
+        with self.cond:
+            self.resolved.update(resolved)
+            self.online = True
+            self.batches += 1
+        if self.on_flush is not None:
+            # Readers see the saved rows before the optimistic copies go away
+            self.on_flush({kind})
+        with self.cond:
+            for write in group:
+                self.writes.pop(write["id"], None)
+                self.written += 1
+            self.cond.notify_all()
+        return True
+
+    def _resolve(self, row_id):
+        if row_id is None or row_id >= 0:
+            return row_id
+        with self.cond:
+            saved = self.resolved.get(row_id)
+        if saved is None:
+            raise WriteFailed(f"Depends on row {row_id}, which was not saved")
+        return saved
+
+    def _insert_once(self, table, rows, keys, maybe_saved, insert):
+        """Insert rows keyed by client_key; rows an earlier attempt saved are not sent again."""
+        found = self.backend.find_client_keys(table, keys) if maybe_saved else {}
+        missing = [row for row, key in zip(rows, keys) if key not in found]
+        ids = dict(zip((row["client_key"] for row in missing), insert(missing) if missing else []))
+        found.update(ids)
+        saved = sum(1 for key in keys if found.get(key))
+        if saved < len(keys):
+            raise WriteFailed(f"Saved {saved} of {len(keys)} rows")
+        return [found[key] for key in keys]
+
+    def _apply(self, group):
+        """Send a group to the backend; returns {temporary id: saved id} of inserted rows."""
+        kind = group[0]["kind"]
+        # A write tried before (offline, timed out, or cut off by a restart) may have been saved
+        maybe_saved = any(w["attempts"] > 1 for w in group)
+        if kind == "add_transactions":
+            rows, keys, temp_ids = [], [], []
+            for write in group:
+                for n, (row, temp_id) in enumerate(zip(write["payload"]["rows"], write["payload"]["temp_ids"])):
+                    keys.append(f"{write['key']}:{n}")
+                    rows.append(dict(row, student_id=self._resolve(row["student_id"]), client_key=keys[-1]))
+                    temp_ids.append(temp_id)
+            ids = self._insert_once("transactions", rows, keys, maybe_saved, self.backend.insert_transactions)
+            return dict(zip(temp_ids, ids))
+
+        (write,) = group
+        payload = write["payload"]
+        if kind == "add_student":
+            data = dict(payload["data"], client_key=write["key"])
+            insert = lambda rows: [self.backend.insert_student(rows[0])]
+            (saved_id,) = self._insert_once("students", [data], [write["key"]], maybe_saved, insert)
+            return {payload["temp_id"]: saved_id}
+        if kind == "update_transaction":
+            if not self.backend.update_transaction(self._resolve(payload["id"]), payload["data"]):
+                raise WriteFailed("Transaction not found")
+        elif kind == "update_student":
+            if not self.backend.update_student(self._resolve(payload["id"]), payload["data"]):
+                raise WriteFailed("Student not found")
+        # Deleting a row that is already gone is fine: the result is the same
+        elif kind == "delete_transaction":
+            self.backend.delete_transaction(self._resolve(payload["id"]))
+        elif kind == "delete_student":
+            self.backend.delete_student(self._resolve(payload["id"]))
+        return {}
+
+    def _fail(self, write, error):
+        logger.warning("Write %s (%s) failed: %s", write["id"], write["kind"], error)
+        if self.journal is not None:
+            try:
+                self.journal.fail(write["key"], str(error))
+            except Exception as e:
+                # Still listed in memory; only the copy for the next restart is stale
+                logger.error("Could not record failed write %s: %s", write["key"], e)
+        with self.cond:
+            write.update(status="failed", error=str(error))
+            self.cond.notify_all()
+
+    # --- journal replay ---
+
+    def _replay_journal(self):
+        if self.journal is None:
+            return
+        self.resolved = self.journal.resolved()
+        lowest = min(self.resolved, default=0)
+        for write in self.journal.open_writes():
+            write["id"] = next(self._ids)
+            self.writes[write["id"]] = write
+            lowest = min([lowest] + _temp_ids_in(write["payload"]))
+        # New temporary ids must not collide with those the open writes refer to
+        self._temp_ids = itertools.count(min(lowest, 0) - 1, -1)
+        if self.writes:
+            logger.info("Replaying %s writes from the journal", len(self.writes))
+
+def _temp_ids_in(payload):
+    ids = [payload.get("temp_id"), payload.get("id")] + payload.get("temp_ids", [])
+    ids += [row.get("student_id") for row in payload.get("rows", [])]
+    return [i for i in ids if isinstance(i, int) and i < 0]